@@ -1,218 +1,635 @@
-import openai
-import os
+import hashlib
 import json
-from typing import Dict, List, Optional
+import logging
+import re
+import time
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
 from datetime import datetime
+from config import Config
+from claims_parser import ClaimTree, strip_claim_label
+from llm_cache import CompletionCache
+from llm_providers import LLMProvider, create_provider
+from model_routing import ModelRouter, Route
+from patent_lint import lint_section
+from prompt_budget import PromptAssembler, count_tokens, extractive_digest
+from prompt_templates import DETAILED_DESCRIPTION_PARTS, SYSTEM_PROMPT, get_template
+from rate_limiter import ProviderGovernor
+from resilience import CircuitBreaker, ProviderUnavailableError, call_with_retries
+from usage_tracking import current_meter, metered
+
+logger = logging.getLogger(__name__)
+
+# Sections that can be generated by the AI service, in drafting order
+GENERATABLE_SECTIONS = ('background', 'summary', 'detailed_description', 'claims', 'abstract')
+
+# Step 1 inputs every section is generated from
+INVENTION_INPUT_FIELDS = ('title', 'field_of_invention', 'brief_summary', 'key_components', 'problem_solved')
+
+# Draft fields each section's prompt reads
+SECTION_INPUT_FIELDS = {
+    'background': INVENTION_INPUT_FIELDS,
+    'summary': INVENTION_INPUT_FIELDS + ('background',),
+    'detailed_description': INVENTION_INPUT_FIELDS + ('background', 'summary'),
+    'claims': INVENTION_INPUT_FIELDS + ('background', 'summary', 'detailed_description'),
+    'abstract': INVENTION_INPUT_FIELDS + ('background', 'summary', 'detailed_description', 'claims'),
+}
+
+def section_input_hash(section_name: str, draft_data: Dict) -> str:
+    """Hash the draft fields a section is generated from"""
+    inputs = {field: draft_data.get(field) or '' for field in SECTION_INPUT_FIELDS[section_name]}
+    return hashlib.sha256(json.dumps(inputs, sort_keys=True).encode('utf-8')).hexdigest()
+
+def section_fingerprints(draft_data: Dict, sections: Iterable[str]) -> Dict[str, str]:
+    """Input hashes to store with freshly generated sections"""
+    return {section: section_input_hash(section, draft_data) for section in sections}
+
+def section_content_hash(content: Optional[str]) -> str:
+    """Version tag for a section's text, checked before a span edit is applied"""
+    return hashlib.sha256((content or '').encode('utf-8')).hexdigest()
+
+# Paragraphs are separated by blank lines
+PARAGRAPH = re.compile(r'\S.*?(?=\n[ \t]*\n|\s*\Z)', re.DOTALL)
+
+def paragraph_span(text: str, index: int) -> Tuple[int, int]:
+    """Character offsets of the index-th paragraph of a section"""
+    paragraphs = [match.span() for match in PARAGRAPH.finditer(text or '')]
+    if not 0 <= index < len(paragraphs):
+        raise ValueError(f"Paragraph index must be between 0 and {len(paragraphs) - 1}")
+    return paragraphs[index]
+
+def context_window(text: str, start: int, end: int, chars: int) -> Tuple[str, str]:
+    """Up to chars characters either side of a span, cut back to whole words"""
+    before = text[max(start - chars, 0):start]
+    if start > chars and ' ' in before:
+        before = before[before.index(' ') + 1:]
+    after = text[end:end + chars]
+    if end + chars < len(text) and ' ' in after:
+        after = after[:after.rindex(' ')]
+    return before, after
+
+def stale_sections(draft_data: Dict, fingerprints: Dict[str, str]) -> List[Dict]:
+    """Report, in drafting order, whether each section still matches the inputs it was generated from
+    
+    'stale' sections had an input edited since they were generated; 'affected' ones are fresh
+    but read a stale section, so regenerating that will make them stale too. Sections without a
+    fingerprint were written by hand (or before fingerprints existed) and are left 'untracked'.
+    """
+    fingerprints = fingerprints or {}
+    report, outdated = [], set()
+    for section in GENERATABLE_SECTIONS:
+        upstream = [field for field in SECTION_INPUT_FIELDS[section] if field in outdated]
+        if not draft_data.get(section):
+            status = 'empty'
+        elif section not in fingerprints:
+            status = 'untracked'
+        elif fingerprints[section] != section_input_hash(section, draft_data):
+            status = 'stale'
+        elif upstream:
+            status = 'affected'
+        else:
+            status = 'fresh'
+        if status in ('stale', 'affected'):
+            outdated.add(section)
+        report.append({'section': section, 'status': status, 'stale_inputs': upstream})
+    return report
+
+class PipelineStage:
+    """A single unit of work in a generation pipeline"""
+    
+    def __init__(self, name: str, func: Callable[[Dict], str], depends_on: Iterable[str] = (), persist: bool = True):
+        self.name = name
+        self.func = func
+        self.depends_on = tuple(depends_on)
+        # Intermediate stages (outlines, sub-parts) are not written back to the draft
+        self.persist = persist
+
+class GenerationPipeline:
+    """Dependency-aware runner that starts each stage as soon as its inputs are ready"""
+    
+    def __init__(self, stages: List[PipelineStage], max_workers: int = 6):
+        self.stages = {stage.name: stage for stage in stages}
+        self.max_workers = max_workers
+        
+        for stage in stages:
+            missing = [dep for dep in stage.depends_on if dep not in self.stages]
+            if missing:
+                raise ValueError(f"Stage {stage.name} depends on unknown stages: {', '.join(missing)}")
+        self._check_acyclic()
+    
+    def _check_acyclic(self):
+        """Reject dependency cycles, which would otherwise deadlock the run"""
+        visiting, done = set(), set()
+        
+        def visit(name):
+            if name in done:
+                return
+            if name in visiting:
+                raise ValueError(f"Dependency cycle detected at stage {name}")
+            visiting.add(name)
+            for dep in self.stages[name].depends_on:
+                visit(dep)
+            visiting.discard(name)
+            done.add(name)
+        
+        for name in self.stages:
+            visit(name)
+    
+    @staticmethod
+    def _run_stage(stage: PipelineStage, context: Dict):
+        with metered() as meter:
+            return stage.func(context), meter
+    
+    def run(self, context: Dict, on_complete: Optional[Callable[[str, str, Dict], None]] = None,
+            on_error: Optional[Callable[[str, str], None]] = None) -> Dict:
+        """Run every stage, feeding finished outputs into the context of dependent stages
+        
+        on_complete(name, content, usage) is called for each persisted stage as soon as it
+        finishes, and on_error(name, message) for each stage that fails or is skipped. The usage
+        of an intermediate stage is counted once, with the first persisted stage that needs it.
+        """
+        context = dict(context)
+        results, errors = {}, {}
+        unclaimed_usage = {}
+        pending = dict(self.stages)
+        running = {}
+        
+        def ready(stage):
+            return all(dep in results for dep in stage.depends_on)
+        
+        def blocked(stage):
+            return any(dep in errors for dep in stage.depends_on)
+        
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while pending or running:
+                for name, stage in list(pending.items()):
+                    if blocked(stage):
+                        del pending[name]
+                        errors[name] = f"Skipped because a dependency failed: {', '.join(stage.depends_on)}"
+                        if on_error and stage.persist:
+                            on_error(name, errors[name])
+                    elif ready(stage):
+                        del pending[name]
+                        # Each stage gets a snapshot so concurrent stages never share a mutating dict
+                        running[executor.submit(self._run_stage, stage, dict(context))] = stage
+                
+                if not running:
+                    continue
+                
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    stage = running.pop(future)
+                    try:
+                        content, meter = future.result()
+                    except Exception as e:
+                        errors[stage.name] = str(e)
+                        if on_error and stage.persist:
+                            on_error(stage.name, str(e))
+                        continue
+                    
+                    results[stage.name] = content
+                    context[stage.name] = content
+                    if not stage.persist:
+                        unclaimed_usage[stage.name] = meter
+                        continue
+                    for dep in stage.depends_on:
+                        if dep in unclaimed_usage:
+                            meter.merge(unclaimed_usage.pop(dep))
+                    if on_complete:
+                        on_complete(stage.name, content, meter.to_record())
+        
+        return {
+            'sections': {name: content for name, content in results.items() if self.stages[name].persist},
+            'errors': errors
+        }
 
 class PatentAIService:
     """AI service for patent drafting using OpenAI GPT"""
     
-    def __init__(self, api_key: str = None):
-        """Initialize the AI service with OpenAI API key"""
-        self.api_key = api_key or os.getenv('OPENAI_API_KEY')
-        if not self.api_key:
-            raise ValueError("OpenAI API key is required")
+    def __init__(self, api_key: str = None, provider: LLMProvider = None):
+        """Initialize the AI service with the configured LLM provider"""
+        self.provider = provider or create_provider(api_key=api_key)
         
-        openai.api_key = self.api_key
-        self.client = openai.OpenAI(api_key=self.api_key)
+        # Model, max_tokens and temperature are chosen per section, operation and profile
+        self.router = ModelRouter()
+        self.breaker = CircuitBreaker()
         
-        # Patent drafting system prompt
-        self.system_prompt = """You are an expert patent attorney and technical writer specializing in Indian patent law. 
-        Your task is to help inventors draft comprehensive patent specifications that meet the requirements of the Indian Patent Office.
+        # Repeat requests for identical prompts are served from the completion cache
+        self.cache = CompletionCache() if Config.COMPLETION_CACHE_ENABLED else None
         
-        Key requirements:
-        1. Write in clear, technical language suitable for patent examination
-        2. Follow Indian patent law and guidelines
-        3. Use proper patent terminology and structure
-        4. Be comprehensive but concise
-        5. Include all necessary technical details
-        6. Write in third person, present tense
-        7. Avoid marketing language or subjective claims
+        # Every worker on the host shares one set of OpenAI rate limits
+        self.governor = ProviderGovernor() if Config.OPENAI_RATE_LIMIT_ENABLED else None
         
-        Always maintain professional, technical tone appropriate for patent documentation."""
+        # Upstream sections are fitted to a token budget before they go into a prompt
+        self.prompt_assembler = PromptAssembler(digest=self._digest_section)
+        
+        # Shared by every request; section instructions follow it in the user message
+        self.system_prompt = SYSTEM_PROMPT
     
-    def generate_background(self, draft_data: Dict) -> str:
+    def generate_background(self, draft_data: Dict, **options) -> str:
         """Generate background of invention section"""
-        prompt = f"""
-        {self.system_prompt}
-        
-        Based on the following invention details, write a comprehensive Background of Invention section:
-        
-        Title: {draft_data.get('title', '')}
-        Field of Invention: {draft_data.get('field_of_invention', '')}
-        Brief Summary: {draft_data.get('brief_summary', '')}
-        Key Components: {draft_data.get('key_components', '')}
-        Problem Solved: {draft_data.get('problem_solved', '')}
-        
-        Write a 2-3 paragraph background section that:
-        1. Introduces the technical field
-        2. Describes the current state of the art
-        3. Identifies limitations of existing solutions
-        4. Sets up the need for the present invention
-        
-        Format the response as clean text without markdown formatting.
-        """
-        
-        return self._generate_content(prompt, "background")
+        return self.generate_section("background", draft_data, **options)
     
-    def generate_summary(self, draft_data: Dict) -> str:
+    def generate_summary(self, draft_data: Dict, **options) -> str:
         """Generate summary of invention section"""
-        prompt = f"""
-        {self.system_prompt}
-        
-        Based on the following invention details, write a comprehensive Summary of Invention section:
-        
-        Title: {draft_data.get('title', '')}
-        Field of Invention: {draft_data.get('field_of_invention', '')}
-        Brief Summary: {draft_data.get('brief_summary', '')}
-        Key Components: {draft_data.get('key_components', '')}
-        Problem Solved: {draft_data.get('problem_solved', '')}
-        Background: {draft_data.get('background', '')}
-        
-        Write a 2-3 paragraph summary that:
-        1. Provides an overview of the invention
-        2. Describes the main objectives and advantages
-        3. Outlines the key technical features
-        4. Explains how it solves the identified problem
-        
-        Format the response as clean text without markdown formatting.
-        """
-        
-        return self._generate_content(prompt, "summary")
+        return self.generate_section("summary", draft_data, **options)
     
-    def generate_detailed_description(self, draft_data: Dict) -> str:
+    def generate_detailed_description(self, draft_data: Dict, **options) -> str:
         """Generate detailed description section"""
-        prompt = f"""
-        {self.system_prompt}
-        
-        Based on the following invention details, write a comprehensive Detailed Description section:
-        
-        Title: {draft_data.get('title', '')}
-        Field of Invention: {draft_data.get('field_of_invention', '')}
-        Brief Summary: {draft_data.get('brief_summary', '')}
-        Key Components: {draft_data.get('key_components', '')}
-        Problem Solved: {draft_data.get('problem_solved', '')}
-        Background: {draft_data.get('background', '')}
-        Summary: {draft_data.get('summary', '')}
-        
-        Write a detailed description (4-6 paragraphs) that includes:
-        1. Detailed explanation of each component
-        2. How the components work together
-        3. Step-by-step implementation details
-        4. Technical specifications and parameters
-        5. Alternative embodiments or variations
-        6. Working examples or use cases
-        
-        Format the response as clean text without markdown formatting.
-        """
-        
-        return self._generate_content(prompt, "detailed_description")
+        return self.generate_section("detailed_description", draft_data, **options)
     
-    def generate_claims(self, draft_data: Dict) -> str:
+    def generate_claims(self, draft_data: Dict, **options) -> str:
         """Generate patent claims section"""
-        prompt = f"""
-        {self.system_prompt}
-        
-        Based on the following invention details, write 5-8 patent claims:
-        
-        Title: {draft_data.get('title', '')}
-        Field of Invention: {draft_data.get('field_of_invention', '')}
-        Brief Summary: {draft_data.get('brief_summary', '')}
-        Key Components: {draft_data.get('key_components', '')}
-        Problem Solved: {draft_data.get('problem_solved', '')}
-        Background: {draft_data.get('background', '')}
-        Summary: {draft_data.get('summary', '')}
-        Detailed Description: {draft_data.get('detailed_description', '')}
-        
-        Write claims that:
-        1. Start with an independent claim covering the broadest scope
-        2. Include 4-7 dependent claims that add specific features
-        3. Use proper patent claim language and structure
-        4. Cover the main inventive aspects
-        5. Include method/process claims if applicable
-        
-        Format each claim on a new line starting with "Claim 1:", "Claim 2:", etc.
-        Use proper patent claim numbering and structure.
-        """
-        
-        return self._generate_content(prompt, "claims")
+        return self.generate_section("claims", draft_data, **options)
     
-    def generate_abstract(self, draft_data: Dict) -> str:
+    def generate_abstract(self, draft_data: Dict, **options) -> str:
         """Generate patent abstract"""
-        prompt = f"""
-        {self.system_prompt}
-        
-        Based on the following invention details, write a concise patent abstract (150-250 words):
-        
-        Title: {draft_data.get('title', '')}
-        Field of Invention: {draft_data.get('field_of_invention', '')}
-        Brief Summary: {draft_data.get('brief_summary', '')}
-        Key Components: {draft_data.get('key_components', '')}
-        Problem Solved: {draft_data.get('problem_solved', '')}
-        Background: {draft_data.get('background', '')}
-        Summary: {draft_data.get('summary', '')}
-        Detailed Description: {draft_data.get('detailed_description', '')}
-        Claims: {draft_data.get('claims', '')}
-        
-        Write an abstract that:
-        1. Summarizes the invention in one paragraph
-        2. Mentions the technical field and problem solved
-        3. Describes the key technical solution
-        4. Mentions main advantages or benefits
-        5. Uses clear, technical language
-        
-        Format the response as clean text without markdown formatting.
+        return self.generate_section("abstract", draft_data, **options)
+    
+    def _assemble_context(self, section_name: str, draft_data: Dict, fields: List) -> str:
+        """Render the draft fields a prompt needs, fitted to the section's token budget"""
+        return self.prompt_assembler.assemble(section_name, draft_data, fields)
+    
+    def _render_prompt(self, template_name: str, draft_data: Dict) -> str:
+        """Build a prompt from the template registry: fixed instructions, then the draft fields"""
+        template = get_template(template_name)
+        context = self._assemble_context(template.budget or template.name, draft_data, list(template.fields))
+        return template.render(context)
+    
+    def _digest_section(self, field: str, text: str, max_tokens: int) -> str:
+        """Condense an upstream section that does not fit in a prompt's token budget"""
+        if Config.PROMPT_DIGEST_MODE != 'llm':
+            return extractive_digest(text, max_tokens)
+        
+        prompt = get_template('digest').render(
+            f"Section: {field.replace('_', ' ')}\nWord limit: {max(int(max_tokens * 0.75), 50)}\n\n{text}"
+        )
+        # Digests go through the completion cache, so each version of a section is condensed once
+        return self._generate_content(prompt, f"digest_{field}")
+    
+    def build_section_prompt(self, section_name: str, draft_data: Dict) -> str:
+        """Build the generation prompt for any generatable section"""
+        if section_name not in GENERATABLE_SECTIONS:
+            raise ValueError(f"Invalid section: {section_name}")
+        return self._render_prompt(section_name, draft_data)
+    
+    def generate_section(self, section_name: str, draft_data: Dict, **options) -> str:
+        """Generate content for any generatable section"""
+        return self._generate_content(self.build_section_prompt(section_name, draft_data), section_name, **options)
+    
+    def stream_section(self, section_name: str, draft_data: Dict, **options) -> Iterator[str]:
+        """Stream content for any generatable section as it is produced"""
+        return self._stream_content(self.build_section_prompt(section_name, draft_data), section_name, **options)
+    
+    def generate_specification(self, draft_data: Dict, on_complete: Optional[Callable[[str, str, Dict], None]] = None,
+                               on_error: Optional[Callable[[str, str], None]] = None, **options) -> Dict:
+        """Generate every section in one run, drafting independent parts concurrently"""
+        started = time.time()
+        result = self.specification_pipeline(**options).run(draft_data, on_complete=on_complete, on_error=on_error)
+        # Fingerprint against the finished specification, since stages read different subsets of it
+        result['fingerprints'] = section_fingerprints(dict(draft_data, **result['sections']), result['sections'])
+        result['elapsed_seconds'] = round(time.time() - started, 2)
+        return result
+    
+    def regenerate_stale(self, draft_data: Dict, fingerprints: Dict[str, str],
+                         on_complete: Optional[Callable[[str, str, str, Dict], None]] = None,
+                         on_error: Optional[Callable[[str, str], None]] = None, **options) -> Dict:
+        """Regenerate, in drafting order, only the sections whose inputs changed since they were generated
+        
+        Each regenerated section is fed to the ones after it, so a downstream section is redone
+        only if its inputs really differ. on_complete(section, content, fingerprint, usage) is called as
+        each section finishes; the first failure is reported to on_error and re-raised, leaving
+        later sections untouched.
         """
+        started = time.time()
+        draft_data = dict(draft_data)
+        fingerprints = fingerprints or {}
+        regenerated = {}
+        for section in GENERATABLE_SECTIONS:
+            fingerprint = section_input_hash(section, draft_data)
+            if not draft_data.get(section) or fingerprints.get(section, fingerprint) == fingerprint:
+                continue
+            try:
+                with metered() as meter:
+                    content = self.generate_section(section, draft_data, **options)
+            except Exception as e:
+                if on_error:
+                    on_error(section, str(e))
+                raise
+            draft_data[section] = content
+            regenerated[section] = content
+            if on_complete:
+                on_complete(section, content, fingerprint, meter.to_record())
+        return {
+            'sections': regenerated,
+            'unchanged': [section for section in GENERATABLE_SECTIONS if section not in regenerated],
+            'elapsed_seconds': round(time.time() - started, 2)
+        }
+    
+    def specification_pipeline(self, **options) -> GenerationPipeline:
+        """Build the dependency graph for a full specification
         
-        return self._generate_content(prompt, "abstract")
+        The background and a claims outline only need the invention inputs, so they start together.
+        Once the summary exists the detailed description parts, the claims and the abstract have
+        everything they need and run side by side.
+        """
+        stages = [
+            PipelineStage('background', lambda data: self.generate_background(data, **options)),
+            PipelineStage('claims_outline', lambda data: self.generate_claims_outline(data, **options), persist=False),
+            PipelineStage('summary', lambda data: self.generate_summary(data, **options), depends_on=['background']),
+        ]
+        
+        part_names = []
+        for part in DETAILED_DESCRIPTION_PARTS:
+            part_name = f'detailed_description_{part}'
+            part_names.append(part_name)
+            stages.append(PipelineStage(
+                part_name,
+                lambda data, part=part: self.generate_detailed_description_part(data, part, **options),
+                depends_on=['summary'],
+                persist=False
+            ))
+        
+        stages.extend([
+            PipelineStage(
+                'detailed_description',
+                lambda data: "\n\n".join(data[name] for name in part_names),
+                depends_on=part_names
+            ),
+            PipelineStage(
+                'claims',
+                lambda data: self.generate_claims_from_outline(data, **options),
+                depends_on=['summary', 'claims_outline']
+            ),
+            PipelineStage(
+                'abstract',
+                lambda data: self.generate_abstract_from_outline(data, **options),
+                depends_on=['summary', 'claims_outline']
+            ),
+        ])
+        
+        return GenerationPipeline(stages, max_workers=Config.PIPELINE_MAX_WORKERS)
     
-    def rephrase_section(self, section_content: str, section_name: str, instruction: str = "improve clarity") -> str:
+    def generate_claims_outline(self, draft_data: Dict, **options) -> str:
+        """Generate a first-pass outline of claimable features from the invention inputs"""
+        return self._generate_content(self._render_prompt('claims_outline', draft_data), "claims_outline", **options)
+    
+    def generate_detailed_description_part(self, draft_data: Dict, part: str, **options) -> str:
+        """Generate one part of the detailed description"""
+        prompt = self._render_prompt(f"detailed_description_{part}", draft_data)
+        return self._generate_content(prompt, f"detailed_description_{part}", **options)
+    
+    def generate_claims_from_outline(self, draft_data: Dict, **options) -> str:
+        """Generate patent claims from the summary and a claims outline"""
+        return self._generate_content(self._render_prompt('claims_from_outline', draft_data), "claims", **options)
+    
+    def generate_abstract_from_outline(self, draft_data: Dict, **options) -> str:
+        """Generate the abstract from the summary and a claims outline"""
+        return self._generate_content(self._render_prompt('abstract_from_outline', draft_data), "abstract", **options)
+    
+    def _claim_context(self, draft_data: Dict, tree: ClaimTree, parents: List[int]) -> Dict:
+        """Draft fields plus only the given claims and everything they depend on"""
+        chain = set(parents)
+        for parent in parents:
+            chain.update(claim.number for claim in tree.ancestors(parent))
+        return dict(draft_data, parent_claims=tree.render_claims(tree.get(number) for number in sorted(chain)) or 'None')
+    
+    def regenerate_claim(self, draft_data: Dict, tree: ClaimTree, number: int, **options) -> str:
+        """Regenerate one claim from its parent chain instead of redrafting every claim"""
+        claim = tree.get(number)
+        context = self._claim_context(draft_data, tree, list(claim.depends_on))
+        context['claim'] = tree.render_claims([claim])
+        content = self._generate_content(self._render_prompt('claim_regenerate', context), "claim", **options)
+        return strip_claim_label(content)
+    
+    def draft_claim(self, draft_data: Dict, tree: ClaimTree, feature: str, depends_on: Iterable[int] = (),
+                    number: Optional[int] = None, **options) -> str:
+        """Write one new claim for a feature, dependent on the given claims if there are any"""
+        context = self._claim_context(draft_data, tree, [tree.get(parent).number for parent in depends_on])
+        context['claim_number'] = str(number or len(tree) + 1)
+        context['feature'] = feature
+        content = self._generate_content(self._render_prompt('claim_add', context), "claim", **options)
+        return strip_claim_label(content)
+    
+    def rephrase_claim(self, tree: ClaimTree, number: int, instruction: str = "improve clarity", **options) -> str:
+        """Rephrase one claim, sending only the claim and its parent chain"""
+        claim = tree.get(number)
+        context = self._claim_context({'instruction': instruction}, tree, list(claim.depends_on))
+        context['claim'] = tree.render_claims([claim])
+        content = self._generate_content(self._render_prompt('claim_rephrase', context), "rephrase_claim", **options)
+        return strip_claim_label(content)
+    
+    def rephrase_section(self, section_content: str, section_name: str, instruction: str = "improve clarity", **options) -> str:
         """Rephrase or improve a specific section"""
-        prompt = f"""
-        {self.system_prompt}
-        
-        Rephrase the following {section_name} section with the instruction: {instruction}
-        
-        Original content:
-        {section_content}
+        prompt = get_template('rephrase').render(
+            f"Section: {section_name}\nInstruction: {instruction}\n\n{section_content}"
+        )
+        return self._generate_content(prompt, f"rephrase_{section_name}", **options)
+    
+    def rephrase_span(self, section_content: str, section_name: str, start: int, end: int,
+                      instruction: str = "improve clarity", **options) -> str:
+        """Rephrase characters start:end of a section and return the section with the rewrite spliced in
         
-        Please provide the improved version while maintaining:
-        1. All technical accuracy
-        2. Patent-appropriate language
-        3. Complete information
-        4. Professional tone
+        Only the span and REPHRASE_CONTEXT_CHARS of text either side of it are sent, so fixing
+        one paragraph of a long section costs tokens in proportion to the paragraph.
+        """
+        if not 0 <= start < end <= len(section_content):
+            raise ValueError(f"Span must satisfy 0 <= start < end <= {len(section_content)}")
+        passage = section_content[start:end]
+        if not passage.strip():
+            raise ValueError("The selected span is empty")
+        
+        before, after = context_window(section_content, start, end, Config.REPHRASE_CONTEXT_CHARS)
+        prompt = self._render_prompt('rephrase_span', {
+            'section': section_name.replace('_', ' '),
+            'instruction': instruction,
+            'before': before.strip() or '(start of section)',
+            'passage': passage.strip(),
+            'after': after.strip() or '(end of section)'
+        })
+        rewritten = self._generate_content(prompt, "rephrase_span", **options)
+        # Keep the whitespace around the span so paragraph breaks survive the splice
+        leading = passage[:len(passage) - len(passage.lstrip())]
+        trailing = passage[len(passage.rstrip()):]
+        return section_content[:start] + leading + rewritten.strip() + trailing + section_content[end:]
+    
+    def _completion_params(self, prompt: str, route: Route) -> Dict:
+        """Build the chat completion request parameters for a prompt"""
+        return {
+            'model': route.model,
+            'max_tokens': route.max_tokens,
+            'temperature': route.temperature,
+            'top_p': route.top_p,
+            'messages': [
+                {"role": "system", "content": self.system_prompt},
+                {"role": "user", "content": prompt}
+            ]
+        }
+    
+    def _log_prompt_size(self, section_name: str, params: Dict, route: Route) -> int:
+        """Log the route and prompt tokens of a request and return the token count"""
+        prompt_tokens = sum(count_tokens(message['content'], params['model']) for message in params['messages'])
+        logger.info(
+            "Sending %s request via route %s (model=%s, max_tokens=%d, temperature=%.2f): %d prompt tokens",
+            section_name, route.name, route.model, route.max_tokens, route.temperature, prompt_tokens
+        )
+        return prompt_tokens
+    
+    def _cached_completion(self, cache_key: Optional[str], bypass_cache: bool, route: Route) -> Optional[str]:
+        if not cache_key or bypass_cache:
+            return None
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            logger.info("Answered %s from the completion cache via route %s", route.section, route.name)
+            meter = current_meter()
+            if meter:
+                meter.record_cache_hit(route)
+        return cached
+    
+    @contextmanager
+    def _admit(self, prompt_tokens: int, params: Dict):
+        """Wait for shared provider capacity before sending a request"""
+        if self.governor is None:
+            yield None
+            return
+        with self.governor.admit(prompt_tokens + params['max_tokens']) as reservation:
+            yield reservation
+    
+    def _is_quota_error(self, error: Exception) -> bool:
+        return self.provider.is_quota_error(error)
+    
+    def _is_retryable(self, error: Exception) -> bool:
+        """Transient provider failures that are worth retrying and count against the circuit breaker"""
+        return self.provider.is_retryable(error)
+    
+    def _log_retry(self, section_name: str, attempt: int, error: Exception):
+        logger.warning("Retrying %s generation (retry %d) after provider error: %s", section_name, attempt, error)
+        meter = current_meter()
+        if meter:
+            meter.record_retry()
+    
+    def _generate_content(self, prompt: str, section_name: str, bypass_cache: bool = False,
+                          profile: Optional[str] = None) -> str:
+        """Generate content using OpenAI API with error handling
         
-        Format the response as clean text without markdown formatting.
+        The routing table picks the model and sampling settings for the section, operation and
+        profile. Identical requests are answered from the completion cache unless bypass_cache
+        is set, in which case a fresh completion is requested and replaces the cached one.
         """
+        route = self.router.resolve(section_name, profile)
+        params = self._completion_params(prompt, route)
+        cache_key = self.cache.make_key(params) if self.cache else None
+        cached = self._cached_completion(cache_key, bypass_cache, route)
+        if cached is not None:
+            return cached
+        
+        prompt_tokens = self._log_prompt_size(section_name, params, route)
+        timings = {'queue_wait': 0.0, 'latency': 0.0}
+        
+        def request():
+            waiting = time.time()
+            with self._admit(prompt_tokens, params) as reservation:
+                sent = time.time()
+                timings['queue_wait'] += sent - waiting
+                try:
+                    completion = self.provider.complete(params)
+                finally:
+                    timings['latency'] += time.time() - sent
+            if reservation:
+                reservation.settle(completion.total_tokens)
+            return completion
         
-        return self._generate_content(prompt, f"rephrase_{section_name}")
-    
-    def _generate_content(self, prompt: str, section_name: str) -> str:
-        """Generate content using OpenAI API with error handling"""
         try:
-            response = self.client.chat.completions.create(
-                model="gpt-3.5-turbo",  # Changed from gpt-4 to gpt-3.5-turbo
-                max_tokens=2000,
-                temperature=0.7,
-                top_p=0.9,
-                messages=[
-                    {"role": "system", "content": self.system_prompt},
-                    {"role": "user", "content": prompt}
-                ]
-            )
-            
-            content = response.choices[0].message.content.strip()
-            return content
-            
-        except openai.APIError as e:
-            if "insufficient_quota" in str(e) or "quota" in str(e).lower():
+            completion = call_with_retries(request, self._is_retryable, self.breaker,
+                                           on_retry=lambda attempt, e: self._log_retry(section_name, attempt, e))
+        except self.provider.error_types as e:
+            if self._is_quota_error(e):
                 print(f"⚠️ OpenAI quota exceeded. Using mock content for {section_name}")
                 return self._generate_mock_content(section_name)
             else:
                 raise Exception(f"OpenAI API error: {str(e)}")
-        except Exception as e:
-            print(f"⚠️ Error with OpenAI API. Using mock content for {section_name}")
-            return self._generate_mock_content(section_name)
+        except ProviderUnavailableError:
+            if Config.AI_MOCK_FALLBACK:
+                print(f"⚠️ Error with OpenAI API. Using mock content for {section_name}")
+                return self._generate_mock_content(section_name)
+            raise
+        
+        content = completion.content.strip()
+        meter = current_meter()
+        if meter:
+            meter.record_call(
+                route,
+                completion.prompt_tokens if completion.prompt_tokens is not None else prompt_tokens,
+                completion.completion_tokens if completion.completion_tokens is not None else count_tokens(content, route.model),
+                timings['latency'],
+                timings['queue_wait'],
+                cached_tokens=completion.cached_tokens
+            )
+            if completion.cached_tokens:
+                logger.info("Provider served %d of %d prompt tokens for %s from its prefix cache",
+                            completion.cached_tokens, completion.prompt_tokens or prompt_tokens, section_name)
+        if cache_key:
+            self.cache.set(cache_key, content, params)
+        return content
+    
+    def _stream_content(self, prompt: str, section_name: str, bypass_cache: bool = False,
+                        profile: Optional[str] = None) -> Iterator[str]:
+        """Stream content deltas from the OpenAI API with the same fallbacks as _generate_content"""
+        route = self.router.resolve(section_name, profile)
+        params = self._completion_params(prompt, route)
+        cache_key = self.cache.make_key(params) if self.cache else None
+        cached = self._cached_completion(cache_key, bypass_cache, route)
+        if cached is not None:
+            yield cached
+            return
+        
+        prompt_tokens = self._log_prompt_size(section_name, params, route)
+        waiting = time.time()
+        # The provider slot stays held until the stream is fully consumed
+        with self._admit(prompt_tokens, params) as reservation:
+            sent = time.time()
+            try:
+                # Only opening the stream is retried; tokens already sent cannot be taken back
+                stream = call_with_retries(
+                    lambda: self.provider.open_stream(params),
+                    self._is_retryable, self.breaker,
+                    on_retry=lambda attempt, e: self._log_retry(section_name, attempt, e)
+                )
+            except self.provider.error_types as e:
+                if self._is_quota_error(e):
+                    print(f"⚠️ OpenAI quota exceeded. Using mock content for {section_name}")
+                    yield self._generate_mock_content(section_name)
+                    return
+                raise Exception(f"OpenAI API error: {str(e)}")
+            except ProviderUnavailableError:
+                if Config.AI_MOCK_FALLBACK:
+                    print(f"⚠️ Error with OpenAI API. Using mock content for {section_name}")
+                    yield self._generate_mock_content(section_name)
+                    return
+                raise
+            
+            parts = []
+            try:
+                for delta in stream:
+                    parts.append(delta)
+                    yield delta
+            except Exception as e:
+                if not self._is_retryable(e):
+                    raise
+                self.breaker.record_failure()
+                raise ProviderUnavailableError(f"AI provider stream failed: {str(e)}") from e
+        
+        content = ''.join(parts).strip()
+        # Streamed responses carry no usage block, so count the completion locally
+        completion_tokens = count_tokens(content, params['model'])
+        if reservation:
+            reservation.settle(prompt_tokens + completion_tokens)
+        meter = current_meter()
+        if meter:
+            meter.record_call(route, prompt_tokens, completion_tokens, time.time() - sent, sent - waiting)
+        if cache_key:
+            self.cache.set(cache_key, content, params)
     
     def _generate_mock_content(self, section_name: str) -> str:
         """Generate mock content for testing when OpenAI is not available"""
@@ -278,26 +695,5 @@ The present invention relates to a comprehensive technological solution that add
         return mock_content.get(section_name, f"Mock content for {section_name} section.")
     
     def validate_content(self, content: str, section_name: str) -> Dict:
-        """Validate generated content for patent requirements"""
-        validation_result = {
-            'is_valid': True,
-            'issues': [],
-            'suggestions': []
-        }
-        
-        # Basic validation checks
-        if not content or len(content.strip()) < 50:
-            validation_result['is_valid'] = False
-            validation_result['issues'].append("Content is too short")
-        
-        if len(content) > 5000:
-            validation_result['suggestions'].append("Content might be too long for this section")
-        
-        # Check for common issues
-        if 'marketing' in content.lower() or 'amazing' in content.lower() or 'revolutionary' in content.lower():
-            validation_result['issues'].append("Contains marketing language inappropriate for patents")
-        
-        if 'i' in content.lower() or 'we' in content.lower():
-            validation_result['suggestions'].append("Consider using third person instead of first person")
-        
-        return validation_result 
\ No newline at end of file
+        """Validate generated content for patent requirements (see patent_lint.py)"""
+        return lint_section(content, section_name).to_validation()
\ No newline at end of file
@@ -11,6 +11,7 @@ load_dotenv()
 # Import drafting module components
 from database import init_database, create_indexes
 from drafting_routes import drafting_bp
+from jobs_routes import jobs_bp
 from config import config
 
 app = Flask(__name__)
@@ -24,6 +25,7 @@ init_database(app)
 
 # Register blueprints
 app.register_blueprint(drafting_bp)
+app.register_blueprint(jobs_bp)
 
 # Create database indexes
 with app.app_context():
@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+"""
+Batch intake of invention disclosures
+
+Creates a project and draft for every disclosure in a CSV or JSONL file and generates the
+full specification for each of them:
+    
+    python batch_drafting.py disclosures.csv --user-id firm_user --concurrency 4
+    python batch_drafting.py disclosures.jsonl --queue    # hand generation to job_queue.py workers
+"""
+
+import argparse
+import csv
+import io
+import json
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+from config import Config
+
+DISCLOSURE_FIELDS = ('title', 'field_of_invention', 'brief_summary', 'key_components', 'problem_solved')
+
+def detect_format(filename: str = '', content_type: str = '') -> str:
+    """Work out whether an upload is CSV or JSONL from its name or content type"""
+    filename = (filename or '').lower()
+    if filename.endswith(('.jsonl', '.ndjson')) or 'ndjson' in (content_type or '') or 'jsonl' in (content_type or ''):
+        return 'jsonl'
+    return 'csv'
+
+def parse_disclosures(text: str, fmt: str = 'csv') -> Tuple[List[Dict], List[Dict]]:
+    """Read disclosures from CSV or JSONL text; returns (records, rejected rows)"""
+    if fmt == 'jsonl':
+        rows = []
+        for line in text.splitlines():
+            if not line.strip():
+                continue
+            try:
+                rows.append(json.loads(line))
+            except ValueError as e:
+                rows.append(e)
+    else:
+        rows = list(csv.DictReader(io.StringIO(text.lstrip('\ufeff'))))
+    return normalize_disclosures(rows)
+
+def normalize_disclosures(rows: List) -> Tuple[List[Dict], List[Dict]]:
+    """Keep the known disclosure fields of each row and reject rows without a title"""
+    records, rejected = [], []
+    for number, row in enumerate(rows, start=1):
+        if not isinstance(row, dict):
+            rejected.append({'row': number, 'error': f'Invalid row: {row}'})
+            continue
+        record = {field: str(row.get(field) or '').strip() for field in DISCLOSURE_FIELDS}
+        record['project_title'] = str(row.get('project_title') or '').strip()
+        if not record['title']:
+            rejected.append({'row': number, 'error': 'title is required'})
+            continue
+        record['row'] = number
+        records.append(record)
+    return records, rejected
+
+def create_batch_drafts(records: List[Dict], user_id: str,
+                        batch_id: str = None) -> Tuple[str, List, List[Dict]]:
+    """Bulk insert a project and a draft per disclosure; returns (batch_id, drafts, rejected)"""
+    from mongoengine.errors import ValidationError
+    from models import Project, Draft
+    from similarity_index import index_new_drafts
+    
+    batch_id = batch_id or uuid.uuid4().hex
+    now = datetime.utcnow()
+    projects, drafts, rejected = [], [], []
+    
+    for record in records:
+        project = Project(
+            user_id=user_id,
+            title=(record['project_title'] or record['title'])[:200],
+            description=f"Batch intake {batch_id}",
+            created_at=now,
+            updated_at=now
+        )
+        draft = Draft(
+            project_id='pending',
+            batch_id=batch_id,
+            current_step=1,
+            created_at=now,
+            updated_at=now,
+            **{field: record[field] for field in DISCLOSURE_FIELDS}
+        )
+        # Bulk inserts skip model validation, so validate each row up front
+        try:
+            project.validate()
+            draft.validate()
+        except ValidationError as e:
+            rejected.append({'row': record.get('row'), 'error': str(e)})
+            continue
+        projects.append(project)
+        drafts.append(draft)
+    
+    if not drafts:
+        return batch_id, [], rejected
+    
+    projects = Project.objects.insert(projects)
+    for project, draft in zip(projects, drafts):
+        draft.project_id = str(project.id)
+    drafts = Draft.objects.insert(drafts)
+    # Bulk inserts skip Draft.save, so the disclosures are indexed here for the similar drafts lookup
+    index_new_drafts([draft.to_dict() for draft in drafts])
+    return batch_id, drafts, rejected
+
+class BatchProgress:
+    """Thread-safe progress, throughput and failure tracking for an in-process batch run"""
+    
+    def __init__(self, total: int):
+        self.total = total
+        self.succeeded = 0
+        self.failures = {}
+        self.started_at = time.time()
+        self._lock = threading.Lock()
+    
+    def record(self, draft_id: str, error: Optional[str] = None):
+        with self._lock:
+            if error is None:
+                self.succeeded += 1
+            else:
+                self.failures[draft_id] = error
+    
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return progress_summary(self.total, self.succeeded, len(self.failures),
+                                    time.time() - self.started_at,
+                                    [{'draft_id': draft_id, 'error': error} for draft_id, error in self.failures.items()])
+
+def progress_summary(total: int, succeeded: int, failed: int, elapsed: float, failures: List[Dict]) -> Dict:
+    """Progress figures shared by the CLI and the batch status endpoint"""
+    completed = succeeded + failed
+    rate = completed / elapsed if elapsed > 0 else 0.0
+    remaining = total - completed
+    return {
+        'total': total,
+        'completed': completed,
+        'succeeded': succeeded,
+        'failed': failed,
+        'pending': remaining,
+        'elapsed_seconds': round(elapsed, 1),
+        'drafts_per_minute': round(rate * 60, 2),
+        'eta_seconds': round(remaining / rate, 1) if rate and remaining else None,
+        'failures': failures
+    }
+
+def run_batch(ai_service, drafts: List, max_workers: int = None, options: Dict = None,
+              on_progress: Callable[[Dict, str], None] = None) -> BatchProgress:
+    """Generate the specification for every draft, at most max_workers drafts at a time"""
+    from models import Draft
+    
+    progress = BatchProgress(len(drafts))
+    options = options or {}
+    
+    def generate(draft):
+        draft_id = str(draft.id)
+        result = ai_service.generate_specification(
+            draft.to_dict(),
+            on_complete=lambda section, content, usage: Draft.apply_generated_section(draft_id, section, content, usage=usage),
+            on_error=lambda section, error: Draft.record_generation_failure(draft_id, section, error),
+            **options
+        )
+        Draft.set_section_fingerprints(draft_id, result['fingerprints'])
+        if result['errors']:
+            raise Exception(f"Failed to generate: {', '.join(result['errors'])}")
+    
+    with ThreadPoolExecutor(max_workers=max_workers or Config.BATCH_CONCURRENCY) as executor:
+        futures = {executor.submit(generate, draft): str(draft.id) for draft in drafts}
+        for future in as_completed(futures):
+            draft_id = futures[future]
+            error = future.exception()
+            progress.record(draft_id, str(error) if error else None)
+            if on_progress:
+                on_progress(progress.snapshot(), draft_id)
+    return progress
+
+def batch_status(batch_id: str) -> Optional[Dict]:
+    """Progress of a batch whose generation was handed to the job queue"""
+    from models import GenerationJob
+    
+    counts = {}
+    first_created, last_finished = None, None
+    for group in GenerationJob.objects(batch_id=batch_id).aggregate([
+        {'$group': {
+            '_id': '$status',
+            'count': {'$sum': 1},
+            'first_created': {'$min': '$created_at'},
+            'last_finished': {'$max': '$finished_at'}
+        }}
+    ]):
+        counts[group['_id']] = group['count']
+        first_created = min(filter(None, [first_created, group['first_created']]), default=None)
+        last_finished = max(filter(None, [last_finished, group['last_finished']]), default=None)
+    
+    total = sum(counts.values())
+    if not total:
+        return None
+    
+    failed = counts.get('failed', 0) + counts.get('cancelled', 0)
+    done = counts.get('succeeded', 0) + failed == total
+    end = last_finished if done and last_finished else datetime.utcnow()
+    failures = [
+        {'draft_id': job.draft_id, 'error': job.error or job.status}
+        for job in GenerationJob.objects(batch_id=batch_id, status__in=['failed', 'cancelled']).only('draft_id', 'error', 'status')
+    ]
+    summary = progress_summary(total, counts.get('succeeded', 0), failed,
+                               (end - first_created).total_seconds(), failures)
+    summary.update({'batch_id': batch_id, 'queued': counts.get('queued', 0), 'running': counts.get('running', 0)})
+    return summary
+
+def print_progress(summary: Dict, draft_id: str = None):
+    line = (f"[{summary['completed']}/{summary['total']}] {summary['succeeded']} ok, {summary['failed']} failed, "
+            f"{summary['drafts_per_minute']} drafts/min")
+    if summary['eta_seconds']:
+        line += f", ~{int(summary['eta_seconds'])}s left"
+    errors = {failure['draft_id']: failure['error'] for failure in summary['failures']}
+    if draft_id in errors:
+        line += f"  ❌ {draft_id}: {errors[draft_id]}"
+    print(line, flush=True)
+
+def main():
+    parser = argparse.ArgumentParser(description='Create and generate patent drafts from a file of disclosures')
+    parser.add_argument('path', help='CSV or JSONL file with title, field_of_invention, brief_summary, '
+                                     'key_components and problem_solved columns')
+    parser.add_argument('--user-id', default='default_user')
+    parser.add_argument('--concurrency', type=int, default=Config.BATCH_CONCURRENCY,
+                        help='drafts generated at the same time (default: BATCH_CONCURRENCY)')
+    parser.add_argument('--queue', action='store_true',
+                        help='queue the generation for job_queue.py workers instead of running it here')
+    parser.add_argument('--no-generate', action='store_true', help='only create the drafts')
+    args = parser.parse_args()
+    
+    from database import connect_database
+    connect_database()
+    
+    with open(args.path, encoding='utf-8') as handle:
+        records, rejected = parse_disclosures(handle.read(), detect_format(args.path))
+    batch_id, drafts, invalid = create_batch_drafts(records, args.user_id)
+    rejected += invalid
+    print(f"Batch {batch_id}: created {len(drafts)} drafts, rejected {len(rejected)} rows")
+    for row in rejected:
+        print(f"  ❌ row {row['row']}: {row['error']}")
+    if args.no_generate or not drafts:
+        return
+    
+    if args.queue:
+        from job_queue import JobQueue
+        JobQueue().enqueue_many([str(draft.id) for draft in drafts], 'specification',
+                                priority=Config.BATCH_JOB_PRIORITY, batch_id=batch_id)
+        summary = batch_status(batch_id)
+        while summary and summary['pending']:
+            print_progress(summary)
+            time.sleep(5)
+            summary = batch_status(batch_id)
+    else:
+        from ai_service import PatentAIService
+        summary = run_batch(PatentAIService(), drafts, args.concurrency, on_progress=print_progress).snapshot()
+    
+    print(f"Done in {summary['elapsed_seconds']}s: {summary['succeeded']} succeeded, {summary['failed']} failed")
+    sys.exit(1 if summary['failed'] else 0)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Benchmark the user projects listing: database round trips and time per project count
+
+Compares the old per-project draft count (1 + N queries) with the $group listing
+used by GET /drafts/projects/<user_id>. Seeds throwaway projects and drafts in the
+database chosen by FLASK_CONFIG (default "testing") and removes them afterwards.
+
+Usage: python benchmark_project_listing.py [project counts...]
+"""
+
+import os
+import sys
+import time
+from dotenv import load_dotenv
+from pymongo import monitoring
+from mongoengine import connect, disconnect
+
+load_dotenv()
+
+from config import config
+from models import Project, Draft
+
+BENCH_USER = 'benchmark_project_listing'
+DRAFTS_PER_PROJECT = 3
+
+class CommandCounter(monitoring.CommandListener):
+    """Count the commands sent to the server, i.e. round trips"""
+    
+    def __init__(self):
+        self.count = 0
+    
+    def started(self, event):
+        self.count += 1
+    
+    def succeeded(self, event):
+        pass
+    
+    def failed(self, event):
+        pass
+
+def seed(project_count):
+    projects = Project.objects.insert([
+        Project(user_id=BENCH_USER, title=f'Benchmark project {index}') for index in range(project_count)
+    ])
+    Draft.objects.insert([
+        Draft(project_id=str(project.id), title=f'{project.title} draft {index}')
+        for project in projects for index in range(DRAFTS_PER_PROJECT)
+    ])
+    return projects
+
+def cleanup():
+    project_ids = [str(project.id) for project in Project.objects(user_id=BENCH_USER).only('id')]
+    Draft.objects(project_id__in=project_ids).delete()
+    Project.objects(user_id=BENCH_USER).delete()
+
+def measure(counter, list_projects):
+    counter.count = 0
+    started = time.time()
+    projects = list_projects()
+    return counter.count, (time.time() - started) * 1000, projects
+
+def per_project_counts():
+    return [project.to_dict() for project in Project.objects(user_id=BENCH_USER).order_by('-updated_at')]
+
+def grouped_counts():
+    return Project.list_with_draft_counts(Project.objects(user_id=BENCH_USER).order_by('-updated_at'))
+
+def main():
+    sizes = [int(size) for size in sys.argv[1:]] or [10, 100, 500]
+    app_config = config[os.getenv('FLASK_CONFIG', 'testing')]
+    counter = CommandCounter()
+    connect(db=app_config.MONGODB_DB, host=app_config.MONGODB_URI, alias='default', event_listeners=[counter])
+    print(f"Database: {app_config.MONGODB_DB}")
+    print(f"{'projects':>9} | {'per-project queries':>20} {'ms':>9} | {'$group queries':>16} {'ms':>9}")
+    
+    try:
+        cleanup()
+        for size in sizes:
+            seed(size)
+            old_queries, old_ms, old_projects = measure(counter, per_project_counts)
+            new_queries, new_ms, new_projects = measure(counter, grouped_counts)
+            # Projects seeded together share updated_at, so compare without relying on tie order
+            if sorted(old_projects, key=lambda project: project['id']) != sorted(new_projects, key=lambda project: project['id']):
+                print(f"❌ Listings differ for {size} projects")
+                return False
+            print(f"{size:>9} | {old_queries:>20} {old_ms:>9.1f} | {new_queries:>16} {new_ms:>9.1f}")
+            cleanup()
+    finally:
+        cleanup()
+        disconnect(alias='default')
+    return True
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
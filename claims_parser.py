@@ -0,0 +1,231 @@
+import re
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+# Claim starts such as "Claim 1:", "1." or "1)" at the beginning of a line (see claim_markers)
+CLAIM_START = re.compile(r'^[ \t]*(claim[ \t]+)?(\d+)[ \t]*[:.)]', re.IGNORECASE | re.MULTILINE)
+# "claim 2", "claims 1 or 2", "any one of claims 1 to 3", "claims 1-3"
+CLAIM_REFERENCE = re.compile(r'\b(claims?\s+)(\d+)(?:(\s*(?:-|to|or|and)\s*)(\d+))?', re.IGNORECASE)
+# Label and heading the model may put in front of a single claim
+LEADING_LABEL = re.compile(r'^\s*(?:claims?\s*\n+)?\s*(?:claim\s+)?\d+\s*[:.)]\s*', re.IGNORECASE)
+
+class ClaimNotFoundError(LookupError):
+    """Raised when an edit refers to a claim number the draft does not have"""
+
+def _previous_line(text: str, position: int) -> Tuple[str, bool]:
+    """The last non-empty line before position, and whether a blank line separates them"""
+    lines = text[:position].split('\n')[:-1]
+    blank = False
+    while lines and not lines[-1].strip():
+        lines.pop()
+        blank = True
+    return (lines[-1].strip() if lines else ''), blank
+
+def claim_markers(text: str) -> List[re.Match]:
+    """The markers that start claims, in the label style of the first marker
+    
+    With "Claim N:" labels, only those labels start claims. With "N." numbering, a line starting
+    with the next claim number starts a new claim, one after a blank line always does, and the
+    numbered items of a list introduced by a line ending in ":" (the steps of a method claim)
+    stay part of their claim.
+    """
+    markers = list(CLAIM_START.finditer(text))
+    if not markers:
+        return []
+    if markers[0].group(1):
+        return [marker for marker in markers if marker.group(1)]
+    
+    starts = markers[:1]
+    expected = int(markers[0].group(2)) + 1
+    next_item = None
+    for marker in markers[1:]:
+        number = int(marker.group(2))
+        previous, blank = _previous_line(text, marker.start())
+        if previous.endswith(':'):
+            next_item = number + 1
+        elif number == next_item and not previous.endswith('.'):
+            next_item += 1
+        elif number == expected or blank:
+            starts.append(marker)
+            expected, next_item = number + 1, None
+    return starts
+
+def split_claims(text: str) -> List[Tuple[int, int, str]]:
+    """Split claims text into (number, offset, text) using its "Claim N:" or "N." markers"""
+    starts = claim_markers(text)
+    if not starts:
+        return [(1, 0, text)] if text.strip() else []
+    claims = []
+    for index, match in enumerate(starts):
+        end = starts[index + 1].start() if index + 1 < len(starts) else len(text)
+        claims.append((int(match.group(2)), match.end(), text[match.end():end]))
+    return claims
+
+def claim_references(text: str, expand_ranges: bool = True) -> List[int]:
+    """Claim numbers a claim's text refers to, expanding ranges such as "claims 1 to 3" """
+    numbers = []
+    for match in CLAIM_REFERENCE.finditer(text):
+        first = int(match.group(2))
+        numbers.append(first)
+        if match.group(4):
+            last = int(match.group(4))
+            if expand_ranges and match.group(3).strip() in ('-', 'to') and first < last:
+                numbers.extend(range(first + 1, last + 1))
+            else:
+                numbers.append(last)
+    return numbers
+
+def strip_claim_label(text: str) -> str:
+    """Remove a "CLAIMS" heading and "Claim N:" label from a single generated claim"""
+    return LEADING_LABEL.sub('', text.strip(), count=1).strip()
+
+class Claim(NamedTuple):
+    """One claim, without its number label; depends_on lists the earlier claims it refers to"""
+    number: int
+    text: str
+    depends_on: Tuple[int, ...] = ()
+    
+    @property
+    def independent(self) -> bool:
+        return not self.depends_on
+    
+    def to_dict(self) -> Dict:
+        return {
+            'number': self.number,
+            'text': self.text,
+            'depends_on': list(self.depends_on),
+            'independent': self.independent
+        }
+
+def make_claim(number: int, text: str) -> Claim:
+    text = text.strip()
+    parents = sorted({ref for ref in claim_references(text) if ref < number})
+    return Claim(number, text, tuple(parents))
+
+class ClaimTree:
+    """Claims parsed into numbered nodes linked by their "claim N" references
+    
+    Edits return a new tree. Inserting or removing a claim renumbers only the claims after it,
+    and only claims that refer to a renumbered claim have their text rewritten.
+    """
+    
+    def __init__(self, claims: Iterable[Claim], heading: str = '', label: str = 'Claim {}:'):
+        self.claims = list(claims)
+        self.heading = heading
+        self.label = label
+        self._index = {claim.number: claim for claim in self.claims}
+    
+    @classmethod
+    def parse(cls, text: str) -> 'ClaimTree':
+        text = text or ''
+        parts = split_claims(text)
+        markers = claim_markers(text)
+        first = markers[0] if markers else None
+        heading = text[:first.start()].strip() if first else ''
+        # Keep "1." style numbering if that is what the claims were written with
+        label = 'Claim {}:' if not first or first.group(1) else '{}.'
+        # Claims are renumbered by position, so gaps and duplicates in the text are repaired
+        return cls(
+            [make_claim(position, body) for position, (_, _, body) in enumerate(parts, start=1)],
+            heading, label
+        )
+    
+    def __len__(self) -> int:
+        return len(self.claims)
+    
+    def get(self, number: int) -> Claim:
+        if number not in self._index:
+            raise ClaimNotFoundError(f"Claim {number} not found")
+        return self._index[number]
+    
+    def ancestors(self, number: int) -> List[Claim]:
+        """Every claim the given claim depends on, directly or through its parents, in order"""
+        seen = set()
+        pending = list(self.get(number).depends_on)
+        while pending:
+            parent = pending.pop()
+            if parent in seen or parent not in self._index:
+                continue
+            seen.add(parent)
+            pending.extend(self._index[parent].depends_on)
+        return [self._index[parent] for parent in sorted(seen)]
+    
+    def dependents(self, number: int, named_only: bool = False) -> List[int]:
+        """Claims that refer to the given one; named_only skips claims that only cover it with a range"""
+        if named_only:
+            return [claim.number for claim in self.claims if number in claim_references(claim.text, expand_ranges=False)]
+        return [claim.number for claim in self.claims if number in claim.depends_on]
+    
+    def counts(self) -> Dict[str, int]:
+        independent = sum(1 for claim in self.claims if claim.independent)
+        return {'total': len(self.claims), 'independent': independent, 'dependent': len(self.claims) - independent}
+    
+    def render_claims(self, claims: Iterable[Claim]) -> str:
+        return '\n\n'.join(f"{self.label.format(claim.number)} {claim.text}" for claim in claims)
+    
+    def render(self) -> str:
+        """Claims text in the draft's format, one blank line between claims"""
+        body = self.render_claims(self.claims)
+        return f"{self.heading}\n\n{body}" if self.heading and body else body or self.heading
+    
+    def to_list(self) -> List[Dict]:
+        return [claim.to_dict() for claim in self.claims]
+    
+    def replace(self, number: int, text: str) -> 'ClaimTree':
+        """Swap in new text for one claim; its dependencies are re-read from the new text"""
+        self.get(number)
+        claims = [make_claim(number, text) if claim.number == number else claim for claim in self.claims]
+        return ClaimTree(claims, self.heading, self.label)
+    
+    def insert(self, text: str, position: Optional[int] = None) -> 'ClaimTree':
+        """Add a claim so that it becomes claim `position` (the end by default)
+        
+        The new text must use numbers from before the insert; references to claims that move
+        are updated along with everyone else's.
+        """
+        last = len(self.claims) + 1
+        position = last if position is None else position
+        if not 1 <= position <= last:
+            raise ValueError(f"Claim position must be between 1 and {last}")
+        mapping = {claim.number: claim.number + 1 for claim in self.claims if claim.number >= position}
+        claims = self._renumber(mapping)
+        claims.insert(position - 1, make_claim(position, self._rewrite_references(text, mapping)))
+        return ClaimTree(claims, self.heading, self.label)
+    
+    def remove(self, number: int) -> 'ClaimTree':
+        """Delete a claim that no other claim names as its parent; ranges over it just shrink"""
+        self.get(number)
+        dependents = self.dependents(number, named_only=True)
+        if dependents:
+            raise ValueError(
+                f"Claim {number} cannot be removed while claims {', '.join(map(str, dependents))} depend on it"
+            )
+        mapping = {claim.number: claim.number - 1 for claim in self.claims if claim.number > number}
+        return ClaimTree(self._renumber(mapping, skip=number), self.heading, self.label)
+    
+    def _renumber(self, mapping: Dict[int, int], skip: Optional[int] = None) -> List[Claim]:
+        """Apply an old -> new number mapping, touching only the claims it affects"""
+        claims = []
+        for claim in self.claims:
+            if claim.number == skip:
+                continue
+            if claim.number not in mapping and not any(parent in mapping for parent in claim.depends_on):
+                claims.append(claim)
+                continue
+            number = mapping.get(claim.number, claim.number)
+            claims.append(make_claim(number, self._rewrite_references(claim.text, mapping)))
+        return claims
+    
+    @staticmethod
+    def _rewrite_references(text: str, mapping: Dict[int, int]) -> str:
+        if not mapping:
+            return text
+        
+        def rewrite(match):
+            first = mapping.get(int(match.group(2)), int(match.group(2)))
+            rewritten = f"{match.group(1)}{first}"
+            if match.group(4):
+                last = mapping.get(int(match.group(4)), int(match.group(4)))
+                rewritten += f"{match.group(3)}{last}"
+            return rewritten
+        
+        return CLAIM_REFERENCE.sub(rewrite, text)
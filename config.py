@@ -1,4 +1,5 @@
 import os
+import tempfile
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -18,6 +19,87 @@ class Config:
     # OpenAI settings
     OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
     
+    # LLM provider: openai, or local for the stand-in server in local_llm_server.py
+    LLM_PROVIDER = os.getenv('LLM_PROVIDER', 'openai')
+    LLM_MODEL = os.getenv('LLM_MODEL', 'gpt-3.5-turbo')
+    LLM_FAST_MODEL = os.getenv('LLM_FAST_MODEL', 'gpt-4o-mini')
+    LLM_QUALITY_MODEL = os.getenv('LLM_QUALITY_MODEL', 'gpt-4o')
+    LOCAL_LLM_BASE_URL = os.getenv('LOCAL_LLM_BASE_URL', 'http://127.0.0.1:8001/v1')
+    
+    # AI generation settings
+    DEFAULT_GENERATION_PROFILE = os.getenv('DEFAULT_GENERATION_PROFILE', 'balanced')  # fast, balanced or quality
+    MODEL_ROUTING_FILE = os.getenv('MODEL_ROUTING_FILE')  # optional JSON overrides for the routing table
+    MODEL_PRICES_FILE = os.getenv('MODEL_PRICES_FILE')  # optional JSON of model -> [prompt, completion] USD per 1M tokens
+    PIPELINE_MAX_WORKERS = int(os.getenv('PIPELINE_MAX_WORKERS', '6'))
+    
+    # OpenAI retry and circuit breaker settings; the total stays under gunicorn's 120s timeout
+    OPENAI_REQUEST_TIMEOUT_SECONDS = float(os.getenv('OPENAI_REQUEST_TIMEOUT_SECONDS', '45'))
+    OPENAI_TOTAL_TIMEOUT_SECONDS = float(os.getenv('OPENAI_TOTAL_TIMEOUT_SECONDS', '100'))
+    OPENAI_MAX_RETRIES = int(os.getenv('OPENAI_MAX_RETRIES', '3'))
+    OPENAI_RETRY_BASE_SECONDS = float(os.getenv('OPENAI_RETRY_BASE_SECONDS', '0.5'))
+    OPENAI_RETRY_MAX_SECONDS = float(os.getenv('OPENAI_RETRY_MAX_SECONDS', '8'))
+    CIRCUIT_BREAKER_FAILURE_THRESHOLD = int(os.getenv('CIRCUIT_BREAKER_FAILURE_THRESHOLD', '5'))
+    CIRCUIT_BREAKER_RESET_SECONDS = float(os.getenv('CIRCUIT_BREAKER_RESET_SECONDS', '30'))
+    AI_MOCK_FALLBACK = os.getenv('AI_MOCK_FALLBACK', 'False').lower() == 'true'
+    
+    # OpenAI rate limits shared by every worker on the host
+    OPENAI_RATE_LIMIT_ENABLED = os.getenv('OPENAI_RATE_LIMIT_ENABLED', 'True').lower() == 'true'
+    OPENAI_RPM_LIMIT = int(os.getenv('OPENAI_RPM_LIMIT', '3500'))
+    OPENAI_TPM_LIMIT = int(os.getenv('OPENAI_TPM_LIMIT', '60000'))
+    OPENAI_MAX_IN_FLIGHT = int(os.getenv('OPENAI_MAX_IN_FLIGHT', '8'))
+    OPENAI_QUEUE_TIMEOUT_SECONDS = float(os.getenv('OPENAI_QUEUE_TIMEOUT_SECONDS', '30'))
+    RATE_LIMIT_BURST_SECONDS = float(os.getenv('RATE_LIMIT_BURST_SECONDS', '10'))
+    RATE_LIMIT_STATE_DIR = os.getenv('RATE_LIMIT_STATE_DIR', os.path.join(tempfile.gettempdir(), 'patentpilot_ratelimit'))
+    
+    # Coalescing of concurrent identical generations
+    SINGLE_FLIGHT_LEASE_SECONDS = float(os.getenv('SINGLE_FLIGHT_LEASE_SECONDS', '130'))
+    
+    # Background generation queue (run workers with: python job_queue.py --workers 4)
+    GENERATION_QUEUE_ENABLED = os.getenv('GENERATION_QUEUE_ENABLED', 'False').lower() == 'true'
+    JOB_WORKERS = int(os.getenv('JOB_WORKERS', '4'))
+    JOB_MAX_ATTEMPTS = int(os.getenv('JOB_MAX_ATTEMPTS', '3'))
+    JOB_LEASE_SECONDS = float(os.getenv('JOB_LEASE_SECONDS', '60'))
+    JOB_POLL_INTERVAL_SECONDS = float(os.getenv('JOB_POLL_INTERVAL_SECONDS', '1'))
+    JOB_RETENTION_SECONDS = int(os.getenv('JOB_RETENTION_SECONDS', str(7 * 24 * 3600)))
+    JOB_EVENTS_MAX_SECONDS = float(os.getenv('JOB_EVENTS_MAX_SECONDS', '300'))
+    
+    # Batch intake of disclosures; batch jobs queue below interactive requests
+    BATCH_CONCURRENCY = int(os.getenv('BATCH_CONCURRENCY', '4'))
+    BATCH_JOB_PRIORITY = int(os.getenv('BATCH_JOB_PRIORITY', '-1'))
+    BATCH_MAX_DISCLOSURES = int(os.getenv('BATCH_MAX_DISCLOSURES', '500'))
+    
+    # Speculative generation of the first sections while the user reviews step 1 (opt-in)
+    SPECULATIVE_GENERATION_ENABLED = os.getenv('SPECULATIVE_GENERATION_ENABLED', 'False').lower() == 'true'
+    SPECULATIVE_SECTIONS = tuple(
+        section.strip() for section in os.getenv('SPECULATIVE_SECTIONS', 'background').split(',') if section.strip()
+    )
+    SPECULATIVE_JOB_PRIORITY = int(os.getenv('SPECULATIVE_JOB_PRIORITY', '-5'))
+    SPECULATIVE_WAIT_SECONDS = float(os.getenv('SPECULATIVE_WAIT_SECONDS', '5'))
+    
+    # Prompt assembly settings
+    PROMPT_CONTEXT_TOKEN_BUDGET = int(os.getenv('PROMPT_CONTEXT_TOKEN_BUDGET', '2500'))
+    PROMPT_DIGEST_MODE = os.getenv('PROMPT_DIGEST_MODE', 'extractive')  # extractive or llm
+    # Characters of surrounding text sent on each side of a span being rephrased
+    REPHRASE_CONTEXT_CHARS = int(os.getenv('REPHRASE_CONTEXT_CHARS', '600'))
+    
+    # Completion cache settings
+    COMPLETION_CACHE_ENABLED = os.getenv('COMPLETION_CACHE_ENABLED', 'True').lower() == 'true'
+    COMPLETION_CACHE_LRU_SIZE = int(os.getenv('COMPLETION_CACHE_LRU_SIZE', '512'))
+    COMPLETION_CACHE_TTL_SECONDS = int(os.getenv('COMPLETION_CACHE_TTL_SECONDS', str(7 * 24 * 3600)))
+    COMPLETION_CACHE_MAX_ENTRIES = int(os.getenv('COMPLETION_CACHE_MAX_ENTRIES', '50000'))
+    
+    # Local similar-drafts index (see similarity_index.py)
+    SIMILARITY_INDEX_ENABLED = os.getenv('SIMILARITY_INDEX_ENABLED', 'True').lower() == 'true'
+    SIMILARITY_INDEX_DIR = os.getenv('SIMILARITY_INDEX_DIR', os.path.join('data', 'similarity_index'))
+    SIMILARITY_DIMENSIONS = int(os.getenv('SIMILARITY_DIMENSIONS', '1024'))
+    
+    # Generation records go to their own collection; unacknowledged (w=0) inserts unless this is set
+    GENERATION_HISTORY_ACKNOWLEDGED = os.getenv('GENERATION_HISTORY_ACKNOWLEDGED', 'False').lower() == 'true'
+    
+    # Section revision history (see section_revisions.py); a full snapshot at least every N revisions
+    SECTION_REVISIONS_ENABLED = os.getenv('SECTION_REVISIONS_ENABLED', 'True').lower() == 'true'
+    SECTION_REVISION_SNAPSHOT_INTERVAL = int(os.getenv('SECTION_REVISION_SNAPSHOT_INTERVAL', '20'))
+    
     # File upload settings
     UPLOAD_FOLDER = 'uploads'
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max file size
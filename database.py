@@ -22,6 +22,16 @@ def init_database(app):
         app.logger.error(f"Failed to connect to MongoDB: {str(e)}")
         raise
 
+def connect_database(config_name=None):
+    """Connect to MongoDB outside the Flask app, e.g. from background job workers"""
+    app_config = config[config_name or os.getenv('FLASK_CONFIG', 'default')]
+    connect(
+        db=app_config.MONGODB_DB,
+        host=app_config.MONGODB_URI,
+        alias='default'
+    )
+    print(f"Connected to MongoDB: {app_config.MONGODB_DB}")
+
 def close_database():
     """Close MongoDB connection"""
     try:
@@ -31,22 +41,55 @@ def close_database():
 
 def create_indexes():
     """Create database indexes for better performance"""
-    from models import Project, Draft, Drawing
+    from models import Project, Draft, Drawing, CachedCompletion, GenerationFlight, GenerationJob, GenerationEvent, SectionRevision
+    from draft_search import text_index_spec
     
     try:
         # Project indexes
         Project._get_collection().create_index([("user_id", 1)])
         Project._get_collection().create_index([("updated_at", -1)])
+        # Keyset pagination of a user's projects (see pagination.keyset_page)
+        Project._get_collection().create_index([("user_id", 1), ("updated_at", -1), ("_id", -1)])
         
         # Draft indexes
         Draft._get_collection().create_index([("project_id", 1)])
+        Draft._get_collection().create_index([("project_id", 1), ("updated_at", -1), ("_id", -1)])
         Draft._get_collection().create_index([("user_id", 1)])
         Draft._get_collection().create_index([("updated_at", -1)])
+        Draft._get_collection().create_index([("batch_id", 1)], sparse=True)
+        # Weighted text index behind /drafts/search
+        text_keys, text_options = text_index_spec()
+        Draft._get_collection().create_index(text_keys, **text_options)
+        
+        # Generation history indexes (a draft's history newest first, usage report windows)
+        GenerationEvent._get_collection().create_index([("draft_id", 1), ("record.timestamp", -1), ("_id", -1)])
+        GenerationEvent._get_collection().create_index([("record.timestamp", 1)])
+        
+        # Section revisions are numbered per draft section; the unique index orders concurrent writers
+        SectionRevision._get_collection().create_index([("draft_id", 1), ("section", 1), ("number", -1)], unique=True)
         
         # Drawing indexes
         Drawing._get_collection().create_index([("draft_id", 1)])
         Drawing._get_collection().create_index([("created_at", -1)])
         
+        # Completion cache indexes (TTL expiry plus oldest-first eviction)
+        CachedCompletion._get_collection().create_index(
+            [("created_at", 1)],
+            expireAfterSeconds=config['default'].COMPLETION_CACHE_TTL_SECONDS
+        )
+        
+        # Single-flight records are removed once their lease or result window has passed
+        GenerationFlight._get_collection().create_index([("expires_at", 1)], expireAfterSeconds=0)
+        
+        # Generation job indexes (claim order, per-draft listing, cleanup of finished jobs)
+        GenerationJob._get_collection().create_index([("status", 1), ("priority", -1), ("created_at", 1)])
+        GenerationJob._get_collection().create_index([("draft_id", 1), ("created_at", -1)])
+        GenerationJob._get_collection().create_index([("batch_id", 1), ("status", 1)], sparse=True)
+        GenerationJob._get_collection().create_index(
+            [("finished_at", 1)],
+            expireAfterSeconds=config['default'].JOB_RETENTION_SECONDS
+        )
+        
         print("Database indexes created successfully")
         
     except Exception as e:
@@ -0,0 +1,153 @@
+import re
+import time
+from typing import Dict, List, Optional, Tuple
+
+# Fields covered by the drafts text index and their relative weights in the ranking
+SEARCH_WEIGHTS = {
+    'title': 10,
+    'field_of_invention': 5,
+    'abstract': 4,
+    'brief_summary': 3,
+    'claims': 3,
+    'summary': 3,
+    'key_components': 2,
+    'problem_solved': 2,
+    'background': 1,
+    'detailed_description': 1,
+}
+TEXT_INDEX_NAME = 'draft_text_search'
+SNIPPET_CHARS = 180
+SNIPPETS_PER_RESULT = 2
+MAX_PER_PAGE = 50
+
+QUERY_WORD = re.compile(r'-?"[^"]*"|\S+')
+WORD = re.compile(r"[A-Za-z0-9]+")
+# Suffixes dropped so that highlighting follows the text index's stemming roughly
+SUFFIXES = ('ing', 'ed', 'es', 's')
+
+def text_index_spec() -> Tuple[List[Tuple[str, str]], Dict]:
+    """Keys and options for the drafts text index (see database.create_indexes)"""
+    keys = [(field, 'text') for field in SEARCH_WEIGHTS]
+    return keys, {'name': TEXT_INDEX_NAME, 'weights': SEARCH_WEIGHTS, 'default_language': 'english'}
+
+def _stem(word: str) -> str:
+    for suffix in SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            return word[:-len(suffix)]
+    return word
+
+def highlight_pattern(query: str):
+    """Regex for the words a query looks for, ignoring negated terms such as -draft"""
+    terms = set()
+    for part in QUERY_WORD.findall(query):
+        if part.startswith('-'):
+            continue
+        terms.update(_stem(word.lower()) for word in WORD.findall(part))
+    terms = sorted(terms, key=len, reverse=True)
+    if not terms:
+        return None
+    return re.compile(rf"\b(?:{'|'.join(re.escape(term) for term in terms)})\w*", re.IGNORECASE)
+
+def make_snippet(text: str, pattern, width: int = SNIPPET_CHARS) -> Optional[Dict]:
+    """The window of text with the most query words, and the offsets of those words in it"""
+    matches = [match.span() for match in pattern.finditer(text or '')][:200]
+    if not matches:
+        return None
+    
+    best_start, best_count = 0, 0
+    for start, _ in matches:
+        window_start = max(start - width // 4, 0)
+        count = sum(1 for other, end in matches if other >= window_start and end <= window_start + width)
+        if count > best_count:
+            best_start, best_count = window_start, count
+    
+    start, end = best_start, min(best_start + width, len(text))
+    # Widen to whole words
+    if start > 0:
+        space = text.rfind(' ', 0, start)
+        start = space + 1 if space >= 0 else 0
+    if end < len(text):
+        space = text.find(' ', end)
+        end = space if space >= 0 else len(text)
+    
+    prefix = '…' if start > 0 else ''
+    suffix = '…' if end < len(text) else ''
+    snippet = ' '.join(text[start:end].split())
+    highlights = [
+        [match.start() + len(prefix), match.end() + len(prefix)]
+        for match in pattern.finditer(snippet)
+    ]
+    return {'text': prefix + snippet + suffix, 'highlights': highlights, 'matches': len(matches)}
+
+def search_drafts(query: str, user_id: Optional[str] = None, project_id: Optional[str] = None,
+                  page: int = 1, per_page: int = 20) -> Dict:
+    """Ranked full-text search over drafts using the MongoDB text index
+    
+    Counting and paging run in one aggregation, and only the requested page is read back.
+    Snippets are cut from it here, so clients receive a few hundred characters per hit
+    instead of whole drafts.
+    """
+    from models import Draft, Project
+    
+    query = (query or '').strip()
+    if not query:
+        raise ValueError("A search query is required")
+    page = max(int(page), 1)
+    per_page = min(max(int(per_page), 1), MAX_PER_PAGE)
+    started = time.time()
+    
+    match = {'$text': {'$search': query}}
+    if project_id:
+        match['project_id'] = project_id
+    elif user_id:
+        match['project_id'] = {'$in': [str(project.id) for project in Project.objects(user_id=user_id).only('id')]}
+    
+    pipeline = [
+        {'$match': match},
+        {'$project': dict(
+            {field: 1 for field in SEARCH_WEIGHTS},
+            project_id=1, updated_at=1, score={'$meta': 'textScore'}
+        )},
+        {'$facet': {
+            'total': [{'$count': 'count'}],
+            'results': [
+                {'$sort': {'score': -1, 'updated_at': -1}},
+                {'$skip': (page - 1) * per_page},
+                {'$limit': per_page},
+            ]
+        }}
+    ]
+    result = next(Draft.objects.aggregate(pipeline), {'total': [], 'results': []})
+    total = result['total'][0]['count'] if result['total'] else 0
+    
+    pattern = highlight_pattern(query)
+    results = []
+    for draft in result['results']:
+        snippets = []
+        if pattern:
+            for field in SEARCH_WEIGHTS:
+                snippet = make_snippet(draft.get(field), pattern)
+                if snippet:
+                    snippets.append(dict(snippet, field=field))
+            # Fields with more hits first, heavier fields breaking ties
+            snippets.sort(key=lambda snippet: (-snippet['matches'], -SEARCH_WEIGHTS[snippet['field']]))
+        results.append({
+            'id': str(draft['_id']),
+            'project_id': draft.get('project_id'),
+            'title': draft.get('title'),
+            'field_of_invention': draft.get('field_of_invention'),
+            'updated_at': draft['updated_at'].isoformat() if draft.get('updated_at') else None,
+            'score': round(draft['score'], 4),
+            'matched_fields': [snippet['field'] for snippet in snippets],
+            'snippets': snippets[:SNIPPETS_PER_RESULT]
+        })
+    
+    return {
+        'query': query,
+        'page': page,
+        'per_page': per_page,
+        'total': total,
+        'pages': (total + per_page - 1) // per_page,
+        'results': results,
+        'elapsed_ms': round((time.time() - started) * 1000, 2)
+    }
@@ -1,9 +1,27 @@
-from flask import Blueprint, request, jsonify, send_file
-from models import Project, Draft, Drawing
-from ai_service import PatentAIService
+from flask import Blueprint, request, jsonify, send_file, Response, stream_with_context
+from models import Project, Draft, Drawing, GenerationJob, GenerationEvent, GenerationSummary, EDITABLE_FIELDS
+from ai_service import PatentAIService, GENERATABLE_SECTIONS, section_input_hash, stale_sections
+from ai_service import section_content_hash, paragraph_span, INVENTION_INPUT_FIELDS
+from rate_limiter import RateLimitTimeout
+from resilience import ProviderUnavailableError
+from singleflight import SingleFlight, FlightFailed
+from job_queue import JobQueue
+from usage_tracking import metered, usage_report
+from patent_lint import LINTABLE_SECTIONS, default_linter
+from claims_parser import ClaimTree, ClaimNotFoundError
+from similarity_index import get_index as get_similarity_index
+from draft_search import search_drafts
+from pagination import page_size
+from section_revisions import REVISION_SECTIONS, RevisionNotFoundError, reconstruct, list_revisions, diff_revisions, latest_revision_number
+from batch_drafting import detect_format, parse_disclosures, normalize_disclosures, create_batch_drafts, batch_status
+from config import Config
 import os
+import json
+import queue
+import threading
+import time
 import uuid
-from datetime import datetime
+from datetime import datetime, timedelta
 from werkzeug.utils import secure_filename
 from mongoengine.errors import DoesNotExist, ValidationError
 from dotenv import load_dotenv
@@ -17,6 +35,12 @@ drafting_bp = Blueprint('drafting', __name__, url_prefix='/drafts')
 # Initialize AI service
 ai_service = PatentAIService()
 
+# Identical generations requested at the same time share one provider call
+single_flight = SingleFlight()
+
+# Generations handed off to the background job workers
+job_queue = JobQueue()
+
 # Configure upload settings
 UPLOAD_FOLDER = 'uploads/drawings'
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'bmp', 'tiff', 'pdf'}
@@ -28,6 +52,202 @@ if not os.path.exists(UPLOAD_FOLDER):
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+def is_truthy(value):
+    """Interpret a JSON or query-string flag"""
+    if isinstance(value, str):
+        return value.lower() in ('1', 'true', 'yes')
+    return bool(value)
+
+def generation_options(data):
+    """Collect per-request generation options from the JSON body or query string"""
+    options = {}
+    if is_truthy(data.get('bypass_cache')) or is_truthy(request.args.get('bypass_cache', '')):
+        # Explicit regeneration skips the completion cache
+        options['bypass_cache'] = True
+    profile = data.get('profile') or request.args.get('profile')
+    if profile:
+        if profile not in ai_service.router.profiles:
+            raise ValueError(f"Invalid profile: {profile}. Choose one of: {', '.join(ai_service.router.profiles)}")
+        options['profile'] = profile
+    return options
+
+def wants_background_job(data):
+    """Check whether a generation should be queued for the job workers instead of run inline"""
+    flag = data.get('async', request.args.get('async'))
+    if flag is not None:
+        return is_truthy(flag)
+    return Config.GENERATION_QUEUE_ENABLED
+
+def queue_speculative_generation(draft_id, data):
+    """Start low-priority generation of the first sections while the user reviews step 1
+    
+    Opt-in per request with "speculative", or for every draft with SPECULATIVE_GENERATION_ENABLED.
+    Suggestions made from the previous inputs are dropped first. Returns the job, or None if
+    speculation is off or could not be queued.
+    """
+    flag = data.get('speculative')
+    if not (is_truthy(flag) if flag is not None else Config.SPECULATIVE_GENERATION_ENABLED):
+        return None
+    try:
+        Draft.objects(id=draft_id).update_one(unset__pending_suggestions=True)
+        job = job_queue.enqueue(draft_id, 'speculative', options={'sections': list(Config.SPECULATIVE_SECTIONS)},
+                                priority=Config.SPECULATIVE_JOB_PRIORITY)
+        Draft.objects(id=draft_id).update_one(set__speculative_job_id=str(job.id))
+        return job
+    except Exception as e:
+        # Speculation is only an optimisation; the draft itself was saved
+        print(f"⚠️ Could not queue speculative generation for draft {draft_id}: {str(e)}")
+        return None
+
+def take_speculative_suggestion(draft, section, fingerprint):
+    """Use a suggestion generated ahead of time for these inputs, if there is one
+    
+    Only drafts with a speculative job cost extra queries, and only while
+    SPECULATIVE_GENERATION_ENABLED is on. A job still waiting in the queue is cancelled, since
+    the caller generates the section now anyway; one already running is given a short
+    SPECULATIVE_WAIT_SECONDS to finish rather than paying for the same generation twice.
+    """
+    draft_id = str(draft.id)
+    pending = draft.pending_suggestions or {}
+    if pending.get(section, {}).get('fingerprint') == fingerprint:
+        return Draft.accept_suggestion(draft_id, section, fingerprint)
+    if not (Config.SPECULATIVE_GENERATION_ENABLED and draft.speculative_job_id):
+        return None
+    
+    job = GenerationJob.objects(id=draft.speculative_job_id, status__in=['queued', 'running'],
+                                options__sections=section).only('status').first()
+    if job is None:
+        return None
+    # Only a job that is still queued is cancelled; one a worker has just claimed is waited for
+    if job.status == 'queued' and job_queue.cancel_queued(str(job.id)):
+        return None
+    
+    deadline = time.time() + Config.SPECULATIVE_WAIT_SECONDS
+    while time.time() < deadline:
+        time.sleep(0.5)
+        pending = Draft.objects.only('pending_suggestions').get(id=draft_id).pending_suggestions or {}
+        if pending.get(section, {}).get('fingerprint') == fingerprint:
+            return Draft.accept_suggestion(draft_id, section, fingerprint)
+        if not GenerationJob.objects(id=job.id, status='running').count():
+            return None
+    return None
+
+def queued_response(job):
+    """202 response pointing the client at a queued generation job"""
+    response = jsonify({
+        'success': True,
+        'data': {
+            'job_id': str(job.id),
+            'status': job.status,
+            'status_url': f'/jobs/{job.id}',
+            'events_url': f'/jobs/{job.id}/events'
+        },
+        'message': 'Generation queued'
+    })
+    response.headers['Location'] = f'/jobs/{job.id}'
+    return response, 202
+
+def rate_limited_response(error):
+    """429 response for requests that could not get provider capacity in time"""
+    response = jsonify({
+        'success': False,
+        'error': str(error)
+    })
+    response.headers['Retry-After'] = str(max(int(error.retry_after + 0.999), 1))
+    return response, 429
+
+def degraded_response(error):
+    """503 response for requests rejected because the AI provider is unhealthy"""
+    response = jsonify({
+        'success': False,
+        'error': str(error),
+        'status': error.status
+    })
+    response.headers['Retry-After'] = str(max(int(error.retry_after + 0.999), 1))
+    return response, 503
+
+def version_conflict_response(draft_id):
+    """409 response for an update made against an outdated draft version; 404s if the draft is gone"""
+    current = Draft.objects.only('version').get(id=draft_id)
+    return jsonify({
+        'success': False,
+        'error': 'Draft was changed by another request; reload it and apply the edit again',
+        'current_version': current.version or 0
+    }), 409
+
+def wants_event_stream():
+    """Check whether the client asked for a Server-Sent Events response"""
+    if is_truthy(request.args.get('stream', '')):
+        return True
+    return 'text/event-stream' in request.headers.get('Accept', '')
+
+def sse_event(event, payload):
+    """Format a Server-Sent Events message with a JSON payload"""
+    return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+
+def sse_response(events):
+    """Wrap an event generator in an unbuffered text/event-stream response"""
+    return Response(
+        stream_with_context(events),
+        mimetype='text/event-stream',
+        headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'
+        }
+    )
+
+def stream_generation(draft, section, options):
+    """Stream generated tokens to the client and persist the assembled section when done"""
+    draft_id = str(draft.id)
+    draft_data = draft.to_dict()
+    fingerprint = section_input_hash(section, draft_data)
+    flight = single_flight.claim(SingleFlight.make_key(draft_id, section, fingerprint, options))
+    
+    def events():
+        # Flush headers straight away so the client sees the stream open
+        yield sse_event('start', {'section': section})
+        try:
+            content = None
+            if not flight.is_leader:
+                # Another request is already generating this section; replay its result
+                content = flight.wait()
+                if content is not None:
+                    yield sse_event('token', {'delta': content})
+            
+            if content is None:
+                parts = []
+                with metered() as usage:
+                    for delta in ai_service.stream_section(section, draft_data, **options):
+                        parts.append(delta)
+                        yield sse_event('token', {'delta': delta})
+                content = ''.join(parts).strip()
+                Draft.apply_generated_section(draft_id, section, content, fingerprint=fingerprint,
+                                              usage=usage.to_record())
+                if flight.is_leader:
+                    flight.complete(content)
+            
+            yield sse_event('done', {
+                'content': content,
+                'section': section,
+                'message': f'{section.title()} generated successfully'
+            })
+        except Exception as e:
+            # Followers of a failed flight leave the failure record to the leader
+            if not isinstance(e, FlightFailed):
+                persist_generation_failure(draft_id, section, str(e))
+                if flight.is_leader:
+                    flight.fail(str(e))
+            payload = {'error': str(e), 'section': section}
+            if isinstance(e, ProviderUnavailableError):
+                payload['status'] = e.status
+            yield sse_event('error', payload)
+        finally:
+            # A client that disconnects mid-stream must not leave followers waiting on it
+            if flight.is_leader and not flight.call.event.is_set():
+                flight.fail('Generation was interrupted')
+    
+    return sse_response(events())
+
 @drafting_bp.route('/start', methods=['POST'])
 def start_draft():
     """Initialize a new patent draft"""
@@ -54,11 +274,14 @@ def start_draft():
         )
         draft.save()
         
+        speculative_job = queue_speculative_generation(str(draft.id), data)
+        
         return jsonify({
             'success': True,
             'data': {
                 'draft_id': str(draft.id),
-                'project_id': str(project.id)
+                'project_id': str(project.id),
+                'speculative_job_id': str(speculative_job.id) if speculative_job else None
             },
             'message': 'Draft started successfully'
         }), 201
@@ -92,52 +315,51 @@ def get_draft(draft_id):
 
 @drafting_bp.route('/<draft_id>', methods=['PATCH'])
 def update_draft(draft_id):
-    """Update draft sections"""
+    """Update draft sections
+    
+    Only the supplied fields are written, in one atomic update. Send the draft's "version"
+    (or an If-Match header) to have the update refused with 409 if the draft changed since.
+    """
     try:
-        draft = Draft.objects.get(id=draft_id)
         data = request.get_json()
+        changes = {field: data[field] for field in EDITABLE_FIELDS if field in data}
+        expected_version = data.get('version', request.headers.get('If-Match', '').strip('"W/') or None)
+        if expected_version is not None:
+            expected_version = int(expected_version)
         
-        # Update basic information
-        if 'title' in data:
-            draft.title = data['title']
-        if 'field_of_invention' in data:
-            draft.field_of_invention = data['field_of_invention']
-        if 'brief_summary' in data:
-            draft.brief_summary = data['brief_summary']
-        if 'key_components' in data:
-            draft.key_components = data['key_components']
-        if 'problem_solved' in data:
-            draft.problem_solved = data['problem_solved']
-        
-        # Update sections
-        if 'background' in data:
-            draft.background = data['background']
-        if 'summary' in data:
-            draft.summary = data['summary']
-        if 'detailed_description' in data:
-            draft.detailed_description = data['detailed_description']
-        if 'claims' in data:
-            draft.claims = data['claims']
-        if 'abstract' in data:
-            draft.abstract = data['abstract']
-        
-        # Update current step
-        if 'current_step' in data:
-            draft.current_step = data['current_step']
+        updated = Draft.apply_update(draft_id, changes, expected_version)
+        if updated is None:
+            return version_conflict_response(draft_id)
         
-        draft.save()
+        # New step 1 inputs make earlier suggestions useless, so speculate again
+        if any(field in data for field in INVENTION_INPUT_FIELDS):
+            queue_speculative_generation(draft_id, data)
         
-        return jsonify({
+        # Lint the sections this update touched; cheap enough to run on every autosave
+        lint = {
+            section: default_linter.lint(data[section], section).to_dict()
+            for section in LINTABLE_SECTIONS if data.get(section)
+        }
+        
+        response = jsonify({
             'success': True,
             'message': 'Draft updated successfully',
-            'data': draft.to_dict()
-        }), 200
+            'data': updated,
+            'lint': lint
+        })
+        response.headers['ETag'] = f'"{updated["version"]}"'
+        return response, 200
         
     except DoesNotExist:
         return jsonify({
             'success': False,
             'error': 'Draft not found'
         }), 404
+    except (ValueError, ValidationError) as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
     except Exception as e:
         return jsonify({
             'success': False,
@@ -149,43 +371,68 @@ def generate_section(draft_id, section):
     """Generate AI content for a specific section"""
     try:
         draft = Draft.objects.get(id=draft_id)
-        data = request.get_json()
+        data = request.get_json(silent=True) or {}
+        options = generation_options(data)
         
-        # Prepare draft data for AI
-        draft_data = draft.to_dict()
-        
-        # Generate content based on section
-        if section == 'background':
-            content = ai_service.generate_background(draft_data)
-            draft.background = content
-        elif section == 'summary':
-            content = ai_service.generate_summary(draft_data)
-            draft.summary = content
-        elif section == 'detailed_description':
-            content = ai_service.generate_detailed_description(draft_data)
-            draft.detailed_description = content
-        elif section == 'claims':
-            content = ai_service.generate_claims(draft_data)
-            draft.claims = content
-        elif section == 'abstract':
-            content = ai_service.generate_abstract(draft_data)
-            draft.abstract = content
-        else:
+        if section not in GENERATABLE_SECTIONS:
             return jsonify({
                 'success': False,
                 'error': f'Invalid section: {section}'
             }), 400
         
-        # Mark section as AI-generated
-        draft.mark_section_generated(section)
-        draft.add_generation_record(section, True)
-        draft.save()
+        # A suggestion generated ahead of time from the same inputs is returned immediately,
+        # unless this request asked for a fresh generation or a particular profile
+        if not options:
+            content = take_speculative_suggestion(draft, section, section_input_hash(section, draft.to_dict()))
+            if content is not None:
+                if wants_event_stream():
+                    return sse_response(iter([
+                        sse_event('start', {'section': section}),
+                        sse_event('token', {'delta': content}),
+                        sse_event('done', {'content': content, 'section': section, 'speculative': True,
+                                           'message': f'{section.title()} generated successfully'})
+                    ]))
+                return jsonify({
+                    'success': True,
+                    'data': {
+                        'content': content,
+                        'section': section,
+                        'shared': False,
+                        'speculative': True
+                    },
+                    'message': f'{section.title()} generated successfully'
+                }), 200
+        
+        # Send tokens as they arrive when the client asks for an event stream
+        if wants_event_stream():
+            return stream_generation(draft, section, options)
+        
+        if wants_background_job(data):
+            job = job_queue.enqueue(draft_id, 'section', section=section, options=options,
+                                    priority=int(data.get('priority', 0)))
+            return queued_response(job)
+        
+        # Prepare draft data for AI
+        draft_data = draft.to_dict()
+        fingerprint = section_input_hash(section, draft_data)
+        
+        def generate():
+            # Only the caller that actually generated writes the section and its history entry
+            with metered() as usage:
+                content = ai_service.generate_section(section, draft_data, **options)
+            Draft.apply_generated_section(draft_id, section, content, fingerprint=fingerprint,
+                                          usage=usage.to_record())
+            return content
+        
+        key = SingleFlight.make_key(draft_id, section, fingerprint, options)
+        content, shared = single_flight.do(key, generate)
         
         return jsonify({
             'success': True,
             'data': {
                 'content': content,
-                'section': section
+                'section': section,
+                'shared': shared
             },
             'message': f'{section.title()} generated successfully'
         }), 200
@@ -195,21 +442,480 @@ def generate_section(draft_id, section):
             'success': False,
             'error': 'Draft not found'
         }), 404
+    except RateLimitTimeout as e:
+        persist_generation_failure(draft_id, section, str(e))
+        return rate_limited_response(e)
+    except ProviderUnavailableError as e:
+        persist_generation_failure(draft_id, section, str(e))
+        return degraded_response(e)
+    except FlightFailed as e:
+        # The leading request already recorded the failure in the draft history
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
     except Exception as e:
+        persist_generation_failure(draft_id, section, str(e))
+        
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+def persist_generated_section(draft_id, section, content, usage=None):
+    """Pipeline callback that writes a finished section back to the draft"""
+    Draft.apply_generated_section(draft_id, section, content, usage=usage)
+
+def persist_generation_failure(draft_id, section, error_message):
+    """Pipeline callback that records a failed or skipped section"""
+    try:
+        Draft.record_generation_failure(draft_id, section, error_message)
+    except Exception:
+        pass
+
+def stream_specification(draft_id, draft_data, options):
+    """Run the specification pipeline and report each section as an event when it lands"""
+    events_queue = queue.Queue()
+    
+    def on_complete(section, content, usage):
+        persist_generated_section(draft_id, section, content, usage)
+        events_queue.put(sse_event('section', {'section': section, 'content': content}))
+    
+    def on_error(section, error_message):
+        persist_generation_failure(draft_id, section, error_message)
+        events_queue.put(sse_event('error', {'section': section, 'error': error_message}))
+    
+    def run():
         try:
-            draft.add_generation_record(section, False, str(e))
-            draft.save()
-        except:
-            pass
+            result = ai_service.generate_specification(draft_data, on_complete=on_complete, on_error=on_error, **options)
+            Draft.set_section_fingerprints(draft_id, result['fingerprints'])
+            events_queue.put(sse_event('done', {
+                'sections': list(result['sections']),
+                'failed': list(result['errors']),
+                'elapsed_seconds': result['elapsed_seconds']
+            }))
+        except Exception as e:
+            events_queue.put(sse_event('done', {'error': str(e)}))
+        finally:
+            events_queue.put(None)
+    
+    threading.Thread(target=run, daemon=True).start()
+    
+    def events():
+        yield sse_event('start', {'draft_id': draft_id})
+        while True:
+            event = events_queue.get()
+            if event is None:
+                break
+            yield event
+    
+    return sse_response(events())
+
+@drafting_bp.route('/<draft_id>/generate-specification', methods=['POST'])
+def generate_specification(draft_id):
+    """Generate every AI section of the draft in one dependency-aware run"""
+    try:
+        draft = Draft.objects.get(id=draft_id)
+        draft_data = draft.to_dict()
+        data = request.get_json(silent=True) or {}
+        options = generation_options(data)
+        
+        if wants_event_stream():
+            return stream_specification(draft_id, draft_data, options)
         
+        if wants_background_job(data):
+            job = job_queue.enqueue(draft_id, 'specification', options=options,
+                                    priority=int(data.get('priority', 0)))
+            return queued_response(job)
+        
+        result = ai_service.generate_specification(
+            draft_data,
+            on_complete=lambda section, content, usage: persist_generated_section(draft_id, section, content, usage),
+            on_error=lambda section, error: persist_generation_failure(draft_id, section, error),
+            **options
+        )
+        Draft.set_section_fingerprints(draft_id, result['fingerprints'])
+        
+        if result['errors']:
+            return jsonify({
+                'success': False,
+                'error': f"Failed to generate: {', '.join(result['errors'])}",
+                'data': result
+            }), 500
+        
+        return jsonify({
+            'success': True,
+            'data': result,
+            'message': 'Specification generated successfully'
+        }), 200
+        
+    except DoesNotExist:
+        return jsonify({
+            'success': False,
+            'error': 'Draft not found'
+        }), 404
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+    except Exception as e:
         return jsonify({
             'success': False,
             'error': str(e)
         }), 500
 
+@drafting_bp.route('/<draft_id>/stale', methods=['GET'])
+def get_stale_sections(draft_id):
+    """Report which AI sections no longer match the inputs they were generated from"""
+    try:
+        draft = Draft.objects.get(id=draft_id)
+        report = stale_sections(draft.to_dict(), draft.section_fingerprints)
+        
+        return jsonify({
+            'success': True,
+            'data': {
+                'sections': report,
+                'regenerate': [entry['section'] for entry in report if entry['status'] in ('stale', 'affected')]
+            }
+        }), 200
+        
+    except DoesNotExist:
+        return jsonify({
+            'success': False,
+            'error': 'Draft not found'
+        }), 404
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@drafting_bp.route('/<draft_id>/regenerate-stale', methods=['POST'])
+def regenerate_stale(draft_id):
+    """Regenerate only the stale sections, in drafting order"""
+    try:
+        draft = Draft.objects.get(id=draft_id)
+        data = request.get_json(silent=True) or {}
+        options = generation_options(data)
+        
+        if wants_background_job(data):
+            job = job_queue.enqueue(draft_id, 'stale', options=options,
+                                    priority=int(data.get('priority', 0)))
+            return queued_response(job)
+        
+        def on_complete(name, content, fingerprint, usage):
+            Draft.apply_generated_section(draft_id, name, content, fingerprint=fingerprint, usage=usage)
+        
+        result = ai_service.regenerate_stale(
+            draft.to_dict(),
+            draft.section_fingerprints,
+            on_complete=on_complete,
+            on_error=lambda section, error: persist_generation_failure(draft_id, section, error),
+            **options
+        )
+        
+        return jsonify({
+            'success': True,
+            'data': result,
+            'message': f"Regenerated {len(result['sections'])} stale sections"
+        }), 200
+        
+    except DoesNotExist:
+        return jsonify({
+            'success': False,
+            'error': 'Draft not found'
+        }), 404
+    except RateLimitTimeout as e:
+        return rate_limited_response(e)
+    except ProviderUnavailableError as e:
+        return degraded_response(e)
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@drafting_bp.route('/<draft_id>/lint', methods=['GET'])
+def lint_draft(draft_id):
+    """Check the draft's sections for first-person, marketing, claim and length problems"""
+    try:
+        draft = Draft.objects.get(id=draft_id)
+        section = request.args.get('section')
+        if section and section not in LINTABLE_SECTIONS:
+            return jsonify({
+                'success': False,
+                'error': f'Invalid section: {section}'
+            }), 400
+        
+        results = default_linter.lint_draft(draft.to_dict(), [section] if section else LINTABLE_SECTIONS)
+        return jsonify({
+            'success': True,
+            'data': {
+                'is_valid': all(result.is_valid for result in results.values()),
+                'sections': {name: result.to_dict() for name, result in results.items()}
+            }
+        }), 200
+        
+    except DoesNotExist:
+        return jsonify({
+            'success': False,
+            'error': 'Draft not found'
+        }), 404
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@drafting_bp.route('/<draft_id>/similar', methods=['GET'])
+def get_similar_drafts(draft_id):
+    """Find earlier drafts whose section reads like this draft's, from the local similarity index"""
+    try:
+        draft = Draft.objects.get(id=draft_id)
+        section = request.args.get('section', 'invention')
+        limit = min(max(int(request.args.get('limit', 5)), 1), 50)
+        
+        started = time.time()
+        matches = get_similarity_index().similar(draft.to_dict(), section, limit)
+        elapsed_ms = round((time.time() - started) * 1000, 2)
+        
+        # Matching section text can seed generation for this draft
+        text_field = 'brief_summary' if section == 'invention' else section
+        found = {
+            str(match.id): match
+            for match in Draft.objects(id__in=[m['draft_id'] for m in matches]).only('id', 'project_id', 'title', text_field)
+        }
+        include_content = is_truthy(request.args.get('include_content', ''))
+        results = []
+        for match in matches:
+            other = found.get(match['draft_id'])
+            if other is None:
+                continue
+            text = getattr(other, text_field) or ''
+            result = dict(match, project_id=other.project_id, title=other.title, excerpt=text[:300])
+            if include_content:
+                result['content'] = text
+            results.append(result)
+        
+        return jsonify({
+            'success': True,
+            'data': {
+                'section': section,
+                'similar': results,
+                'elapsed_ms': elapsed_ms
+            }
+        }), 200
+        
+    except DoesNotExist:
+        return jsonify({
+            'success': False,
+            'error': 'Draft not found'
+        }), 404
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@drafting_bp.route('/<draft_id>/history', methods=['GET'])
+def get_generation_history(draft_id):
+    """Page through a draft's generation records, newest first"""
+    try:
+        draft = Draft.objects.only('generation_summary').get(id=draft_id)
+        records, next_cursor = GenerationEvent.list_page(draft_id, page_size(request.args.get('limit')),
+                                                         request.args.get('cursor'), request.args.get('section'))
+        return jsonify({
+            'success': True,
+            'data': {
+                'summary': (draft.generation_summary or GenerationSummary()).to_dict(),
+                'history': records,
+                'next_cursor': next_cursor
+            }
+        }), 200
+        
+    except DoesNotExist:
+        return jsonify({
+            'success': False,
+            'error': 'Draft not found'
+        }), 404
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+def revision_section_error(section):
+    """400 response for sections that do not keep revisions, or None if the section does"""
+    if section in REVISION_SECTIONS:
+        return None
+    return jsonify({
+        'success': False,
+        'error': f"Invalid section: {section}. Choose one of: {', '.join(REVISION_SECTIONS)}"
+    }), 400
+
+@drafting_bp.route('/<draft_id>/sections/<section>/revisions', methods=['GET'])
+def get_section_revisions(draft_id, section):
+    """List a section's revisions, newest first"""
+    try:
+        invalid = revision_section_error(section)
+        if invalid:
+            return invalid
+        Draft.objects.only('id').get(id=draft_id)
+        before = request.args.get('before')
+        return jsonify({
+            'success': True,
+            'data': list_revisions(draft_id, section, page_size(request.args.get('limit')),
+                                   int(before) if before else None)
+        }), 200
+        
+    except DoesNotExist:
+        return jsonify({
+            'success': False,
+            'error': 'Draft not found'
+        }), 404
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@drafting_bp.route('/<draft_id>/sections/<section>/revisions/<int:number>', methods=['GET'])
+def get_section_revision(draft_id, section, number):
+    """Rebuild a section as it was at one revision"""
+    try:
+        invalid = revision_section_error(section)
+        if invalid:
+            return invalid
+        content = reconstruct(draft_id, section, number)
+        return jsonify({
+            'success': True,
+            'data': {
+                'section': section,
+                'number': number,
+                'content': content
+            }
+        }), 200
+        
+    except RevisionNotFoundError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 404
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@drafting_bp.route('/<draft_id>/sections/<section>/diff', methods=['GET'])
+def diff_section_revisions(draft_id, section):
+    """Diff two revisions of a section; by default the latest against the one before it"""
+    try:
+        invalid = revision_section_error(section)
+        if invalid:
+            return invalid
+        to_number = request.args.get('to')
+        to_number = int(to_number) if to_number else latest_revision_number(draft_id, section)
+        if to_number is None:
+            raise RevisionNotFoundError(f"{section} has no revisions")
+        from_number = request.args.get('from')
+        from_number = int(from_number) if from_number else to_number - 1
+        context = min(max(int(request.args.get('context', 3)), 0), 20)
+        return jsonify({
+            'success': True,
+            'data': diff_revisions(draft_id, section, from_number, to_number, context)
+        }), 200
+        
+    except RevisionNotFoundError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 404
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@drafting_bp.route('/<draft_id>/sections/<section>/revisions/<int:number>/restore', methods=['POST'])
+def restore_section_revision(draft_id, section, number):
+    """Put a section back as it was at a revision (undo); the restore is itself a new revision"""
+    try:
+        invalid = revision_section_error(section)
+        if invalid:
+            return invalid
+        data = request.get_json(silent=True) or {}
+        content = reconstruct(draft_id, section, number)
+        expected_version = data.get('version')
+        updated = Draft.apply_update(draft_id, {section: content},
+                                     int(expected_version) if expected_version is not None else None, source='restore')
+        if updated is None:
+            return version_conflict_response(draft_id)
+        
+        return jsonify({
+            'success': True,
+            'message': f'{section} restored to revision {number}',
+            'data': updated
+        }), 200
+        
+    except (DoesNotExist, RevisionNotFoundError) as e:
+        return jsonify({
+            'success': False,
+            'error': 'Draft not found' if isinstance(e, DoesNotExist) else str(e)
+        }), 404
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+def section_changed_response(section, current_content):
+    """409 response for an edit made against an older version of a section"""
+    return jsonify({
+        'success': False,
+        'error': f'{section.title()} has changed since it was read; reload it and try again',
+        'section_hash': section_content_hash(current_content)
+    }), 409
+
 @drafting_bp.route('/<draft_id>/rephrase/<section>', methods=['POST'])
 def rephrase_section(draft_id, section):
-    """Rephrase or improve a specific section"""
+    """Rephrase or improve a specific section, or just a span or paragraph of it"""
     try:
         draft = Draft.objects.get(id=draft_id)
         data = request.get_json()
@@ -224,17 +930,35 @@ def rephrase_section(draft_id, section):
                 'error': f'No content found for section: {section}'
             }), 400
         
-        # Rephrase content
-        new_content = ai_service.rephrase_section(current_content, section, instruction)
+        # Offsets are only meaningful against the text the client selected them in
+        expected_hash = data.get('section_hash')
+        if expected_hash and expected_hash != section_content_hash(current_content):
+            return section_changed_response(section, current_content)
         
-        # Update section
-        setattr(draft, section, new_content)
-        draft.save()
+        options = generation_options(data)
+        span = None
+        if data.get('paragraph') is not None:
+            span = paragraph_span(current_content, int(data['paragraph']))
+        elif data.get('start') is not None or data.get('end') is not None:
+            span = (int(data.get('start', 0)), int(data.get('end', len(current_content))))
+        
+        with metered() as usage:
+            if span:
+                new_content = ai_service.rephrase_span(current_content, section, span[0], span[1], instruction, **options)
+            else:
+                new_content = ai_service.rephrase_section(current_content, section, instruction, **options)
+        
+        # Splice the result in only if nobody changed the section while the model was working
+        if not Draft.apply_section_edit(draft_id, section, current_content, new_content, usage=usage.to_record()):
+            current = Draft.objects.only(section).get(id=draft_id)
+            return section_changed_response(section, getattr(current, section))
         
         return jsonify({
             'success': True,
             'content': new_content,
             'section': section,
+            'span': list(span) if span else None,
+            'section_hash': section_content_hash(new_content),
             'message': f'{section.title()} rephrased successfully'
         }), 200
         
@@ -243,12 +967,412 @@ def rephrase_section(draft_id, section):
             'success': False,
             'error': 'Draft not found'
         }), 404
+    except RateLimitTimeout as e:
+        return rate_limited_response(e)
+    except ProviderUnavailableError as e:
+        return degraded_response(e)
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+def claims_response(tree, message=None, status=200):
+    """Claims text, tree and counts after a single-claim edit"""
+    body = {
+        'success': True,
+        'data': {
+            'claims': tree.render(),
+            'claim_tree': tree.to_list(),
+            'counts': tree.counts()
+        }
+    }
+    if message:
+        body['message'] = message
+    return jsonify(body), status
+
+def claims_conflict_response():
+    """409 response for a claim edit made against claims that have since changed"""
+    return jsonify({
+        'success': False,
+        'error': 'The claims were changed by another request; reload the draft and try again'
+    }), 409
+
+@drafting_bp.route('/<draft_id>/claims', methods=['GET'])
+def get_claims(draft_id):
+    """Get the draft's claims as a tree of numbered claims and their dependencies"""
+    try:
+        draft = Draft.objects.only('claims').get(id=draft_id)
+        return claims_response(ClaimTree.parse(draft.claims))
+        
+    except DoesNotExist:
+        return jsonify({
+            'success': False,
+            'error': 'Draft not found'
+        }), 404
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@drafting_bp.route('/<draft_id>/claims/<int:number>/regenerate', methods=['POST'])
+def regenerate_claim(draft_id, number):
+    """Regenerate one claim from its parent chain, leaving the other claims untouched"""
+    try:
+        draft = Draft.objects.get(id=draft_id)
+        data = request.get_json(silent=True) or {}
+        options = generation_options(data)
+        # Asking for a claim again means wanting a different one, not the cached answer
+        options.setdefault('bypass_cache', True)
+        
+        tree = ClaimTree.parse(draft.claims)
+        with metered() as usage:
+            content = ai_service.regenerate_claim(draft.to_dict(), tree, number, **options)
+        tree = tree.replace(number, content)
+        if not Draft.apply_claim_edit(draft_id, draft.claims, tree, usage=usage.to_record()):
+            return claims_conflict_response()
+        return claims_response(tree, f'Claim {number} regenerated successfully')
+        
+    except DoesNotExist:
+        return jsonify({
+            'success': False,
+            'error': 'Draft not found'
+        }), 404
+    except ClaimNotFoundError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 404
+    except RateLimitTimeout as e:
+        return rate_limited_response(e)
+    except ProviderUnavailableError as e:
+        return degraded_response(e)
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@drafting_bp.route('/<draft_id>/claims/<int:number>/rephrase', methods=['POST'])
+def rephrase_claim(draft_id, number):
+    """Rephrase one claim, sending only the claim and its parent chain"""
+    try:
+        draft = Draft.objects.get(id=draft_id)
+        data = request.get_json(silent=True) or {}
+        instruction = data.get('instruction', 'improve clarity')
+        
+        tree = ClaimTree.parse(draft.claims)
+        with metered() as usage:
+            content = ai_service.rephrase_claim(tree, number, instruction, **generation_options(data))
+        tree = tree.replace(number, content)
+        if not Draft.apply_claim_edit(draft_id, draft.claims, tree, usage=usage.to_record()):
+            return claims_conflict_response()
+        return claims_response(tree, f'Claim {number} rephrased successfully')
+        
+    except DoesNotExist:
+        return jsonify({
+            'success': False,
+            'error': 'Draft not found'
+        }), 404
+    except ClaimNotFoundError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 404
+    except RateLimitTimeout as e:
+        return rate_limited_response(e)
+    except ProviderUnavailableError as e:
+        return degraded_response(e)
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@drafting_bp.route('/<draft_id>/claims', methods=['POST'])
+def add_claim(draft_id):
+    """Add one claim, written by hand or generated for a feature, renumbering the claims after it"""
+    try:
+        draft = Draft.objects.get(id=draft_id)
+        data = request.get_json(silent=True) or {}
+        depends_on = data.get('depends_on') or []
+        if not isinstance(depends_on, list):
+            depends_on = [depends_on]
+        depends_on = [int(parent) for parent in depends_on]
+        position = int(data['position']) if data.get('position') is not None else None
+        
+        tree = ClaimTree.parse(draft.claims)
+        usage = None
+        text = (data.get('text') or '').strip()
+        if not text:
+            feature = (data.get('feature') or '').strip()
+            if not feature:
+                return jsonify({
+                    'success': False,
+                    'error': 'Either text or feature is required'
+                }), 400
+            with metered() as meter:
+                text = ai_service.draft_claim(draft.to_dict(), tree, feature, depends_on, number=position,
+                                              **generation_options(data))
+            usage = meter.to_record()
+        
+        tree = tree.insert(text, position)
+        if not Draft.apply_claim_edit(draft_id, draft.claims, tree, usage=usage):
+            return claims_conflict_response()
+        return claims_response(tree, f'Claim {position or len(tree)} added successfully', 201)
+        
+    except DoesNotExist:
+        return jsonify({
+            'success': False,
+            'error': 'Draft not found'
+        }), 404
+    except ClaimNotFoundError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 404
+    except RateLimitTimeout as e:
+        return rate_limited_response(e)
+    except ProviderUnavailableError as e:
+        return degraded_response(e)
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@drafting_bp.route('/<draft_id>/claims/<int:number>', methods=['DELETE'])
+def delete_claim(draft_id, number):
+    """Remove one claim and renumber the claims after it"""
+    try:
+        draft = Draft.objects.only('claims').get(id=draft_id)
+        tree = ClaimTree.parse(draft.claims).remove(number)
+        if not Draft.apply_claim_edit(draft_id, draft.claims, tree):
+            return claims_conflict_response()
+        return claims_response(tree, f'Claim {number} removed successfully')
+        
+    except DoesNotExist:
+        return jsonify({
+            'success': False,
+            'error': 'Draft not found'
+        }), 404
+    except ClaimNotFoundError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 404
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
     except Exception as e:
         return jsonify({
             'success': False,
             'error': str(e)
         }), 500
 
+@drafting_bp.route('/ai/status', methods=['GET'])
+def get_ai_status():
+    """Report AI provider health as seen by this worker"""
+    breaker = ai_service.breaker.snapshot()
+    return jsonify({
+        'success': True,
+        'data': {
+            'status': 'ok' if breaker['state'] == 'closed' else 'degraded',
+            'circuit_breaker': breaker,
+            'profiles': ai_service.router.profiles,
+            'default_profile': ai_service.router.default_profile
+        }
+    }), 200
+
+@drafting_bp.route('/usage', methods=['GET'])
+def get_usage():
+    """Aggregate token, latency and cost figures from the generation history"""
+    try:
+        group_by = request.args.get('group_by', 'section')
+        until = request.args.get('until')
+        until = datetime.fromisoformat(until) if until else None
+        since = request.args.get('since')
+        if since:
+            since = datetime.fromisoformat(since)
+        else:
+            since = (until or datetime.utcnow()) - timedelta(days=int(request.args.get('days', 30)))
+        
+        return jsonify({
+            'success': True,
+            'data': usage_report(group_by, since=since, until=until, user_id=request.args.get('user_id'))
+        }), 200
+        
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@drafting_bp.route('/search', methods=['GET'])
+def search():
+    """Full-text search over titles, invention details and sections, ranked with highlighted snippets"""
+    try:
+        return jsonify({
+            'success': True,
+            'data': search_drafts(
+                request.args.get('q', ''),
+                user_id=request.args.get('user_id'),
+                project_id=request.args.get('project_id'),
+                page=int(request.args.get('page', 1)),
+                per_page=int(request.args.get('per_page', 20))
+            )
+        }), 200
+        
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@drafting_bp.route('/batch', methods=['POST'])
+def start_batch():
+    """Create drafts for a file of invention disclosures and queue their generation"""
+    try:
+        upload = request.files.get('file')
+        if upload:
+            text = upload.read().decode('utf-8')
+            records, rejected = parse_disclosures(text, detect_format(upload.filename, upload.mimetype))
+            data = request.form
+        else:
+            data = request.get_json(silent=True) or {}
+            records, rejected = normalize_disclosures(data.get('disclosures') or [])
+        
+        if not records:
+            return jsonify({
+                'success': False,
+                'error': 'No valid disclosures provided',
+                'data': {'rejected': rejected}
+            }), 400
+        if len(records) > Config.BATCH_MAX_DISCLOSURES:
+            return jsonify({
+                'success': False,
+                'error': f'A batch can contain at most {Config.BATCH_MAX_DISCLOSURES} disclosures'
+            }), 400
+        
+        batch_id, drafts, invalid = create_batch_drafts(records, data.get('user_id', 'default_user'))
+        rejected += invalid
+        draft_ids = [str(draft.id) for draft in drafts]
+        
+        generate = is_truthy(data.get('generate', True))
+        if generate:
+            job_queue.enqueue_many(draft_ids, 'specification', options=generation_options(data),
+                                   priority=int(data.get('priority', Config.BATCH_JOB_PRIORITY)),
+                                   batch_id=batch_id)
+        
+        return jsonify({
+            'success': True,
+            'data': {
+                'batch_id': batch_id,
+                'draft_ids': draft_ids,
+                'rejected': rejected,
+                'status_url': f'/drafts/batch/{batch_id}' if generate else None,
+                'events_url': f'/drafts/batch/{batch_id}/events' if generate else None
+            },
+            'message': f'Created {len(draft_ids)} drafts' + (', generation queued' if generate else '')
+        }), 202 if generate else 201
+        
+    except UnicodeDecodeError:
+        return jsonify({
+            'success': False,
+            'error': 'Upload must be UTF-8 encoded CSV or JSONL'
+        }), 400
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@drafting_bp.route('/batch/<batch_id>', methods=['GET'])
+def get_batch_status(batch_id):
+    """Report progress, throughput and per-draft failures of a batch"""
+    try:
+        status = batch_status(batch_id)
+        if status is None:
+            return jsonify({
+                'success': False,
+                'error': 'Batch not found'
+            }), 404
+        
+        return jsonify({
+            'success': True,
+            'data': status
+        }), 200
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@drafting_bp.route('/batch/<batch_id>/events', methods=['GET'])
+def stream_batch_status(batch_id):
+    """Server-Sent Events feed of batch progress that ends when every draft is finished"""
+    if batch_status(batch_id) is None:
+        return jsonify({
+            'success': False,
+            'error': 'Batch not found'
+        }), 404
+    
+    def events():
+        deadline = time.time() + Config.JOB_EVENTS_MAX_SECONDS
+        last = None
+        while time.time() < deadline:
+            status = batch_status(batch_id)
+            progress = (status['completed'], status['running'])
+            if progress != last:
+                last = progress
+                yield sse_event('progress', status)
+            if not status['pending']:
+                yield sse_event('done', status)
+                return
+            time.sleep(max(Config.JOB_POLL_INTERVAL_SECONDS, 2))
+        yield sse_event('timeout', {'message': 'Reconnect to keep following this batch'})
+    
+    return sse_response(events())
+
 @drafting_bp.route('/<draft_id>/upload-drawing', methods=['POST'])
 def upload_drawing(draft_id):
     """Upload drawing/image for the draft"""
@@ -369,14 +1493,21 @@ def download_draft(draft_id):
 
 @drafting_bp.route('/projects/<user_id>', methods=['GET'])
 def get_user_projects(user_id):
-    """Get all projects for a user"""
+    """Get a page of a user's projects, newest first"""
     try:
-        projects = Project.objects(user_id=user_id).order_by('-updated_at')
+        projects, next_cursor = Project.list_page(user_id, page_size(request.args.get('limit')),
+                                                  request.args.get('cursor'))
         return jsonify({
             'success': True,
-            'projects': [project.to_dict() for project in projects]
+            'projects': projects,
+            'next_cursor': next_cursor
         }), 200
         
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
     except Exception as e:
         return jsonify({
             'success': False,
@@ -385,12 +1516,39 @@ def get_user_projects(user_id):
 
 @drafting_bp.route('/projects/<project_id>/drafts', methods=['GET'])
 def get_project_drafts(project_id):
-    """Get all drafts for a project"""
+    """Get a page of a project's drafts, newest first, with only the requested fields"""
     try:
-        drafts = Draft.objects(project_id=project_id).order_by('-updated_at')
+        drafts, next_cursor = Draft.list_page(project_id, page_size(request.args.get('limit')),
+                                              request.args.get('cursor'), request.args.get('fields', 'summary'))
+        return jsonify({
+            'success': True,
+            'drafts': drafts,
+            'next_cursor': next_cursor
+        }), 200
+        
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500 
+
+@drafting_bp.route('/projects/<project_id>/lint', methods=['GET'])
+def lint_project_drafts(project_id):
+    """Lint every draft in a project in one pass"""
+    try:
+        drafts = Draft.objects(project_id=project_id).only('id', 'title', *LINTABLE_SECTIONS)
+        drafts_data = (
+            dict({section: getattr(draft, section) for section in LINTABLE_SECTIONS}, id=str(draft.id), title=draft.title)
+            for draft in drafts
+        )
         return jsonify({
             'success': True,
-            'drafts': [draft.to_dict() for draft in drafts]
+            'data': default_linter.lint_drafts(drafts_data)
         }), 200
         
     except Exception as e:
@@ -13,10 +13,11 @@ export interface Draft {
   abstract: string;
   current_step: number;
   is_complete: boolean;
+  version: number;
   created_at: string;
   updated_at: string;
   ai_generated_sections: string[];
-  generation_history: GenerationRecord[];
+  generation_summary: GenerationSummary;
 }
 
 export interface Project {
@@ -41,6 +42,16 @@ export interface Drawing {
   created_at: string;
 }
 
+export interface GenerationSummary {
+  generations: number;
+  failures: number;
+  total_tokens: number;
+  cost_usd: number;
+  last_section?: string;
+  last_success?: boolean;
+  last_at?: string;
+}
+
 export interface GenerationRecord {
   section: string;
   timestamp: string;
@@ -78,4 +89,5 @@ export interface DraftUpdateData {
   claims?: string;
   abstract?: string;
   current_step?: number;
+  version?: number;  // refuse the update with 409 if the draft has changed since this version
 } 
\ No newline at end of file
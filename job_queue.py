@@ -0,0 +1,378 @@
+#!/usr/bin/env python3
+"""
+Background job queue for AI generation
+
+Jobs are documents in the generation_jobs collection. Web requests enqueue them and return
+straight away; worker processes started with
+
+    python job_queue.py --workers 4
+
+claim jobs in priority order, run the generation and write the result back to the draft.
+"""
+
+import argparse
+import multiprocessing
+import os
+import signal
+import socket
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+from pymongo import ReturnDocument
+from bson import ObjectId
+from bson.errors import InvalidId
+
+from config import Config
+from rate_limiter import RateLimitTimeout
+from resilience import ProviderUnavailableError, backoff_delay
+from usage_tracking import metered, with_queue_wait
+
+class JobCancelled(Exception):
+    """Raised inside a worker when the job it is running has been cancelled"""
+
+class RetryableJobError(Exception):
+    """A job failure worth trying again, such as a partially failed specification run"""
+
+# Errors from a provider outage or overload; anything else fails the job straight away
+TRANSIENT_ERRORS = (ProviderUnavailableError, RateLimitTimeout, RetryableJobError)
+
+class JobQueue:
+    """Enqueue, claim and settle generation jobs stored in MongoDB
+    
+    A worker claims a job with a single find_one_and_update and then holds a lease on it,
+    renewed by heartbeats. Jobs whose worker died are put back on the queue once the lease
+    runs out, so every attempt counts against max_attempts, including crashed ones.
+    """
+    
+    def __init__(self, lease_seconds: float = None, max_attempts: int = None):
+        self.lease_seconds = lease_seconds or Config.JOB_LEASE_SECONDS
+        self.max_attempts = max_attempts or Config.JOB_MAX_ATTEMPTS
+    
+    def _collection(self):
+        from models import GenerationJob
+        return GenerationJob._get_collection()
+    
+    @staticmethod
+    def _object_id(job_id) -> Optional[ObjectId]:
+        try:
+            return ObjectId(job_id)
+        except (InvalidId, TypeError):
+            return None
+    
+    def enqueue(self, draft_id: str, kind: str, section: str = None, options: Dict = None,
+                priority: int = 0):
+        """Queue a generation, reusing an identical job that is still queued or running"""
+        from models import GenerationJob
+        
+        options = options or {}
+        existing = GenerationJob.objects(
+            draft_id=draft_id, kind=kind, section=section, options=options,
+            status__in=['queued', 'running'], cancel_requested=False
+        ).first()
+        if existing:
+            return existing
+        
+        job = GenerationJob(
+            draft_id=draft_id,
+            kind=kind,
+            section=section,
+            options=options,
+            priority=priority,
+            max_attempts=self.max_attempts
+        )
+        job.save()
+        return job
+    
+    def enqueue_many(self, draft_ids, kind: str, options: Dict = None, priority: int = 0,
+                     batch_id: str = None):
+        """Queue one job per draft with a single bulk insert"""
+        from models import GenerationJob
+        
+        if not draft_ids:
+            return []
+        jobs = [
+            GenerationJob(
+                draft_id=draft_id,
+                batch_id=batch_id,
+                kind=kind,
+                options=options or {},
+                priority=priority,
+                max_attempts=self.max_attempts
+            ) for draft_id in draft_ids
+        ]
+        return GenerationJob.objects.insert(jobs)
+    
+    def get(self, job_id: str):
+        from models import GenerationJob
+        if self._object_id(job_id) is None:
+            return None
+        return GenerationJob.objects(id=job_id).first()
+    
+    def cancel_queued(self, job_id: str) -> Optional[Dict]:
+        """Cancel a job only if no worker has claimed it yet; returns the cancelled job or None"""
+        object_id = self._object_id(job_id)
+        if object_id is None:
+            return None
+        return self._collection().find_one_and_update(
+            {'_id': object_id, 'status': 'queued'},
+            {'$set': {'status': 'cancelled', 'cancel_requested': True, 'finished_at': datetime.utcnow()}},
+            return_document=ReturnDocument.AFTER
+        )
+    
+    def cancel(self, job_id: str):
+        """Cancel a queued job outright, or ask the worker running it to stop"""
+        object_id = self._object_id(job_id)
+        if object_id is None:
+            return None
+        cancelled = self.cancel_queued(job_id)
+        if cancelled:
+            return cancelled
+        collection = self._collection()
+        return collection.find_one_and_update(
+            {'_id': object_id, 'status': 'running'},
+            {'$set': {'cancel_requested': True}},
+            return_document=ReturnDocument.AFTER
+        ) or collection.find_one({'_id': object_id})
+    
+    def claim(self, worker_id: str) -> Optional[Dict]:
+        """Take the highest-priority job that is ready to run, oldest first"""
+        now = datetime.utcnow()
+        return self._collection().find_one_and_update(
+            {'status': 'queued', 'run_after': {'$lte': now}},
+            {
+                '$set': {
+                    'status': 'running',
+                    'worker_id': worker_id,
+                    'started_at': now,
+                    'lease_expires_at': now + timedelta(seconds=self.lease_seconds)
+                },
+                '$inc': {'attempts': 1}
+            },
+            sort=[('priority', -1), ('created_at', 1)],
+            return_document=ReturnDocument.AFTER
+        )
+    
+    def heartbeat(self, job: Dict, worker_id: str) -> bool:
+        """Extend the lease; returns False if the job was cancelled or taken over"""
+        renewed = self._collection().find_one_and_update(
+            {'_id': job['_id'], 'status': 'running', 'worker_id': worker_id},
+            {'$set': {'lease_expires_at': datetime.utcnow() + timedelta(seconds=self.lease_seconds)}},
+            projection={'cancel_requested': 1},
+            return_document=ReturnDocument.AFTER
+        )
+        return bool(renewed) and not renewed.get('cancel_requested')
+    
+    def complete(self, job: Dict, worker_id: str, result: Dict):
+        self._settle(job, worker_id, {'status': 'succeeded', 'result': result, 'error': None})
+    
+    def mark_cancelled(self, job: Dict, worker_id: str):
+        self._settle(job, worker_id, {'status': 'cancelled'})
+    
+    def fail(self, job: Dict, worker_id: str, error: Exception, retryable: bool):
+        """Put a failed job back on the queue with backoff, or fail it for good"""
+        if retryable and job['attempts'] < job.get('max_attempts', self.max_attempts):
+            delay = max(getattr(error, 'retry_after', 0) or 0, backoff_delay(job['attempts'], base=2, cap=60))
+            self._collection().update_one(
+                {'_id': job['_id'], 'worker_id': worker_id},
+                {'$set': {
+                    'status': 'queued',
+                    'error': str(error),
+                    'run_after': datetime.utcnow() + timedelta(seconds=delay)
+                }}
+            )
+            return
+        self._settle(job, worker_id, {'status': 'failed', 'error': str(error)})
+    
+    def requeue_expired(self):
+        """Recover jobs whose worker stopped heartbeating, e.g. because it crashed"""
+        collection = self._collection()
+        now = datetime.utcnow()
+        expired = {'status': 'running', 'lease_expires_at': {'$lt': now}}
+        
+        collection.update_many(
+            dict(expired, cancel_requested=True),
+            {'$set': {'status': 'cancelled', 'finished_at': now}}
+        )
+        collection.update_many(
+            dict(expired, **{'$expr': {'$gte': ['$attempts', '$max_attempts']}}),
+            {'$set': {'status': 'failed', 'error': 'Worker stopped responding', 'finished_at': now}}
+        )
+        collection.update_many(expired, {'$set': {'status': 'queued', 'run_after': now}})
+    
+    def _settle(self, job: Dict, worker_id: str, fields: Dict):
+        fields['finished_at'] = datetime.utcnow()
+        self._collection().update_one({'_id': job['_id'], 'worker_id': worker_id}, {'$set': fields})
+
+class JobWorker:
+    """Runs claimed jobs one at a time, heartbeating while each one is in progress"""
+    
+    # How often idle workers look for jobs whose worker died
+    REQUEUE_INTERVAL_SECONDS = 30
+    
+    def __init__(self, job_queue: JobQueue, ai_service, worker_id: str = None):
+        self.queue = job_queue
+        self.ai_service = ai_service
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+    
+    def run(self, stop_event):
+        last_requeue = 0.0
+        while not stop_event.is_set():
+            if time.time() - last_requeue > self.REQUEUE_INTERVAL_SECONDS:
+                self.queue.requeue_expired()
+                last_requeue = time.time()
+            
+            job = self.queue.claim(self.worker_id)
+            if job is None:
+                stop_event.wait(Config.JOB_POLL_INTERVAL_SECONDS)
+                continue
+            self.process(job)
+    
+    def process(self, job: Dict):
+        cancelled = threading.Event()
+        finished = threading.Event()
+        
+        def keep_leased():
+            while not finished.wait(self.queue.lease_seconds / 3):
+                if not self.queue.heartbeat(job, self.worker_id):
+                    cancelled.set()
+                    return
+        
+        heartbeat = threading.Thread(target=keep_leased, daemon=True)
+        heartbeat.start()
+        try:
+            result = self.execute(job, cancelled)
+            self.queue.complete(job, self.worker_id, result)
+            print(f"✅ Job {job['_id']} ({job['kind']} {job.get('section') or ''}) succeeded")
+        except JobCancelled:
+            self.queue.mark_cancelled(job, self.worker_id)
+            print(f"⚠️ Job {job['_id']} cancelled")
+        except Exception as e:
+            retryable = isinstance(e, TRANSIENT_ERRORS)
+            self.queue.fail(job, self.worker_id, e, retryable)
+            print(f"❌ Job {job['_id']} attempt {job['attempts']} failed: {str(e)}")
+        finally:
+            finished.set()
+    
+    def execute(self, job: Dict, cancelled: threading.Event) -> Dict:
+        from ai_service import GENERATABLE_SECTIONS, section_input_hash
+        from models import Draft
+        
+        draft_id = job['draft_id']
+        draft = Draft.objects.get(id=draft_id)
+        draft_data = draft.to_dict()
+        options = job.get('options') or {}
+        # Counted from enqueueing, so it includes backoff before a retried attempt
+        queue_wait = (job['started_at'] - job['created_at']).total_seconds()
+        
+        if job['kind'] == 'section':
+            section = job['section']
+            try:
+                with metered() as meter:
+                    content = self.ai_service.generate_section(section, draft_data, **options)
+            except Exception as e:
+                Draft.record_generation_failure(draft_id, section, str(e))
+                raise
+            # A provider call cannot be interrupted, so a cancelled job just discards its result
+            if cancelled.is_set():
+                raise JobCancelled()
+            Draft.apply_generated_section(draft_id, section, content,
+                                          fingerprint=section_input_hash(section, draft_data),
+                                          usage=with_queue_wait(meter.to_record(), queue_wait))
+            return {'section': section, 'content': content}
+        
+        if job['kind'] == 'specification':
+            def on_complete(section, content, usage):
+                if not cancelled.is_set():
+                    Draft.apply_generated_section(draft_id, section, content,
+                                                  usage=with_queue_wait(usage, queue_wait))
+            
+            def on_error(section, error_message):
+                Draft.record_generation_failure(draft_id, section, error_message)
+            
+            result = self.ai_service.generate_specification(
+                draft_data, on_complete=on_complete, on_error=on_error, **options
+            )
+            if cancelled.is_set():
+                raise JobCancelled()
+            Draft.set_section_fingerprints(draft_id, result['fingerprints'])
+            if result['errors']:
+                # Sections that did succeed are answered from the completion cache on retry
+                raise RetryableJobError(f"Failed to generate: {', '.join(result['errors'])}")
+            return result
+        
+        if job['kind'] == 'stale':
+            def on_complete(section, content, fingerprint, usage):
+                if cancelled.is_set():
+                    raise JobCancelled()
+                Draft.apply_generated_section(draft_id, section, content, fingerprint=fingerprint,
+                                              usage=with_queue_wait(usage, queue_wait))
+            
+            def on_error(section, error_message):
+                Draft.record_generation_failure(draft_id, section, error_message)
+            
+            return self.ai_service.regenerate_stale(
+                draft_data, draft.section_fingerprints, on_complete=on_complete, on_error=on_error, **options
+            )
+        
+        if job['kind'] == 'speculative':
+            # Draft the first sections while the user is still reviewing step 1. Results are kept
+            # as suggestions; later sections are generated as if the earlier suggestions were used.
+            options = dict(options)
+            sections = options.pop('sections', None) or ['background']
+            suggested = {}
+            for section in GENERATABLE_SECTIONS:
+                if section not in sections or draft_data.get(section):
+                    continue
+                fingerprint = section_input_hash(section, draft_data)
+                with metered() as meter:
+                    content = self.ai_service.generate_section(section, draft_data, **options)
+                if cancelled.is_set():
+                    raise JobCancelled()
+                Draft.store_suggestion(draft_id, section, content, fingerprint,
+                                       usage=with_queue_wait(meter.to_record(), queue_wait))
+                draft_data[section] = content
+                suggested[section] = fingerprint
+            return {'suggestions': suggested}
+        
+        raise ValueError(f"Unknown job kind: {job['kind']}")
+
+def run_worker(worker_index: int, stop_event):
+    """Entry point for one worker process"""
+    # Connect after the fork: MongoDB clients must not be shared between processes
+    from database import connect_database
+    from ai_service import PatentAIService
+    
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    connect_database()
+    worker = JobWorker(JobQueue(), PatentAIService(), f"{socket.gethostname()}:{os.getpid()}:{worker_index}")
+    print(f"Job worker {worker.worker_id} started")
+    worker.run(stop_event)
+
+def main():
+    parser = argparse.ArgumentParser(description='Run background AI generation workers')
+    parser.add_argument('--workers', type=int, default=Config.JOB_WORKERS,
+                        help='number of worker processes (default: JOB_WORKERS)')
+    args = parser.parse_args()
+    
+    stop_event = multiprocessing.Event()
+    processes = [
+        multiprocessing.Process(target=run_worker, args=(index, stop_event), daemon=True)
+        for index in range(args.workers)
+    ]
+    for process in processes:
+        process.start()
+    
+    def shutdown(signum, frame):
+        # Workers finish the job in hand before exiting
+        print("Stopping job workers...")
+        stop_event.set()
+    
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+    for process in processes:
+        process.join()
+
+if __name__ == '__main__':
+    main()
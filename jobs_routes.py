@@ -0,0 +1,139 @@
+from flask import Blueprint, request, jsonify
+from models import GenerationJob
+from job_queue import JobQueue
+from drafting_routes import sse_event, sse_response
+from config import Config
+from mongoengine.queryset.visitor import Q
+from datetime import datetime
+import time
+
+# Create blueprint for background job routes
+jobs_bp = Blueprint('jobs', __name__, url_prefix='/jobs')
+
+job_queue = JobQueue()
+
+def job_events(query, close_when_finished):
+    """Poll matching jobs and emit a 'job' event whenever one changes state"""
+    def events():
+        seen = {}
+        deadline = time.time() + Config.JOB_EVENTS_MAX_SECONDS
+        last_sent = time.time()
+        yield sse_event('start', {'jobs': query.count()})
+        
+        while time.time() < deadline:
+            jobs = list(query.clone())
+            for job in jobs:
+                state = (job.status, job.attempts, job.cancel_requested)
+                if seen.get(job.id) != state:
+                    seen[job.id] = state
+                    last_sent = time.time()
+                    yield sse_event('job', job.to_dict())
+            
+            if close_when_finished and jobs and all(job.status in GenerationJob.FINISHED_STATUSES for job in jobs):
+                yield sse_event('done', {'jobs': len(jobs)})
+                return
+            if time.time() - last_sent > 15:
+                # Comment line that keeps proxies from closing an idle stream
+                last_sent = time.time()
+                yield ": keep-alive\n\n"
+            time.sleep(Config.JOB_POLL_INTERVAL_SECONDS)
+        
+        yield sse_event('timeout', {'message': 'Reconnect to keep following these jobs'})
+    
+    return sse_response(events())
+
+@jobs_bp.route('/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Get the status, and once finished the result, of a generation job"""
+    try:
+        job = job_queue.get(job_id)
+        if job is None:
+            return jsonify({
+                'success': False,
+                'error': 'Job not found'
+            }), 404
+        
+        return jsonify({
+            'success': True,
+            'data': job.to_dict()
+        }), 200
+    
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@jobs_bp.route('/<job_id>/cancel', methods=['POST'])
+def cancel_job(job_id):
+    """Cancel a queued job, or ask the worker running it to discard its result"""
+    try:
+        if job_queue.cancel(job_id) is None:
+            return jsonify({
+                'success': False,
+                'error': 'Job not found'
+            }), 404
+        
+        job = job_queue.get(job_id)
+        return jsonify({
+            'success': True,
+            'data': job.to_dict(),
+            'message': 'Job cancelled' if job.status == 'cancelled' else 'Cancellation requested'
+        }), 200
+    
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@jobs_bp.route('/<job_id>/events', methods=['GET'])
+def job_event_stream(job_id):
+    """Server-Sent Events feed that ends when the job finishes"""
+    if job_queue.get(job_id) is None:
+        return jsonify({
+            'success': False,
+            'error': 'Job not found'
+        }), 404
+    return job_events(GenerationJob.objects(id=job_id), close_when_finished=True)
+
+@jobs_bp.route('/events', methods=['GET'])
+def draft_job_event_stream():
+    """Server-Sent Events feed of a draft's active jobs and any queued after the feed opens"""
+    draft_id = request.args.get('draft_id')
+    if not draft_id:
+        return jsonify({
+            'success': False,
+            'error': 'draft_id is required'
+        }), 400
+    
+    opened_at = datetime.utcnow()
+    # Active jobs are pinned by id so that they stay in the feed until their completion is sent
+    active_ids = [job.id for job in GenerationJob.objects(draft_id=draft_id, status__in=['queued', 'running']).only('id')]
+    query = GenerationJob.objects(
+        Q(draft_id=draft_id) & (Q(id__in=active_ids) | Q(created_at__gte=opened_at))
+    )
+    return job_events(query, close_when_finished=False)
+
+@jobs_bp.route('', methods=['GET'])
+def list_jobs():
+    """List recent jobs for a draft"""
+    try:
+        draft_id = request.args.get('draft_id')
+        if not draft_id:
+            return jsonify({
+                'success': False,
+                'error': 'draft_id is required'
+            }), 400
+        
+        jobs = GenerationJob.objects(draft_id=draft_id).order_by('-created_at').limit(50)
+        return jsonify({
+            'success': True,
+            'data': [job.to_dict() for job in jobs]
+        }), 200
+    
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
@@ -0,0 +1,145 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Optional
+
+from config import Config
+
+class CompletionCache:
+    """Content-addressed cache for LLM completions
+    
+    Lookups go to an in-process LRU first and then to a MongoDB collection shared by every
+    worker. Entries expire after a TTL in both tiers, and the MongoDB tier is trimmed back
+    to a maximum size by evicting the oldest entries.
+    """
+    
+    # How many MongoDB writes happen between size checks
+    EVICTION_CHECK_INTERVAL = 100
+    
+    def __init__(self, max_entries: int = None, ttl_seconds: int = None,
+                 shared_max_entries: int = None, use_shared: bool = True):
+        self.max_entries = max_entries or Config.COMPLETION_CACHE_LRU_SIZE
+        self.ttl_seconds = ttl_seconds or Config.COMPLETION_CACHE_TTL_SECONDS
+        self.shared_max_entries = shared_max_entries or Config.COMPLETION_CACHE_MAX_ENTRIES
+        self.use_shared = use_shared
+        
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._writes_since_check = 0
+        self._shared_warning_shown = False
+        self.hits = 0
+        self.misses = 0
+    
+    @staticmethod
+    def make_key(params: Dict) -> str:
+        """Hash every request parameter that can change the completion"""
+        messages = params.get('messages', [])
+        key_material = {
+            'model': params.get('model'),
+            'temperature': params.get('temperature'),
+            'top_p': params.get('top_p'),
+            'max_tokens': params.get('max_tokens'),
+            'system': [m['content'] for m in messages if m['role'] == 'system'],
+            'user': [m['content'] for m in messages if m['role'] != 'system'],
+        }
+        encoded = json.dumps(key_material, sort_keys=True, ensure_ascii=False).encode('utf-8')
+        return hashlib.sha256(encoded).hexdigest()
+    
+    def get(self, key: str) -> Optional[str]:
+        """Return a cached completion, or None on a miss"""
+        content = self._get_local(key)
+        if content is None and self.use_shared:
+            content = self._get_shared(key)
+            if content is not None:
+                self._set_local(key, content)
+        
+        if content is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return content
+    
+    def set(self, key: str, content: str, params: Dict = None):
+        """Store a completion in both tiers"""
+        self._set_local(key, content)
+        if self.use_shared:
+            self._set_shared(key, content, (params or {}).get('model'))
+    
+    def clear_local(self):
+        """Drop every entry from the in-process tier"""
+        with self._lock:
+            self._entries.clear()
+    
+    def _get_local(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            content, expires_at = entry
+            if expires_at < time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return content
+    
+    def _set_local(self, key: str, content: str):
+        with self._lock:
+            self._entries[key] = (content, time.time() + self.ttl_seconds)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+    
+    def _collection(self):
+        from models import CachedCompletion
+        return CachedCompletion._get_collection()
+    
+    def _get_shared(self, key: str) -> Optional[str]:
+        try:
+            document = self._collection().find_one({'_id': key}, {'content': 1, 'created_at': 1})
+        except Exception as e:
+            self._warn_shared(e)
+            return None
+        
+        if not document:
+            return None
+        # The TTL monitor only runs once a minute, so check expiry here as well
+        age = (datetime.utcnow() - document['created_at']).total_seconds()
+        if age > self.ttl_seconds:
+            return None
+        return document['content']
+    
+    def _set_shared(self, key: str, content: str, model: Optional[str]):
+        try:
+            collection = self._collection()
+            collection.update_one(
+                {'_id': key},
+                {'$set': {'content': content, 'model': model, 'created_at': datetime.utcnow()}},
+                upsert=True
+            )
+            
+            with self._lock:
+                self._writes_since_check += 1
+                check_size = self._writes_since_check >= self.EVICTION_CHECK_INTERVAL
+                if check_size:
+                    self._writes_since_check = 0
+            if check_size:
+                self._evict_shared(collection)
+        except Exception as e:
+            self._warn_shared(e)
+    
+    def _evict_shared(self, collection):
+        """Delete the oldest entries once the shared tier grows past its size limit"""
+        excess = collection.estimated_document_count() - self.shared_max_entries
+        if excess <= 0:
+            return
+        oldest = collection.find({}, {'_id': 1}).sort('created_at', 1).limit(excess)
+        collection.delete_many({'_id': {'$in': [document['_id'] for document in oldest]}})
+    
+    def _warn_shared(self, error: Exception):
+        # The cache must never break generation, so shared-tier failures degrade to the LRU tier
+        if not self._shared_warning_shown:
+            print(f"⚠️ Completion cache MongoDB tier unavailable, using in-process cache only: {str(error)}")
+            self._shared_warning_shown = True
@@ -0,0 +1,127 @@
+import os
+from abc import ABC, abstractmethod
+from typing import Dict, Iterator, NamedTuple, Optional
+
+import httpx
+import openai
+
+from config import Config
+
+class Completion(NamedTuple):
+    """A finished chat completion and its token usage, when the provider reports it"""
+    content: str
+    prompt_tokens: Optional[int] = None
+    completion_tokens: Optional[int] = None
+    total_tokens: Optional[int] = None
+    # Prompt tokens the provider served from its prompt prefix cache
+    cached_tokens: Optional[int] = None
+
+class LLMProvider(ABC):
+    """Interface PatentAIService uses to talk to a chat-completions model
+    
+    Providers own their client and the classification of their errors; model routing,
+    retries, caching, rate limiting and fallbacks stay in the service. complete() and
+    open_stream() are abstract, so an incomplete provider fails when it is created.
+    """
+    
+    name = 'base'
+    # Errors meaning the provider rejected or failed the request
+    error_types = (Exception,)
+    
+    @abstractmethod
+    def complete(self, params: Dict) -> Completion:
+        """Send one chat completion request and wait for the full response"""
+    
+    @abstractmethod
+    def open_stream(self, params: Dict) -> Iterator[str]:
+        """Open a streaming chat completion and return an iterator over its content deltas
+        
+        The request must be sent before this returns, so that failures to open the stream
+        can be retried separately from failures while reading it.
+        """
+    
+    def is_retryable(self, error: Exception) -> bool:
+        """Transient failures that are worth retrying and count against the circuit breaker"""
+        return False
+    
+    def is_quota_error(self, error: Exception) -> bool:
+        return "insufficient_quota" in str(error) or "quota" in str(error).lower()
+
+class OpenAIProvider(LLMProvider):
+    """OpenAI chat completions, or any server speaking the same protocol at base_url"""
+    
+    name = 'openai'
+    error_types = (openai.APIError,)
+    
+    def __init__(self, api_key: str = None, base_url: str = None):
+        self.api_key = api_key or os.getenv('OPENAI_API_KEY')
+        if not self.api_key:
+            raise ValueError("OpenAI API key is required")
+        
+        # Retries are handled by call_with_retries so they can share the circuit breaker
+        self.client = openai.OpenAI(
+            api_key=self.api_key,
+            base_url=base_url,
+            timeout=Config.OPENAI_REQUEST_TIMEOUT_SECONDS,
+            max_retries=0
+        )
+    
+    def complete(self, params: Dict) -> Completion:
+        response = self.client.chat.completions.create(**params)
+        usage = response.usage
+        return Completion(
+            content=response.choices[0].message.content or '',
+            prompt_tokens=usage.prompt_tokens if usage else None,
+            completion_tokens=usage.completion_tokens if usage else None,
+            total_tokens=usage.total_tokens if usage else None,
+            cached_tokens=self._cached_tokens(usage)
+        )
+    
+    @staticmethod
+    def _cached_tokens(usage) -> Optional[int]:
+        """Read usage.prompt_tokens_details.cached_tokens, which older SDKs keep as a plain dict"""
+        details = getattr(usage, 'prompt_tokens_details', None) if usage else None
+        if isinstance(details, dict):
+            return details.get('cached_tokens')
+        return getattr(details, 'cached_tokens', None)
+    
+    def open_stream(self, params: Dict) -> Iterator[str]:
+        stream = self.client.chat.completions.create(stream=True, **params)
+        
+        def deltas():
+            for chunk in stream:
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    yield delta
+        
+        return deltas()
+    
+    def is_retryable(self, error: Exception) -> bool:
+        # Transport errors raised while reading a stream are not wrapped by the SDK
+        if isinstance(error, (openai.APIConnectionError, openai.InternalServerError, httpx.TransportError)):
+            return True
+        if isinstance(error, openai.RateLimitError):
+            # Quota exhaustion will not fix itself within a retry window
+            return not self.is_quota_error(error)
+        if isinstance(error, openai.APIStatusError):
+            return error.status_code >= 500
+        return False
+
+class LocalProvider(OpenAIProvider):
+    """The local stand-in server (local_llm_server.py), for offline development and load tests"""
+    
+    name = 'local'
+    
+    def __init__(self, base_url: str = None):
+        super().__init__(api_key='local', base_url=base_url or Config.LOCAL_LLM_BASE_URL)
+
+def create_provider(name: str = None, api_key: str = None) -> LLMProvider:
+    """Build the provider selected by LLM_PROVIDER"""
+    name = (name or Config.LLM_PROVIDER).lower()
+    if name == 'openai':
+        return OpenAIProvider(api_key=api_key)
+    if name == 'local':
+        return LocalProvider()
+    raise ValueError(f"Unknown LLM provider: {name}")
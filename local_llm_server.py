@@ -0,0 +1,353 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the OpenAI chat-completions API
+
+Serves deterministic patent-style completions with realistic timing, so the whole stack can
+be benchmarked without network access or API spend:
+
+    python local_llm_server.py --port 8001 --ttft-median 0.8 --tokens-per-second 40 --error-rate 0.02
+    LLM_PROVIDER=local gunicorn -c gunicorn.conf.py app:app
+
+The same prompt always produces the same text. Latency, token rate and injected faults are
+drawn from a seeded generator, so a load test replayed in the same order sees the same run.
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import random
+import re
+import socket
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+
+SENTENCE_TEMPLATES = [
+    "The present invention relates to {subject} and, more particularly, to an arrangement of {component}.",
+    "In one embodiment, {component} is communicatively coupled to {other} through a dedicated interface.",
+    "Existing approaches to {subject} fail to coordinate {component} with {other} in real time.",
+    "The {component} receives input signals and generates control data for {other}.",
+    "It is an object of the invention to reduce the latency and power consumption of {subject}.",
+    "According to a further aspect, {other} stores configuration parameters used by {component}.",
+    "The method comprises receiving sensor data, processing the sensor data by {component}, and actuating {other}.",
+    "Those skilled in the art will appreciate that {component} may be implemented in hardware, software or a combination thereof.",
+    "Accordingly, {subject} provides improved reliability without requiring manual intervention.",
+    "In an alternative embodiment, a plurality of {component} units cooperate with {other} over a network.",
+]
+
+class LatencyModel:
+    """Time to first token from a lognormal distribution, then tokens at a jittered rate"""
+    
+    def __init__(self, ttft_median: float, ttft_sigma: float, tokens_per_second: float, rate_jitter: float):
+        self.ttft_median = ttft_median
+        self.ttft_sigma = ttft_sigma
+        self.tokens_per_second = tokens_per_second
+        self.rate_jitter = rate_jitter
+    
+    def first_token_delay(self, rng: random.Random) -> float:
+        if self.ttft_median <= 0:
+            return 0.0
+        return rng.lognormvariate(math.log(self.ttft_median), self.ttft_sigma)
+    
+    def token_rate(self, rng: random.Random) -> float:
+        """Tokens per second for one response; zero or less means no decode delay"""
+        if self.tokens_per_second <= 0:
+            return 0.0
+        return max(self.tokens_per_second * (1 + rng.uniform(-self.rate_jitter, self.rate_jitter)), 1.0)
+
+class FaultInjector:
+    """Pick an injected failure, if any, for a request"""
+    
+    KINDS = ('server_error', 'rate_limit', 'timeout', 'disconnect')
+    
+    def __init__(self, error_rate: float = 0, rate_limit_rate: float = 0, timeout_rate: float = 0,
+                 disconnect_rate: float = 0):
+        self.rates = dict(zip(self.KINDS, (error_rate, rate_limit_rate, timeout_rate, disconnect_rate)))
+    
+    def pick(self, rng: random.Random) -> Optional[str]:
+        roll = rng.random()
+        for kind in self.KINDS:
+            if roll < self.rates[kind]:
+                return kind
+            roll -= self.rates[kind]
+        return None
+
+def estimate_tokens(text: str) -> int:
+    return (len(text) + 3) // 4
+
+def synthesize_completion(messages: List[Dict], max_tokens: int, length_median: int) -> Tuple[List[str], str]:
+    """Deterministic patent-style text for a prompt; returns (token pieces, finish_reason)"""
+    prompt = '\n'.join(str(message.get('content', '')) for message in messages)
+    rng = random.Random(hashlib.sha256(prompt.encode('utf-8')).hexdigest())
+    
+    title = re.search(r'Title:\s*(.+)', prompt)
+    subject = title.group(1).strip().lower() if title and title.group(1).strip() else 'the disclosed system'
+    components = re.search(r'Key Components:\s*(.+)', prompt)
+    parts = [part.strip().lower() for part in components.group(1).split(',') if part.strip()] if components else []
+    parts = parts or ['a processing unit', 'a sensor module', 'a control interface']
+    
+    target = min(max(int(rng.lognormvariate(math.log(length_median), 0.35)), 1), max_tokens)
+    pieces = []
+    paragraph_length = 0
+    while len(pieces) < target:
+        sentence = rng.choice(SENTENCE_TEMPLATES).format(
+            subject=subject, component=rng.choice(parts), other=rng.choice(parts)
+        )
+        words = sentence.split(' ')
+        # Each word is one token piece and carries its leading space, as model tokens do
+        lead = ' ' if pieces and pieces[-1] != '\n\n' else ''
+        pieces.extend([lead + words[0]] + [' ' + word for word in words[1:]])
+        paragraph_length += 1
+        if paragraph_length >= 4:
+            pieces.append('\n\n')
+            paragraph_length = 0
+    
+    if pieces[-1] == '\n\n':
+        pieces.pop()
+    finish_reason = 'length' if len(pieces) > max_tokens else 'stop'
+    return pieces[:max_tokens], finish_reason
+
+class StandInStats:
+    """Counters reported by GET /stats"""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.in_flight = 0
+        self.completion_tokens = 0
+        self.faults = {kind: 0 for kind in FaultInjector.KINDS}
+        self.started_at = time.time()
+    
+    def add(self, **deltas):
+        with self._lock:
+            for name, delta in deltas.items():
+                if name in self.faults:
+                    self.faults[name] += delta
+                else:
+                    setattr(self, name, getattr(self, name) + delta)
+    
+    def snapshot(self) -> Dict:
+        with self._lock:
+            elapsed = time.time() - self.started_at
+            return {
+                'requests': self.requests,
+                'in_flight': self.in_flight,
+                'completion_tokens': self.completion_tokens,
+                'faults': dict(self.faults),
+                'uptime_seconds': round(elapsed, 1),
+                'requests_per_second': round(self.requests / elapsed, 2) if elapsed else 0.0
+            }
+
+class StandInServer(ThreadingHTTPServer):
+    daemon_threads = True
+    
+    def __init__(self, address, args):
+        super().__init__(address, StandInHandler)
+        self.args = args
+        self.latency = LatencyModel(args.ttft_median, args.ttft_sigma, args.tokens_per_second, args.rate_jitter)
+        self.faults = FaultInjector(args.error_rate, args.rate_limit_rate, args.timeout_rate, args.disconnect_rate)
+        self.stats = StandInStats()
+        # Requests beyond the capacity queue here, like an overloaded provider
+        self.capacity = threading.BoundedSemaphore(args.capacity) if args.capacity else None
+        self._rng = random.Random(args.seed)
+        self._rng_lock = threading.Lock()
+    
+    def draw(self) -> Dict:
+        """Draw every random value a request needs in one step, keeping runs reproducible"""
+        with self._rng_lock:
+            return {
+                'fault': self.faults.pick(self._rng),
+                'first_token_delay': self.latency.first_token_delay(self._rng),
+                'token_rate': self.latency.token_rate(self._rng),
+                'disconnect_fraction': self._rng.uniform(0.1, 0.9)
+            }
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    server_version = 'LocalLLM/1.0'
+    
+    def log_message(self, format, *args):
+        if self.server.args.verbose:
+            super().log_message(format, *args)
+    
+    def do_GET(self):
+        if self.path.rstrip('/') in ('/v1/models', '/models'):
+            self._send_json(200, {'object': 'list', 'data': [{'id': self.server.args.model, 'object': 'model'}]})
+        elif self.path.rstrip('/') in ('/stats', '/health'):
+            self._send_json(200, self.server.stats.snapshot())
+        else:
+            self._send_error(404, 'Not found', 'invalid_request_error')
+    
+    def do_POST(self):
+        if self.path.rstrip('/') not in ('/v1/chat/completions', '/chat/completions'):
+            self._send_error(404, 'Not found', 'invalid_request_error')
+            return
+        
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            body = json.loads(self.rfile.read(length) or b'{}')
+            messages = body['messages']
+        except (ValueError, KeyError):
+            self._send_error(400, 'Request body must be JSON with a messages list', 'invalid_request_error')
+            return
+        
+        stats = self.server.stats
+        stats.add(requests=1, in_flight=1)
+        try:
+            if self.server.capacity:
+                self.server.capacity.acquire()
+            try:
+                self._complete(body, messages)
+            finally:
+                if self.server.capacity:
+                    self.server.capacity.release()
+        finally:
+            stats.add(in_flight=-1)
+    
+    def _complete(self, body: Dict, messages: List[Dict]):
+        args = self.server.args
+        draw = self.server.draw()
+        fault = draw['fault']
+        if fault:
+            self.server.stats.add(**{fault: 1})
+        
+        if fault == 'rate_limit':
+            self._send_error(429, 'Rate limit reached for requests (injected)', 'requests',
+                             code='rate_limit_exceeded', headers={'Retry-After': '1'})
+            return
+        if fault == 'server_error':
+            time.sleep(draw['first_token_delay'])
+            self._send_error(500, 'The server had an error while processing your request (injected)', 'server_error')
+            return
+        if fault == 'timeout':
+            # Hang past the client's timeout, then drop the connection
+            time.sleep(args.hang_seconds)
+            self.close_connection = True
+            return
+        
+        pieces, finish_reason = synthesize_completion(messages, int(body.get('max_tokens') or 2000), args.length_median)
+        prompt_tokens = estimate_tokens(''.join(str(message.get('content', '')) for message in messages))
+        usage = {
+            'prompt_tokens': prompt_tokens,
+            'completion_tokens': len(pieces),
+            'total_tokens': prompt_tokens + len(pieces)
+        }
+        meta = {
+            'id': f"chatcmpl-local-{uuid.uuid4().hex[:12]}",
+            'created': int(time.time()),
+            'model': body.get('model') or args.model
+        }
+        interval = 1.0 / draw['token_rate'] if draw['token_rate'] else 0.0
+        
+        time.sleep(draw['first_token_delay'])
+        if body.get('stream'):
+            cut = int(len(pieces) * draw['disconnect_fraction']) if fault == 'disconnect' else None
+            self.server.stats.add(completion_tokens=self._stream(meta, pieces, finish_reason, interval, cut))
+            return
+        
+        if fault == 'disconnect':
+            self._drop_connection()
+            return
+        time.sleep(interval * len(pieces))
+        self._send_json(200, dict(meta, object='chat.completion', usage=usage, choices=[{
+            'index': 0,
+            'message': {'role': 'assistant', 'content': ''.join(pieces)},
+            'finish_reason': finish_reason
+        }]))
+        self.server.stats.add(completion_tokens=len(pieces))
+    
+    def _stream(self, meta: Dict, pieces: List[str], finish_reason: str, interval: float,
+                cut: Optional[int]) -> int:
+        """Send pieces as chat.completion.chunk events; returns how many were sent"""
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        
+        def chunk(delta: Dict, reason: Optional[str] = None):
+            payload = dict(meta, object='chat.completion.chunk', choices=[{
+                'index': 0, 'delta': delta, 'finish_reason': reason
+            }])
+            self._write_chunk(f"data: {json.dumps(payload)}\n\n")
+        
+        sent = 0
+        try:
+            chunk({'role': 'assistant', 'content': ''})
+            for piece in pieces:
+                if cut is not None and sent >= cut:
+                    self._drop_connection()
+                    return sent
+                chunk({'content': piece})
+                sent += 1
+                if interval:
+                    time.sleep(interval)
+            chunk({}, finish_reason)
+            self._write_chunk("data: [DONE]\n\n")
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            # The client went away mid-stream
+            self.close_connection = True
+        return sent
+    
+    def _write_chunk(self, text: str):
+        data = text.encode('utf-8')
+        self.wfile.write(f"{len(data):X}\r\n".encode('ascii') + data + b"\r\n")
+        self.wfile.flush()
+    
+    def _drop_connection(self):
+        self.close_connection = True
+        try:
+            self.connection.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+    
+    def _send_json(self, status: int, payload: Dict, headers: Dict = None):
+        data = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+    
+    def _send_error(self, status: int, message: str, error_type: str, code: str = None, headers: Dict = None):
+        self._send_json(status, {'error': {'message': message, 'type': error_type, 'param': None, 'code': code}}, headers)
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Local stand-in for the OpenAI chat-completions API')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8001)
+    parser.add_argument('--model', default='gpt-3.5-turbo', help='model name reported in responses')
+    parser.add_argument('--seed', type=int, default=42, help='seed for latency and fault draws')
+    parser.add_argument('--ttft-median', type=float, default=0.8, help='median seconds to first token')
+    parser.add_argument('--ttft-sigma', type=float, default=0.5, help='lognormal sigma of time to first token')
+    parser.add_argument('--tokens-per-second', type=float, default=40, help='decode rate; 0 disables decode delay')
+    parser.add_argument('--rate-jitter', type=float, default=0.25, help='+/- fraction applied to the decode rate')
+    parser.add_argument('--length-median', type=int, default=450, help='median completion length in tokens')
+    parser.add_argument('--capacity', type=int, default=0, help='concurrent generations before requests queue; 0 is unlimited')
+    parser.add_argument('--error-rate', type=float, default=0, help='fraction of requests answered with a 500')
+    parser.add_argument('--rate-limit-rate', type=float, default=0, help='fraction of requests answered with a 429')
+    parser.add_argument('--timeout-rate', type=float, default=0, help='fraction of requests that hang')
+    parser.add_argument('--disconnect-rate', type=float, default=0, help='fraction of requests dropped mid-response')
+    parser.add_argument('--hang-seconds', type=float, default=60, help='how long a hanging request stalls')
+    parser.add_argument('--verbose', action='store_true', help='log every request')
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    server = StandInServer((args.host, args.port), args)
+    print(f"Local LLM stand-in listening on http://{args.host}:{args.port}/v1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == '__main__':
+    main()
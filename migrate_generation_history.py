@@ -0,0 +1,25 @@
+#!/usr/bin/env python3
+"""
+Move generation history embedded in draft documents into the generation_history collection
+
+Can be run again if interrupted, and while the app is running.
+
+Usage: python migrate_generation_history.py
+"""
+
+from dotenv import load_dotenv
+from database import connect_database, close_database, create_indexes
+
+def main():
+    load_dotenv()
+    connect_database()
+    try:
+        from models import GenerationEvent
+        create_indexes()
+        moved = GenerationEvent.migrate_embedded_history()
+        print(f"✅ Moved {moved} generation records out of draft documents")
+    finally:
+        close_database()
+
+if __name__ == "__main__":
+    main()
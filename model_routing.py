@@ -0,0 +1,145 @@
+import copy
+import json
+from typing import Dict, NamedTuple, Optional
+
+from config import Config
+
+class Route(NamedTuple):
+    """The model and sampling settings chosen for one provider call"""
+    profile: str
+    operation: str
+    section: str
+    model: str
+    max_tokens: int
+    temperature: float
+    top_p: float
+    
+    @property
+    def name(self) -> str:
+        return f"{self.profile}/{self.operation}/{self.section}"
+
+# Operations are recognised from the prefix of the name a call is made under
+OPERATION_PREFIXES = (('rephrase_', 'rephrase'), ('digest_', 'digest'))
+
+def default_routing_table() -> Dict:
+    """Profile -> operation -> section -> settings
+    
+    Section keys match by longest prefix, so 'detailed_description_' covers every detailed
+    description part while 'detailed_description' only matches the full section. Settings
+    missing from an entry are taken from the operation's 'default', then the profile's.
+    """
+    generate = {
+        'default': {'max_tokens': 900},
+        'background': {'max_tokens': 700},
+        'summary': {'max_tokens': 700},
+        'detailed_description': {'max_tokens': 2000},
+        'detailed_description_': {'max_tokens': 1000},
+        'claims_outline': {'max_tokens': 500, 'temperature': 0.3},
+        'claims': {'max_tokens': 1200, 'temperature': 0.4},
+        'claim': {'max_tokens': 300, 'temperature': 0.4},  # a single claim, see claims_parser.py
+        # The prompt and patent_lint cap the abstract at 150 words, about 200 tokens
+        'abstract': {'max_tokens': 350, 'temperature': 0.5},
+    }
+    rephrase = {
+        'default': {'max_tokens': 900, 'temperature': 0.5},
+        'detailed_description': {'max_tokens': 2000},
+        'claims': {'max_tokens': 1200, 'temperature': 0.3},
+        'claim': {'max_tokens': 300, 'temperature': 0.3},
+        'abstract': {'max_tokens': 350},
+        'span': {'max_tokens': 600},  # a selected passage, see PatentAIService.rephrase_span
+    }
+    digest = {'default': {'max_tokens': 600, 'temperature': 0.2}}
+    
+    return {
+        'balanced': {
+            'default': {'model': Config.LLM_MODEL, 'temperature': 0.7, 'top_p': 0.9},
+            'generate': generate,
+            'rephrase': rephrase,
+            'digest': digest,
+        },
+        'fast': {
+            'default': {'model': Config.LLM_FAST_MODEL, 'temperature': 0.6, 'top_p': 0.9},
+            'generate': dict(generate, **{
+                'default': {'max_tokens': 600},
+                'background': {'max_tokens': 450},
+                'summary': {'max_tokens': 450},
+                'detailed_description': {'max_tokens': 1200},
+                'detailed_description_': {'max_tokens': 600},
+            }),
+            'rephrase': dict(rephrase, **{'detailed_description': {'max_tokens': 1200}}),
+            'digest': digest,
+        },
+        'quality': {
+            'default': {'model': Config.LLM_QUALITY_MODEL, 'temperature': 0.7, 'top_p': 0.9},
+            'generate': dict(generate, **{
+                'detailed_description': {'max_tokens': 3000},
+                'detailed_description_': {'max_tokens': 1500},
+                'claims': {'max_tokens': 1600, 'temperature': 0.3},
+            }),
+            'rephrase': dict(rephrase, **{'detailed_description': {'max_tokens': 3000}}),
+            'digest': digest,
+        },
+    }
+
+def _merge(base: Dict, overrides: Dict) -> Dict:
+    merged = copy.deepcopy(base)
+    for key, value in overrides.items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key] = _merge(merged[key], value)
+        else:
+            merged[key] = value
+    return merged
+
+class ModelRouter:
+    """Pick model, max_tokens and temperature for each call from a routing table
+    
+    The built-in table can be adjusted with a JSON file in MODEL_ROUTING_FILE using the same
+    shape; its entries are merged over the defaults, and new profiles can be added.
+    """
+    
+    def __init__(self, table: Dict = None, default_profile: str = None):
+        self.table = table or self._load_table()
+        self.default_profile = default_profile or Config.DEFAULT_GENERATION_PROFILE
+        if self.default_profile not in self.table:
+            raise ValueError(f"Unknown default generation profile: {self.default_profile}")
+    
+    @staticmethod
+    def _load_table() -> Dict:
+        table = default_routing_table()
+        if Config.MODEL_ROUTING_FILE:
+            with open(Config.MODEL_ROUTING_FILE) as handle:
+                table = _merge(table, json.load(handle))
+        return table
+    
+    @property
+    def profiles(self):
+        return sorted(self.table)
+    
+    def resolve(self, call_name: str, profile: Optional[str] = None) -> Route:
+        """Route a call such as 'claims', 'rephrase_abstract' or 'digest_background'"""
+        profile = profile or self.default_profile
+        if profile not in self.table:
+            raise ValueError(f"Unknown generation profile: {profile}")
+        
+        operation, section = 'generate', call_name
+        for prefix, name in OPERATION_PREFIXES:
+            if call_name.startswith(prefix):
+                operation, section = name, call_name[len(prefix):]
+                break
+        
+        settings = dict(self.table[profile].get('default', {}))
+        sections = self.table[profile].get(operation, {})
+        settings.update(sections.get('default', {}))
+        matches = [key for key in sections if key != 'default' and section.startswith(key)]
+        if matches:
+            settings.update(sections[max(matches, key=len)])
+        
+        return Route(
+            profile=profile,
+            operation=operation,
+            section=section,
+            model=settings.get('model', Config.LLM_MODEL),
+            max_tokens=int(settings.get('max_tokens', 2000)),
+            temperature=float(settings.get('temperature', 0.7)),
+            top_p=float(settings.get('top_p', 0.9))
+        )
@@ -1,6 +1,11 @@
-from mongoengine import Document, StringField, DateTimeField, BooleanField, IntField, ListField, ReferenceField, EmbeddedDocument, EmbeddedDocumentField
+from mongoengine import Document, StringField, DateTimeField, BooleanField, IntField, ListField, ReferenceField, EmbeddedDocument, EmbeddedDocumentField, DictField, FloatField, BinaryField
+from pymongo import WriteConcern
 from datetime import datetime
 import json
+from claims_parser import ClaimTree
+from similarity_index import INVENTION_FIELDS, index_draft_sections, sections_for_fields
+from pagination import after_cursor, encode_cursor, keyset_page, serialize
+from section_revisions import record_revision
 
 class Project(Document):
     """Model for storing patent projects"""
@@ -13,7 +18,9 @@ class Project(Document):
     updated_at = DateTimeField(default=datetime.utcnow)
     status = StringField(default='draft', max_length=50)  # draft, completed, archived
     
-    def to_dict(self):
+    def to_dict(self, draft_count=None):
+        if draft_count is None:
+            draft_count = Draft.objects(project_id=str(self.id)).count()
         return {
             'id': str(self.id),
             'user_id': self.user_id,
@@ -22,9 +29,38 @@ class Project(Document):
             'created_at': self.created_at.isoformat(),
             'updated_at': self.updated_at.isoformat(),
             'status': self.status,
-            'draft_count': Draft.objects(project_id=self.id).count()
+            'draft_count': draft_count
         }
     
+    @staticmethod
+    def list_with_draft_counts(projects):
+        """to_dict() for every project in a queryset, counting their drafts with one $group
+        
+        Two queries however many projects there are; the $group over the page's project ids
+        only reads the drafts' project_id index.
+        """
+        projects = list(projects)
+        project_ids = [str(project.id) for project in projects]
+        counts = {}
+        if project_ids:
+            counts = {
+                doc['_id']: doc['count']
+                for doc in Draft.objects(project_id__in=project_ids).aggregate([
+                    {'$group': {'_id': '$project_id', 'count': {'$sum': 1}}}
+                ])
+            }
+        return [project.to_dict(draft_count=counts.get(str(project.id), 0)) for project in projects]
+    
+    @classmethod
+    def list_page(cls, user_id, limit, cursor=None):
+        """A page of a user's projects, newest first, and the cursor for the next page"""
+        projects = cls.objects(__raw__=after_cursor({'user_id': user_id}, cursor))
+        page = cls.list_with_draft_counts(projects.order_by('-updated_at', '-id').limit(limit + 1))
+        if len(page) <= limit:
+            return page, None
+        last = page[limit - 1]
+        return page[:limit], encode_cursor({'_id': last['id'], 'updated_at': datetime.fromisoformat(last['updated_at'])})
+    
     def save(self, *args, **kwargs):
         self.updated_at = datetime.utcnow()
         return super().save(*args, **kwargs)
@@ -35,6 +71,265 @@ class GenerationRecord(EmbeddedDocument):
     timestamp = DateTimeField(default=datetime.utcnow)
     success = BooleanField(required=True)
     error_message = StringField()
+    
+    # Provider usage, summed over every call made for the section (see usage_tracking.py)
+    model = StringField(max_length=100)
+    profile = StringField(max_length=50)
+    calls = IntField()
+    cache_hit = BooleanField()
+    prompt_tokens = IntField()
+    cached_tokens = IntField()  # prompt tokens served from the provider's prefix cache
+    completion_tokens = IntField()
+    total_tokens = IntField()
+    retries = IntField()
+    latency_ms = IntField()  # time spent waiting on the provider
+    queue_wait_ms = IntField()  # time spent in the job queue and the rate limiter
+    cost_usd = FloatField()
+    speculative = BooleanField()  # generated ahead of time as a pending suggestion
+    
+    def to_dict(self):
+        return {
+            'section': self.section,
+            'timestamp': self.timestamp.isoformat(),
+            'success': self.success,
+            'error_message': self.error_message,
+            'model': self.model,
+            'profile': self.profile,
+            'calls': self.calls,
+            'cache_hit': self.cache_hit,
+            'prompt_tokens': self.prompt_tokens,
+            'cached_tokens': self.cached_tokens,
+            'completion_tokens': self.completion_tokens,
+            'total_tokens': self.total_tokens,
+            'retries': self.retries,
+            'latency_ms': self.latency_ms,
+            'queue_wait_ms': self.queue_wait_ms,
+            'cost_usd': self.cost_usd,
+            'speculative': self.speculative
+        }
+
+class GenerationSummary(EmbeddedDocument):
+    """Rolling totals of a draft's generations; the records themselves are GenerationEvents"""
+    generations = IntField(default=0)
+    failures = IntField(default=0)
+    total_tokens = IntField(default=0)
+    cost_usd = FloatField(default=0)
+    last_section = StringField()
+    last_success = BooleanField()
+    last_at = DateTimeField()
+    
+    def to_dict(self):
+        return {
+            'generations': self.generations,
+            'failures': self.failures,
+            'total_tokens': self.total_tokens,
+            'cost_usd': round(self.cost_usd or 0, 4),
+            'last_section': self.last_section,
+            'last_success': self.last_success,
+            'last_at': self.last_at.isoformat() if self.last_at else None
+        }
+    
+    @staticmethod
+    def updates(record):
+        """Update operators that fold one generation record into a draft's summary"""
+        updates = {
+            'inc__generation_summary__generations': 1,
+            'set__generation_summary__last_section': record.section,
+            'set__generation_summary__last_success': record.success,
+            'set__generation_summary__last_at': record.timestamp
+        }
+        if not record.success:
+            updates['inc__generation_summary__failures'] = 1
+        if record.total_tokens:
+            updates['inc__generation_summary__total_tokens'] = record.total_tokens
+        if record.cost_usd:
+            updates['inc__generation_summary__cost_usd'] = record.cost_usd
+        return updates
+
+class GenerationEvent(Document):
+    """One AI generation attempt, appended to its own collection instead of growing the draft"""
+    meta = {'collection': 'generation_history'}
+    
+    draft_id = StringField(required=True)
+    record = EmbeddedDocumentField(GenerationRecord, required=True)
+    migrated = BooleanField()  # moved out of a draft's embedded generation_history
+    
+    @classmethod
+    def append(cls, draft_id, record):
+        """Insert a record without waiting for the server (w=0) unless GENERATION_HISTORY_ACKNOWLEDGED is set
+        
+        The draft's summary is updated atomically with the draft itself, so a lost history
+        insert only drops the detailed record.
+        """
+        from config import Config
+        
+        collection = cls._get_collection()
+        if not Config.GENERATION_HISTORY_ACKNOWLEDGED:
+            collection = collection.with_options(write_concern=WriteConcern(w=0))
+        try:
+            collection.insert_one(cls(draft_id=str(draft_id), record=record).to_mongo())
+        except Exception as e:
+            print(f"⚠️ Could not record generation history for draft {draft_id}: {str(e)}")
+    
+    @classmethod
+    def list_page(cls, draft_id, limit, cursor=None, section=None):
+        """A page of a draft's generation records, newest first, and the cursor for the next page"""
+        match = {'draft_id': str(draft_id)}
+        if section:
+            match['record.section'] = section
+        docs, next_cursor = keyset_page(cls._get_collection(), match, limit, cursor,
+                                        {'record': 1}, field='record.timestamp')
+        return [dict(serialize(doc['record']), id=str(doc['_id'])) for doc in docs], next_cursor
+    
+    @classmethod
+    def migrate_embedded_history(cls, batch_size=100):
+        """Move generation_history arrays left in draft documents into this collection
+        
+        A draft's records are inserted first and then its array is removed in the same atomic
+        update that adds them to the summary, so an interrupted run can simply be repeated and
+        generations recorded meanwhile are kept.
+        """
+        drafts = Draft._get_collection()
+        events = cls._get_collection()
+        moved = 0
+        while True:
+            batch = list(drafts.find(
+                {'generation_history': {'$exists': True}},
+                {'generation_history': 1, 'generation_summary.last_at': 1}
+            ).limit(batch_size))
+            if not batch:
+                return moved
+            for doc in batch:
+                draft_id = str(doc['_id'])
+                records = [GenerationRecord._from_son(record) for record in doc['generation_history']]
+                # Replace copies left by an interrupted run
+                events.delete_many({'draft_id': draft_id, 'migrated': True})
+                if records:
+                    events.insert_many([cls(draft_id=draft_id, record=record, migrated=True).to_mongo() for record in records])
+                
+                totals = {
+                    'generation_summary.generations': len(records),
+                    'generation_summary.failures': sum(1 for record in records if not record.success),
+                    'generation_summary.total_tokens': sum(record.total_tokens or 0 for record in records),
+                    'generation_summary.cost_usd': sum(record.cost_usd or 0 for record in records)
+                }
+                update = {'$inc': totals, '$unset': {'generation_history': ''}}
+                last = max(records, key=lambda record: record.timestamp, default=None)
+                if last and last.timestamp > ((doc.get('generation_summary') or {}).get('last_at') or datetime.min):
+                    update['$set'] = {
+                        'generation_summary.last_section': last.section,
+                        'generation_summary.last_success': last.success,
+                        'generation_summary.last_at': last.timestamp
+                    }
+                drafts.update_one({'_id': doc['_id'], 'generation_history': {'$exists': True}}, update)
+                moved += len(records)
+
+class SectionRevision(Document):
+    """One revision of a draft section, stored as a compressed snapshot or a delta (see section_revisions.py)"""
+    meta = {'collection': 'section_revisions'}
+    
+    draft_id = StringField(required=True)
+    section = StringField(required=True, max_length=50)
+    number = IntField(required=True)  # 1, 2, ... per draft section
+    kind = StringField(required=True, max_length=10)  # snapshot or delta
+    snapshot_number = IntField(required=True)  # the snapshot this revision is rebuilt from
+    data = BinaryField(required=True)  # zlib-compressed text, or delta ops from the previous revision
+    content_hash = StringField(required=True, max_length=64)
+    length = IntField()  # characters in the section at this revision
+    stored_bytes = IntField()  # size of data, so listings need not read it
+    source = StringField(max_length=20)  # created, edit, generation, ai_edit, suggestion or restore
+    created_at = DateTimeField(default=datetime.utcnow)
+    
+    def to_dict(self):
+        return {
+            'number': self.number,
+            'kind': self.kind,
+            'source': self.source,
+            'length': self.length,
+            'stored_bytes': self.stored_bytes,
+            'content_hash': self.content_hash,
+            'created_at': self.created_at.isoformat()
+        }
+
+class ClaimNode(EmbeddedDocument):
+    """Embedded document for one claim of a draft's parsed claim tree"""
+    number = IntField(required=True)
+    text = StringField()
+    depends_on = ListField(IntField(), default=list)  # earlier claims this claim refers to
+    
+    def to_dict(self):
+        return {
+            'number': self.number,
+            'text': self.text,
+            'depends_on': self.depends_on,
+            'independent': not self.depends_on
+        }
+
+class CachedCompletion(Document):
+    """Model for LLM completions shared between workers by the completion cache"""
+    meta = {'collection': 'completion_cache'}
+    
+    key = StringField(primary_key=True)
+    content = StringField(required=True)
+    model = StringField(max_length=100)
+    created_at = DateTimeField(default=datetime.utcnow)
+
+class GenerationFlight(Document):
+    """Model for coordinating identical in-flight generations across workers"""
+    meta = {'collection': 'generation_flights'}
+    
+    key = StringField(primary_key=True)
+    status = StringField(required=True, max_length=20)  # running, done, failed
+    token = StringField(max_length=32)  # the leader's claim
+    content = StringField()
+    error = StringField()
+    created_at = DateTimeField(default=datetime.utcnow)
+    expires_at = DateTimeField(required=True)
+
+class GenerationJob(Document):
+    """Model for AI generation work queued for the background job workers"""
+    meta = {'collection': 'generation_jobs'}
+    
+    STATUSES = ('queued', 'running', 'succeeded', 'failed', 'cancelled')
+    FINISHED_STATUSES = ('succeeded', 'failed', 'cancelled')
+    
+    draft_id = StringField(required=True)
+    batch_id = StringField(max_length=50)
+    kind = StringField(required=True, max_length=20)  # section, specification, stale or speculative
+    section = StringField(max_length=50)
+    options = DictField()
+    priority = IntField(default=0)  # higher runs first
+    status = StringField(default='queued', max_length=20)
+    attempts = IntField(default=0)
+    max_attempts = IntField(default=3)
+    cancel_requested = BooleanField(default=False)
+    worker_id = StringField(max_length=100)
+    lease_expires_at = DateTimeField()
+    run_after = DateTimeField(default=datetime.utcnow)
+    result = DictField()
+    error = StringField()
+    created_at = DateTimeField(default=datetime.utcnow)
+    started_at = DateTimeField()
+    finished_at = DateTimeField()
+    
+    def to_dict(self):
+        return {
+            'id': str(self.id),
+            'draft_id': self.draft_id,
+            'batch_id': self.batch_id,
+            'kind': self.kind,
+            'section': self.section,
+            'priority': self.priority,
+            'status': self.status,
+            'attempts': self.attempts,
+            'max_attempts': self.max_attempts,
+            'cancel_requested': self.cancel_requested,
+            'result': self.result or None,
+            'error': self.error,
+            'created_at': self.created_at.isoformat(),
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
 
 class Drawing(Document):
     """Model for storing patent drawings/images"""
@@ -61,11 +356,23 @@ class Drawing(Document):
             'created_at': self.created_at.isoformat()
         }
 
+DRAFT_SECTIONS = ('background', 'summary', 'detailed_description', 'claims', 'abstract')
+# Fields a client may change with PATCH /drafts/<id>
+EDITABLE_FIELDS = ('title', 'field_of_invention', 'brief_summary', 'key_components', 'problem_solved') + DRAFT_SECTIONS + ('current_step',)
+# Columns read for draft listings; section bodies are reduced to whether they have any text
+DRAFT_LIST_PROJECTION = dict(
+    {field: 1 for field in ('project_id', 'batch_id', 'title', 'field_of_invention', 'current_step', 'is_complete',
+                            'claim_count', 'ai_generated_sections', 'version', 'created_at', 'updated_at')},
+    has_content={section: {'$gt': [{'$strLenBytes': {'$ifNull': [f'${section}', '']}}, 0]} for section in DRAFT_SECTIONS}
+)
+
 class Draft(Document):
     """Model for storing patent draft specifications"""
-    meta = {'collection': 'drafts'}
+    # Not strict, so drafts still holding an embedded generation_history load before they are migrated
+    meta = {'collection': 'drafts', 'strict': False}
     
     project_id = StringField(required=True)
+    batch_id = StringField(max_length=50)  # set for drafts created by a batch intake
     
     # Basic information
     title = StringField(max_length=200)
@@ -81,20 +388,33 @@ class Draft(Document):
     claims = StringField()
     abstract = StringField()
     
+    # Claims parsed out of the claims text, kept in step with it on every write
+    claim_tree = ListField(EmbeddedDocumentField(ClaimNode), default=list)
+    claim_count = IntField(default=0)
+    
     # Metadata
     current_step = IntField(default=1)  # 1-8 for the 8 drafting steps
     is_complete = BooleanField(default=False)
+    version = IntField(default=0)  # incremented by every content change, for optimistic concurrency
     created_at = DateTimeField(default=datetime.utcnow)
     updated_at = DateTimeField(default=datetime.utcnow)
     
     # AI generation metadata
     ai_generated_sections = ListField(StringField(), default=list)
-    generation_history = ListField(EmbeddedDocumentField(GenerationRecord), default=list)
+    # Totals only; the generation records are kept in GenerationEvent so drafts stay the same size
+    generation_summary = EmbeddedDocumentField(GenerationSummary, default=GenerationSummary)
+    # Section -> hash of the draft fields it was generated from, to tell when it has gone stale
+    section_fingerprints = DictField()
+    # Section -> {content, fingerprint, created_at} generated speculatively and not yet used
+    pending_suggestions = DictField()
+    # The last speculative job queued for this draft; generate requests only wait for that one
+    speculative_job_id = StringField(max_length=50)
     
     def to_dict(self):
         return {
             'id': str(self.id),
             'project_id': self.project_id,
+            'batch_id': self.batch_id,
             'title': self.title,
             'field_of_invention': self.field_of_invention,
             'brief_summary': self.brief_summary,
@@ -104,22 +424,84 @@ class Draft(Document):
             'summary': self.summary,
             'detailed_description': self.detailed_description,
             'claims': self.claims,
+            'claim_tree': [claim.to_dict() for claim in self.claim_tree],
+            'claim_count': self.claim_count,
             'abstract': self.abstract,
             'current_step': self.current_step,
             'is_complete': self.is_complete,
+            'version': self.version or 0,
             'created_at': self.created_at.isoformat(),
             'updated_at': self.updated_at.isoformat(),
             'ai_generated_sections': self.ai_generated_sections,
-            'generation_history': [
-                {
-                    'section': record.section,
-                    'timestamp': record.timestamp.isoformat(),
-                    'success': record.success,
-                    'error_message': record.error_message
-                } for record in self.generation_history
-            ]
+            'section_fingerprints': self.section_fingerprints or {},
+            # Pending suggestions stay server-side; clients see them once a generate call uses one
+            'suggested_sections': sorted(self.pending_suggestions or {}),
+            'generation_summary': (self.generation_summary or GenerationSummary()).to_dict()
         }
     
+    @classmethod
+    def list_page(cls, project_id, limit, cursor=None, fields='summary'):
+        """A page of a project's drafts as plain dicts, newest first, and the cursor for the next page
+        
+        "summary" reads only the list columns, "full" returns to_dict() for each draft, and a
+        comma-separated list of field names reads just those fields.
+        """
+        collection = cls._get_collection()
+        if fields == 'full':
+            docs, next_cursor = keyset_page(collection, {'project_id': project_id}, limit, cursor)
+            return [cls._from_son(doc).to_dict() for doc in docs], next_cursor
+        
+        if fields == 'summary':
+            projection = DRAFT_LIST_PROJECTION
+        else:
+            names = [name.strip() for name in fields.split(',') if name.strip()]
+            unknown = [name for name in names if name not in cls._fields or name == 'id']
+            if unknown or not names:
+                raise ValueError(f"Unknown draft fields: {', '.join(unknown) or fields}")
+            projection = {name: 1 for name in names}
+        docs, next_cursor = keyset_page(collection, {'project_id': project_id}, limit, cursor, projection)
+        return [serialize(doc) for doc in docs], next_cursor
+    
+    @classmethod
+    def apply_update(cls, draft_id, changes, expected_version=None, source='edit'):
+        """Set only the given fields and bump the version in one atomic findAndModify
+        
+        With expected_version the update only applies if nobody has changed the draft since
+        the client read that version. Only the fields needed afterwards are read back, from
+        before the update: the replaced section text for the revision deltas and the step 1
+        inputs for the similarity index. Returns {id, version, updated_at} plus the changed
+        fields, or None if the draft did not match.
+        """
+        unknown = [field for field in changes if field not in EDITABLE_FIELDS]
+        if unknown:
+            raise ValueError(f"Fields cannot be updated: {', '.join(unknown)}")
+        now = datetime.utcnow()
+        updates = {f'set__{field}': value for field, value in changes.items()}
+        updates['set__updated_at'] = now
+        updates['inc__version'] = 1
+        if 'claims' in changes:
+            updates.update(cls.claim_tree_updates(ClaimTree.parse(changes['claims'])))
+        
+        match = {'id': draft_id}
+        if expected_version is not None:
+            # Drafts saved before versioning have no version field and read as version 0
+            match['version__in'] = [expected_version, None] if expected_version == 0 else [expected_version]
+        changed = sections_for_fields(changes)
+        read_back = [section for section in DRAFT_SECTIONS if section in changes]
+        if 'invention' in changed:
+            read_back += [field for field in INVENTION_FIELDS if field not in changes]
+        previous = cls.objects(**match).only('version', *read_back).modify(new=False, **updates)
+        if previous is None:
+            return None
+        
+        if changed:
+            draft_data = {field: getattr(previous, field) for field in read_back}
+            index_draft_sections(dict(draft_data, id=str(draft_id), **changes), changed)
+        for section in DRAFT_SECTIONS:
+            if section in changes:
+                record_revision(draft_id, section, changes[section], source, previous=getattr(previous, section) or '')
+        return dict(changes, id=str(draft_id), version=(previous.version or 0) + 1, updated_at=now.isoformat())
+    
     def update_section(self, section_name, content):
         """Update a specific section of the draft"""
         if hasattr(self, section_name):
@@ -135,13 +517,173 @@ class Draft(Document):
     
     def add_generation_record(self, section_name, success, error_message=None):
         """Add a record of AI generation attempt"""
-        record = GenerationRecord(
+        self.record_generation(self.id, GenerationRecord(
             section=section_name,
             success=success,
             error_message=error_message
+        ))
+    
+    @classmethod
+    def record_generation(cls, draft_id, record, updates=None, match=None):
+        """Apply updates to a draft along with the summary of one generation, then append the record
+        
+        match narrows the update (see apply_section_edit); the record is only kept if the draft
+        was updated. Returns the number of drafts updated.
+        """
+        updated = cls.objects(**(match or {'id': draft_id})).update_one(**dict(updates or {}, **GenerationSummary.updates(record)))
+        if updated:
+            GenerationEvent.append(draft_id, record)
+        return updated
+    
+    @classmethod
+    def apply_generated_section(cls, draft_id, section_name, content, fingerprint=None, usage=None):
+        """Atomically store AI-generated content for a section without rewriting the whole draft"""
+        updates = {
+            f'set__{section_name}': content,
+            'set__updated_at': datetime.utcnow(),
+            'inc__version': 1,
+            'add_to_set__ai_generated_sections': section_name
+        }
+        if fingerprint:
+            updates[f'set__section_fingerprints__{section_name}'] = fingerprint
+        if section_name == 'claims':
+            updates.update(cls.claim_tree_updates(ClaimTree.parse(content)))
+        record = GenerationRecord(section=section_name, success=True, **(usage or {}))
+        updated = cls.record_generation(draft_id, record, updates)
+        if updated:
+            index_draft_sections({'id': str(draft_id), section_name: content}, [section_name])
+            record_revision(draft_id, section_name, content, 'generation')
+        return updated
+    
+    @staticmethod
+    def claim_tree_updates(tree):
+        """Update operators that store a parsed claim tree and its claim count"""
+        return {
+            'set__claim_tree': [ClaimNode(number=claim.number, text=claim.text, depends_on=list(claim.depends_on))
+                                for claim in tree.claims],
+            'set__claim_count': len(tree)
+        }
+    
+    @classmethod
+    def apply_section_edit(cls, draft_id, section_name, previous_content, content, usage=None):
+        """Atomically replace a section, but only if it still holds previous_content
+        
+        An edit worked out from a stale copy of the section (a rephrased span, a single claim)
+        therefore cannot overwrite a newer version. Returns the number of drafts updated.
+        """
+        updates = {
+            f'set__{section_name}': content,
+            'set__updated_at': datetime.utcnow(),
+            'inc__version': 1
+        }
+        if section_name == 'claims':
+            updates.update(cls.claim_tree_updates(ClaimTree.parse(content)))
+        match = {'id': draft_id, section_name: previous_content}
+        if usage:
+            updates['add_to_set__ai_generated_sections'] = section_name
+            record = GenerationRecord(section=section_name, success=True, **usage)
+            updated = cls.record_generation(draft_id, record, updates, match=match)
+        else:
+            updated = cls.objects(**match).update_one(**updates)
+        if updated:
+            index_draft_sections({'id': str(draft_id), section_name: content}, [section_name])
+            record_revision(draft_id, section_name, content, 'ai_edit' if usage else 'edit', previous=previous_content)
+        return updated
+    
+    @classmethod
+    def apply_claim_edit(cls, draft_id, previous_claims, tree, usage=None):
+        """Atomically store claims edited one claim at a time (see apply_section_edit)"""
+        return cls.apply_section_edit(draft_id, 'claims', previous_claims, tree.render(), usage=usage)
+    
+    @classmethod
+    def store_suggestion(cls, draft_id, section_name, content, fingerprint, usage=None):
+        """Atomically keep speculatively generated content aside until the section is requested
+        
+        The generation is recorded in the history straight away, so its cost is reported
+        whether or not the suggestion is ever used.
+        """
+        return cls.record_generation(
+            draft_id,
+            GenerationRecord(section=section_name, success=True, speculative=True, **(usage or {})),
+            {f'set__pending_suggestions__{section_name}': {
+                'content': content,
+                'fingerprint': fingerprint,
+                'created_at': datetime.utcnow()
+            }}
         )
-        self.generation_history.append(record)
+    
+    @classmethod
+    def accept_suggestion(cls, draft_id, section_name, fingerprint):
+        """Move a pending suggestion generated from the given inputs into its section
+        
+        The suggestion is removed and written into the section by one atomic update that only
+        matches while that same suggestion is still pending, so concurrent requests cannot both
+        use it and a crash cannot lose it. Returns the content, or None if there is no
+        suggestion for these inputs.
+        """
+        draft = cls.objects(**{
+            'id': draft_id,
+            f'pending_suggestions__{section_name}__fingerprint': fingerprint
+        }).only('pending_suggestions').first()
+        if draft is None:
+            return None
+        
+        suggestion = draft.pending_suggestions[section_name]
+        content = suggestion['content']
+        updates = {
+            f'unset__pending_suggestions__{section_name}': True,
+            f'set__{section_name}': content,
+            f'set__section_fingerprints__{section_name}': fingerprint,
+            'set__updated_at': datetime.utcnow(),
+            'inc__version': 1,
+            'add_to_set__ai_generated_sections': section_name
+        }
+        if section_name == 'claims':
+            updates.update(cls.claim_tree_updates(ClaimTree.parse(content)))
+        claimed = cls.objects(**{
+            'id': draft_id,
+            f'pending_suggestions__{section_name}__fingerprint': fingerprint,
+            f'pending_suggestions__{section_name}__created_at': suggestion['created_at']
+        }).update_one(**updates)
+        if not claimed:
+            return None
+        index_draft_sections({'id': str(draft_id), section_name: content}, [section_name])
+        record_revision(draft_id, section_name, content, 'suggestion')
+        return content
+    
+    @classmethod
+    def set_section_fingerprints(cls, draft_id, fingerprints):
+        """Atomically record the input hashes of sections generated together"""
+        if not fingerprints:
+            return 0
+        return cls.objects(id=draft_id).update_one(**{
+            f'set__section_fingerprints__{section}': fingerprint
+            for section, fingerprint in fingerprints.items()
+        })
+    
+    @classmethod
+    def record_generation_failure(cls, draft_id, section_name, error_message):
+        """Atomically record a failed AI generation attempt"""
+        return cls.record_generation(draft_id, GenerationRecord(
+            section=section_name,
+            success=False,
+            error_message=error_message
+        ))
     
     def save(self, *args, **kwargs):
         self.updated_at = datetime.utcnow()
-        return super().save(*args, **kwargs) 
\ No newline at end of file
+        # Parsing takes microseconds, so the claim tree is simply rebuilt from the text
+        tree = ClaimTree.parse(self.claims)
+        self.claim_tree = self.claim_tree_updates(tree)['set__claim_tree']
+        self.claim_count = len(tree)
+        # Only re-index what changed; a new draft has every section indexed
+        changed = sections_for_fields(self._get_changed_fields()) if self.pk else None
+        result = super().save(*args, **kwargs)
+        if changed is None:
+            index_draft_sections(self.to_dict())
+        elif changed:
+            index_draft_sections(self.to_dict(), changed)
+        for section in DRAFT_SECTIONS:
+            if changed is None or section in changed:
+                record_revision(self.id, section, getattr(self, section), 'created' if changed is None else 'edit')
+        return result 
\ No newline at end of file
@@ -0,0 +1,78 @@
+import base64
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from bson import ObjectId
+from bson.errors import InvalidId
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+# Listings run newest first on (ORDER_FIELD, _id); _id breaks ties between documents saved in the same millisecond
+ORDER_FIELD = 'updated_at'
+
+def page_size(value) -> int:
+    """Validate a limit= query parameter"""
+    if value in (None, ''):
+        return DEFAULT_PAGE_SIZE
+    size = int(value)
+    if not 1 <= size <= MAX_PAGE_SIZE:
+        raise ValueError(f"limit must be between 1 and {MAX_PAGE_SIZE}")
+    return size
+
+def encode_cursor(doc: Dict, field: str = ORDER_FIELD) -> str:
+    """Opaque cursor pointing just past the given document; field may be a dotted path"""
+    value = doc
+    for part in field.split('.'):
+        value = value[part]
+    raw = f"{value.isoformat()}|{doc['_id']}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+def decode_cursor(cursor: str) -> Tuple[datetime, ObjectId]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        updated_at, doc_id = raw.split('|')
+        return datetime.fromisoformat(updated_at), ObjectId(doc_id)
+    except (ValueError, InvalidId, UnicodeDecodeError):
+        raise ValueError("Invalid cursor")
+
+def after_cursor(match: Dict, cursor: Optional[str], field: str = ORDER_FIELD) -> Dict:
+    """Narrow a filter to the documents after the cursor (a range on the listing index, not a skip)"""
+    if not cursor:
+        return match
+    value, doc_id = decode_cursor(cursor)
+    return {'$and': [match, {'$or': [
+        {field: {'$lt': value}},
+        {field: value, '_id': {'$lt': doc_id}}
+    ]}]}
+
+def keyset_page(collection, match: Dict, limit: int, cursor: Optional[str] = None,
+                projection: Optional[Dict] = None, field: str = ORDER_FIELD) -> Tuple[List[Dict], Optional[str]]:
+    """One page of raw documents, newest first by field, and the cursor for the next page
+    
+    Reads one document more than the page to tell whether there is a next page. The projection
+    runs after the limit, so only the page's documents are reshaped.
+    """
+    pipeline = [
+        {'$match': after_cursor(match, cursor, field)},
+        {'$sort': {field: -1, '_id': -1}},
+        {'$limit': limit + 1}
+    ]
+    if projection:
+        # Computed columns need $project rather than a find() projection
+        pipeline.append({'$project': dict(projection, **{field: 1})})
+    docs = list(collection.aggregate(pipeline))
+    if len(docs) <= limit:
+        return docs, None
+    docs = docs[:limit]
+    return docs, encode_cursor(docs[-1], field)
+
+def serialize(value):
+    """Make a raw MongoDB value JSON-ready: ids as strings, dates in ISO format"""
+    if isinstance(value, dict):
+        return {('id' if key == '_id' else key): serialize(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [serialize(item) for item in value]
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
@@ -0,0 +1,306 @@
+import re
+import time
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from claims_parser import claim_references, split_claims
+
+# Sections checked when a whole draft is linted
+LINTABLE_SECTIONS = ('background', 'summary', 'detailed_description', 'claims', 'abstract')
+
+class Finding(NamedTuple):
+    """One problem found in a section; start and end are character offsets into its text"""
+    rule: str
+    severity: str  # error or warning
+    message: str
+    start: int
+    end: int
+    text: str
+    
+    def to_dict(self) -> Dict:
+        return self._asdict()
+
+class PhraseRule(NamedTuple):
+    """Words or phrases that should not appear in a section
+    
+    terms match case-insensitively on word boundaries, with any run of whitespace between
+    words; patterns are raw regular expressions for terms that need more care.
+    """
+    id: str
+    severity: str
+    message: str
+    terms: Tuple[str, ...] = ()
+    patterns: Tuple[str, ...] = ()
+    sections: Optional[Tuple[str, ...]] = None  # None applies the rule to every section
+
+PHRASE_RULES = (
+    PhraseRule(
+        'first_person', 'warning', "First-person language; write in the third person",
+        terms=('me', 'my', 'mine', 'myself', 'we', 'our', 'ours', 'ourselves'),
+        # "I" and "us" only in their pronoun forms, so "(I)" enumerations and "US" are left alone
+        patterns=(r'(?<!\()(?-i:I)(?!\))', r'(?-i:us)')
+    ),
+    PhraseRule(
+        'marketing_language', 'error', "Marketing language is inappropriate for patents",
+        terms=('amazing', 'revolutionary', 'groundbreaking', 'game-changing', 'cutting-edge', 'world-class',
+               'best-in-class', 'unparalleled', 'unprecedented', 'incredible', 'breakthrough', 'marvelous')
+    ),
+    PhraseRule(
+        'absolute_terms', 'warning', "Absolute term that may narrow the claim unnecessarily",
+        terms=('must', 'always', 'never', 'essential', 'critical', 'necessarily'),
+        sections=('claims',)
+    ),
+    PhraseRule(
+        'indefinite_terms', 'warning', "Indefinite wording that can make a claim unclear",
+        terms=('etc', 'and/or', 'such as'),
+        sections=('claims',)
+    ),
+)
+
+# (minimum words, maximum words) per section; falling short is an error, running long a warning
+SECTION_LENGTH_LIMITS = {
+    'background': (50, 1000),
+    'summary': (50, 1000),
+    'detailed_description': (150, 6000),
+    'claims': (20, 3000),
+    'abstract': (25, 150),  # the Patent Office limits the abstract to 150 words
+}
+DEFAULT_LENGTH_LIMITS = (10, None)
+
+WORD = re.compile(r"[A-Za-z][A-Za-z0-9-]*")
+
+# Words that introduce a new element, and words that refer back to one
+INTRODUCERS = {'a', 'an', 'one', 'another'}
+REFERRERS = {'the', 'said'}
+# Rest of a determiner such as "one or more", "a plurality of" or "at least one"
+DETERMINER_WORDS = {'one', 'or', 'more', 'plurality', 'of', 'least'}
+# Words that end a noun phrase
+PHRASE_STOPS = {
+    'of', 'to', 'for', 'with', 'in', 'on', 'at', 'by', 'from', 'and', 'or', 'wherein', 'whereby',
+    'which', 'that', 'is', 'are', 'was', 'be', 'being', 'been', 'has', 'have', 'having', 'comprising',
+    'comprises', 'including', 'includes', 'configured', 'adapted', 'operable', 'such', 'when', 'where',
+    'said', 'the', 'a', 'an', 'each', 'into', 'through', 'between', 'via', 'claim', 'claims', 'as',
+    'so', 'than', 'then', 'it', 'its', 'based', 'using', 'according', 'further', 'thereof', 'therein'
+}
+# "the same", "the like" and similar are not references to a claimed element
+REFERENCE_EXCEPTIONS = {'same', 'like', 'other', 'following', 'invention', 'present', 'above', 'foregoing', 'art'}
+MAX_PHRASE_WORDS = 4
+# Words of a reference quoted in its finding
+REFERENCE_QUOTE_WORDS = 2
+
+class LintResult:
+    """Findings for one section plus how long each rule took"""
+    
+    def __init__(self, section: str, findings: List[Finding], timings: Dict[str, float], word_count: int):
+        self.section = section
+        self.findings = findings
+        self.timings = timings
+        self.word_count = word_count
+    
+    @property
+    def is_valid(self) -> bool:
+        return not any(finding.severity == 'error' for finding in self.findings)
+    
+    def to_dict(self) -> Dict:
+        return {
+            'section': self.section,
+            'is_valid': self.is_valid,
+            'word_count': self.word_count,
+            'findings': [finding.to_dict() for finding in self.findings],
+            'timings_ms': {rule: round(seconds * 1000, 3) for rule, seconds in self.timings.items()}
+        }
+    
+    def to_validation(self) -> Dict:
+        """The is_valid/issues/suggestions shape returned by PatentAIService.validate_content"""
+        messages = {'error': [], 'warning': []}
+        for finding in self.findings:
+            message = f"{finding.message}: '{finding.text}'" if finding.text else finding.message
+            if message not in messages[finding.severity]:
+                messages[finding.severity].append(message)
+        return {'is_valid': self.is_valid, 'issues': messages['error'], 'suggestions': messages['warning']}
+
+class PatentLinter:
+    """Checks patent sections against phrase, length and antecedent-basis rules
+    
+    Every phrase rule is compiled into a single alternation, so a section is scanned once
+    however many rules and terms there are; the named group of each match identifies its rule.
+    """
+    
+    def __init__(self, phrase_rules: Iterable[PhraseRule] = PHRASE_RULES,
+                 length_limits: Dict[str, Tuple[int, Optional[int]]] = None):
+        self.phrase_rules = {rule.id: rule for rule in phrase_rules}
+        self.length_limits = SECTION_LENGTH_LIMITS if length_limits is None else length_limits
+        self.matcher = self._compile(self.phrase_rules.values())
+    
+    @staticmethod
+    def _compile(rules: Iterable[PhraseRule]):
+        alternatives = []
+        for rule in rules:
+            # Longer terms first, so "such as" wins over any shorter overlapping term
+            terms = sorted(rule.terms, key=len, reverse=True)
+            options = [r'\s+'.join(re.escape(word) for word in term.split()) for term in terms]
+            options += list(rule.patterns)
+            if options:
+                alternatives.append(f"(?P<{rule.id}>{'|'.join(options)})")
+        return re.compile(rf"(?<![\w-])(?:{'|'.join(alternatives)})(?![\w-])", re.IGNORECASE)
+    
+    def lint(self, text: str, section: str) -> LintResult:
+        """Lint one section's text"""
+        text = text or ''
+        findings, timings = [], {}
+        
+        started = time.perf_counter()
+        for match in self.matcher.finditer(text):
+            rule = self.phrase_rules[match.lastgroup]
+            if rule.sections is None or section in rule.sections:
+                findings.append(Finding(rule.id, rule.severity, rule.message, match.start(), match.end(), match.group()))
+        timings['phrases'] = time.perf_counter() - started
+        
+        started = time.perf_counter()
+        word_count = len(WORD.findall(text))
+        findings += self._length_findings(section, word_count, len(text))
+        timings['length'] = time.perf_counter() - started
+        
+        if section == 'claims':
+            started = time.perf_counter()
+            findings += antecedent_basis_findings(text)
+            timings['antecedent_basis'] = time.perf_counter() - started
+        
+        findings.sort(key=lambda finding: finding.start)
+        return LintResult(section, findings, timings, word_count)
+    
+    def _length_findings(self, section: str, word_count: int, length: int) -> List[Finding]:
+        minimum, maximum = self.length_limits.get(section, DEFAULT_LENGTH_LIMITS)
+        if word_count < minimum:
+            return [Finding('length', 'error', f"Content is too short ({word_count} words, minimum {minimum})",
+                            0, length, '')]
+        if maximum and word_count > maximum:
+            return [Finding('length', 'warning', f"Content is too long for this section ({word_count} words, maximum {maximum})",
+                            0, length, '')]
+        return []
+    
+    def lint_draft(self, draft_data: Dict, sections: Iterable[str] = LINTABLE_SECTIONS) -> Dict[str, LintResult]:
+        """Lint every non-empty section of a draft"""
+        return {
+            section: self.lint(draft_data[section], section)
+            for section in sections if draft_data.get(section)
+        }
+    
+    def lint_drafts(self, drafts: Iterable[Dict], sections: Iterable[str] = LINTABLE_SECTIONS) -> Dict:
+        """Lint many drafts in one pass and total the findings and rule timings"""
+        sections = tuple(sections)
+        results, rule_counts, timings = [], {}, {}
+        started = time.perf_counter()
+        
+        for draft_data in drafts:
+            linted = self.lint_draft(draft_data, sections)
+            for result in linted.values():
+                for finding in result.findings:
+                    rule_counts[finding.rule] = rule_counts.get(finding.rule, 0) + 1
+                for rule, seconds in result.timings.items():
+                    timings[rule] = timings.get(rule, 0.0) + seconds
+            results.append({
+                'draft_id': draft_data.get('id'),
+                'title': draft_data.get('title'),
+                'is_valid': all(result.is_valid for result in linted.values()),
+                'sections': {section: result.to_dict() for section, result in linted.items()}
+            })
+        
+        return {
+            'drafts': results,
+            'totals': {
+                'drafts': len(results),
+                'invalid_drafts': sum(1 for result in results if not result['is_valid']),
+                'findings_by_rule': rule_counts,
+                'timings_ms': {rule: round(seconds * 1000, 3) for rule, seconds in timings.items()},
+                'elapsed_ms': round((time.perf_counter() - started) * 1000, 3)
+            }
+        }
+
+def _normalize(word: str) -> str:
+    # Singular and plural forms of an element share an antecedent
+    return word[:-1] if len(word) > 3 and word.endswith('s') and not word.endswith('ss') else word
+
+def _noun_phrase(words: List[Tuple[str, int, int]], start: int) -> Tuple[Tuple[str, ...], int]:
+    """Collect the words of a noun phrase starting at index start; returns (words, end index)"""
+    phrase = []
+    index = start
+    while index < len(words) and len(phrase) < MAX_PHRASE_WORDS:
+        word = words[index][0]
+        if word in PHRASE_STOPS:
+            break
+        phrase.append(_normalize(word))
+        index += 1
+        # A comma, semicolon or full stop after a word ends the phrase
+        if words[index - 1][3]:
+            break
+    return tuple(phrase), index
+
+def _phrase_elements(text: str) -> Tuple[List[Tuple[str, ...]], List[Tuple[Tuple[str, ...], int, int]]]:
+    """Find the elements a claim introduces and the ones it refers back to"""
+    words = []
+    for match in WORD.finditer(text):
+        following = text[match.end():match.end() + 1]
+        words.append((match.group().lower(), match.start(), match.end(), following in ',;:.'))
+    
+    introduced, references = [], []
+    index = 0
+    while index < len(words):
+        word = words[index][0]
+        if word in INTRODUCERS or word in REFERRERS:
+            phrase_start = index + 1
+            skipped = DETERMINER_WORDS if word in INTRODUCERS else {'plurality', 'of'}
+            while phrase_start < len(words) and words[phrase_start][0] in skipped:
+                phrase_start += 1
+            phrase, end = _noun_phrase(words, phrase_start)
+            if phrase and word in REFERRERS:
+                quoted = min(end, phrase_start + REFERENCE_QUOTE_WORDS) - 1
+                references.append((phrase, words[index][1], words[quoted][2]))
+            elif phrase:
+                introduced.append(phrase)
+            index = max(end, index + 1)
+            continue
+        index += 1
+    return introduced, references
+
+def _has_antecedent(reference: Tuple[str, ...], introduced: List[Tuple[str, ...]]) -> bool:
+    # Where a phrase ends is guesswork without a parser, so only its first word has to have
+    # been introduced: "the first sensor" needs a "first ..." element, "the system" a "... system"
+    return any(reference[0] in phrase for phrase in introduced)
+
+def antecedent_basis_findings(text: str) -> List[Finding]:
+    """Flag "the X" and "said X" in claims where X was not introduced in that claim or its parents"""
+    claims = split_claims(text)
+    elements = {number: _phrase_elements(body) for number, _, body in claims}
+    parents = {}
+    for number, _, body in claims:
+        parents[number] = [ref for ref in claim_references(body) if ref < number]
+    
+    def available(number, seen=()):
+        if number in seen or number not in elements:
+            return []
+        phrases = list(elements[number][0])
+        for parent in parents.get(number, []):
+            phrases += available(parent, seen + (number,))
+        return phrases
+    
+    findings = []
+    for number, offset, body in claims:
+        introduced = available(number)
+        reported = set()
+        for reference, start, end in elements[number][1]:
+            if reference[0] in REFERENCE_EXCEPTIONS or reference in reported:
+                continue
+            if not _has_antecedent(reference, introduced):
+                reported.add(reference)
+                findings.append(Finding(
+                    'antecedent_basis', 'warning',
+                    f"No antecedent basis in claim {number}",
+                    offset + start, offset + end, body[start:end]
+                ))
+    return findings
+
+# Rules are compiled once and shared by every request
+default_linter = PatentLinter()
+
+def lint_section(text: str, section: str) -> LintResult:
+    return default_linter.lint(text, section)
@@ -0,0 +1,169 @@
+import logging
+import os
+import re
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional, Tuple
+
+from config import Config
+
+try:
+    import tiktoken
+except ImportError:  # Fall back to a character-based estimate when tiktoken is not installed
+    tiktoken = None
+
+logger = logging.getLogger(__name__)
+
+SENTENCE_BOUNDARY = re.compile(r'(?<=[.!?])\s+')
+
+@lru_cache(maxsize=8)
+def _encoding(model: str):
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding('cl100k_base')
+
+def count_tokens(text: str, model: str = 'gpt-3.5-turbo') -> int:
+    """Count the tokens a piece of text will use for the given model"""
+    if not text:
+        return 0
+    if tiktoken is not None:
+        return len(_encoding(model).encode(text))
+    # English prose averages roughly four characters per token
+    return (len(text) + 3) // 4
+
+def trim_to_tokens(text: str, max_tokens: int, model: str = 'gpt-3.5-turbo') -> str:
+    """Cut text down to a token limit, preferring to stop at a sentence boundary"""
+    if count_tokens(text, model) <= max_tokens:
+        return text
+    if max_tokens <= 0:
+        return ''
+    
+    kept = []
+    used = 0
+    for sentence in SENTENCE_BOUNDARY.split(text):
+        cost = count_tokens(sentence, model) + 1
+        if used + cost > max_tokens:
+            break
+        kept.append(sentence)
+        used += cost
+    
+    if kept:
+        return ' '.join(kept) + ' [...]'
+    # A single sentence is longer than the budget, so cut it by characters
+    return text[:max_tokens * 4].rstrip() + ' [...]'
+
+@lru_cache(maxsize=256)
+def extractive_digest(text: str, max_tokens: int, model: str = 'gpt-3.5-turbo') -> str:
+    """Condense a section by sampling sentences evenly across its paragraphs
+    
+    The lead sentence of every paragraph is taken first, then the second of every paragraph
+    and so on until the budget is used, and the picks are put back in document order.
+    """
+    paragraphs = [SENTENCE_BOUNDARY.split(p.strip()) for p in re.split(r'\n\s*\n', text) if p.strip()]
+    picked = set()
+    used = 0
+    depth = 0
+    while any(depth < len(sentences) for sentences in paragraphs):
+        for index, sentences in enumerate(paragraphs):
+            if depth >= len(sentences):
+                continue
+            cost = count_tokens(sentences[depth], model) + 1
+            if used + cost > max_tokens:
+                return _join_picked(paragraphs, picked)
+            picked.add((index, depth))
+            used += cost
+        depth += 1
+    return _join_picked(paragraphs, picked)
+
+def _join_picked(paragraphs: List[List[str]], picked: set) -> str:
+    kept = []
+    for index, sentences in enumerate(paragraphs):
+        chosen = [sentence for depth, sentence in enumerate(sentences) if (index, depth) in picked]
+        if chosen:
+            kept.append(' '.join(chosen))
+    return '\n'.join(kept)
+
+def section_budget(section_name: str) -> int:
+    """Context token budget for a section, overridable per section with PROMPT_TOKEN_BUDGET_<SECTION>"""
+    override = os.getenv(f'PROMPT_TOKEN_BUDGET_{section_name.upper()}')
+    return int(override) if override else Config.PROMPT_CONTEXT_TOKEN_BUDGET
+
+class PromptAssembler:
+    """Fit the draft fields a prompt needs into a token budget
+    
+    Invention inputs are kept verbatim whenever possible. Upstream sections that do not fit
+    their share of the remaining budget are replaced with a condensed digest and, if the
+    digest is still too long, trimmed at a sentence boundary.
+    """
+    
+    # Draft fields that are upstream generated sections and may be condensed
+    CONDENSABLE_FIELDS = {'background', 'summary', 'detailed_description', 'claims', 'claims_outline'}
+    
+    def __init__(self, model: str = 'gpt-3.5-turbo', digest: Optional[Callable[[str, str, int], str]] = None):
+        self.model = model
+        # digest(field, text, max_tokens) returns a condensed version of an upstream section
+        self.digest = digest or (lambda field, text, max_tokens: extractive_digest(text, max_tokens, self.model))
+    
+    def assemble(self, section_name: str, draft_data: Dict, fields: List[Tuple[str, str]],
+                 budget: Optional[int] = None) -> str:
+        """Render "Label: value" lines for the given (label, field) pairs within the budget"""
+        budget = budget if budget is not None else section_budget(section_name)
+        values = {field: draft_data.get(field) or '' for _, field in fields}
+        counts = {field: count_tokens(value, self.model) for field, value in values.items()}
+        total = sum(counts.values())
+        condensed = []
+        
+        if total > budget:
+            protected = [field for _, field in fields if field not in self.CONDENSABLE_FIELDS]
+            condensable = [field for _, field in fields if field in self.CONDENSABLE_FIELDS]
+            
+            # Inputs keep their full text unless they alone exceed the budget
+            protected_total = sum(counts[field] for field in protected)
+            if protected_total > budget:
+                self._fit_fairly(values, counts, protected, budget)
+                protected_total = sum(counts[field] for field in protected)
+            
+            remaining = max(budget - protected_total, 0)
+            condensed = self._fit_fairly(values, counts, condensable, remaining, condense=True)
+            total = sum(counts.values())
+        
+        logger.info(
+            "Assembled %s prompt context: %d tokens (budget %d)%s",
+            section_name, total, budget,
+            f", condensed {', '.join(condensed)}" if condensed else ''
+        )
+        return '\n'.join(f"{label}: {values[field]}" for label, field in fields)
+    
+    def _over_fair_share(self, counts: Dict, fields: List[str], budget: int) -> List[str]:
+        """Return the fields that do not fit their water-filled share of the budget"""
+        remaining_fields = sorted(fields, key=lambda field: counts[field])
+        over = []
+        while remaining_fields:
+            share = budget // len(remaining_fields)
+            field = remaining_fields[0]
+            if counts[field] <= share:
+                budget -= counts[field]
+                remaining_fields.pop(0)
+            else:
+                over = remaining_fields
+                break
+        return list(over)
+    
+    def _fit_fairly(self, values: Dict, counts: Dict, fields: List[str], budget: int,
+                    condense: bool = False) -> List[str]:
+        """Shrink the fields that exceed their share, letting small fields keep their full text"""
+        over = self._over_fair_share(counts, fields, budget)
+        if not over:
+            return []
+        spare = budget - sum(counts[field] for field in fields if field not in over)
+        share = max(spare // len(over), 0)
+        for field in over:
+            text = values[field]
+            # Trimming keeps most of a field that is only slightly over; a digest keeps the
+            # overall shape of one that is far over
+            if condense and counts[field] > 2 * share:
+                text = self.digest(field, text, share)
+            text = trim_to_tokens(text, share, self.model)
+            values[field] = text
+            counts[field] = count_tokens(text, self.model)
+        return over
@@ -0,0 +1,227 @@
+from typing import Dict, NamedTuple, Tuple
+
+class PromptTemplate(NamedTuple):
+    """Fixed instructions for one kind of request plus the draft fields it is given
+    
+    Prompts are rendered instructions first and variable text last, so every request made
+    from a template starts with the same tokens after the shared system prompt. Providers
+    that cache prompt prefixes can then reuse that prefix across drafts.
+    """
+    name: str
+    instructions: str
+    fields: Tuple[Tuple[str, str], ...] = ()
+    # Token budget (see prompt_budget.py) the fields are fitted to
+    budget: str = None
+    heading: str = 'Invention details'
+    
+    def render(self, variable_text: str) -> str:
+        return f"{self.instructions}\n\n{self.heading}:\n{variable_text}"
+
+# Sent as the system message of every request, so it is the start of every shared prefix
+SYSTEM_PROMPT = """You are an expert patent attorney and technical writer specializing in Indian patent law.
+Your task is to help inventors draft comprehensive patent specifications that meet the requirements of the Indian Patent Office.
+
+Key requirements:
+1. Write in clear, technical language suitable for patent examination
+2. Follow Indian patent law and guidelines
+3. Use proper patent terminology and structure
+4. Be comprehensive but concise
+5. Include all necessary technical details
+6. Write in third person, present tense
+7. Avoid marketing language or subjective claims
+
+Always maintain professional, technical tone appropriate for patent documentation."""
+
+INVENTION_FIELDS = (
+    ('Title', 'title'),
+    ('Field of Invention', 'field_of_invention'),
+    ('Brief Summary', 'brief_summary'),
+    ('Key Components', 'key_components'),
+    ('Problem Solved', 'problem_solved'),
+)
+
+PLAIN_TEXT = "Format the response as clean text without markdown formatting."
+
+CLAIMS_INSTRUCTIONS = """Write 5-8 patent claims for the invention described below.
+
+Write claims that:
+1. Start with an independent claim covering the broadest scope
+2. Include 4-7 dependent claims that add specific features
+3. Use proper patent claim language and structure
+4. Cover the main inventive aspects
+5. Include method/process claims if applicable
+
+Format each claim on a new line starting with "Claim 1:", "Claim 2:", etc.
+Use proper patent claim numbering and structure."""
+
+ABSTRACT_INSTRUCTIONS = f"""Write a concise patent abstract (at most 150 words) for the invention described below.
+
+Write an abstract that:
+1. Summarizes the invention in one paragraph
+2. Mentions the technical field and problem solved
+3. Describes the key technical solution
+4. Mentions main advantages or benefits
+5. Uses clear, technical language
+
+{PLAIN_TEXT}"""
+
+DETAILED_DESCRIPTION_PART_INSTRUCTIONS = """Write part of the Detailed Description section for the invention described below.
+
+{part}
+
+Do not add a heading or repeat the summary.
+""" + PLAIN_TEXT
+
+SINGLE_CLAIM_FORMAT = """Respond with the text of that one claim only, without a "Claim N:" label or any other claims.
+Refer to other claims by the numbers given below."""
+
+# Draft fields given with single-claim requests; the rest of the claims are left out
+CLAIM_FIELDS = (
+    ('Title', 'title'),
+    ('Field of Invention', 'field_of_invention'),
+    ('Key Components', 'key_components'),
+    ('Parent Claims', 'parent_claims'),
+)
+
+# Sub-parts of the detailed description that the specification pipeline drafts concurrently
+DETAILED_DESCRIPTION_PARTS = {
+    'components': """Write 2 paragraphs giving a detailed explanation of each key component
+and how the components are connected and work together.""",
+    'implementation': """Write 2 paragraphs giving step-by-step implementation details,
+including technical specifications, parameters and the sequence of operation.""",
+    'embodiments': """Write 2 paragraphs describing alternative embodiments or variations
+and at least one working example or use case.""",
+}
+
+def _templates() -> Dict[str, PromptTemplate]:
+    templates = [
+        PromptTemplate('background', f"""Write a comprehensive Background of Invention section for the invention described below.
+
+Write a 2-3 paragraph background section that:
+1. Introduces the technical field
+2. Describes the current state of the art
+3. Identifies limitations of existing solutions
+4. Sets up the need for the present invention
+
+{PLAIN_TEXT}""", INVENTION_FIELDS),
+        PromptTemplate('summary', f"""Write a comprehensive Summary of Invention section for the invention described below.
+
+Write a 2-3 paragraph summary that:
+1. Provides an overview of the invention
+2. Describes the main objectives and advantages
+3. Outlines the key technical features
+4. Explains how it solves the identified problem
+
+{PLAIN_TEXT}""", INVENTION_FIELDS + (('Background', 'background'),)),
+        PromptTemplate('detailed_description', f"""Write a comprehensive Detailed Description section for the invention described below.
+
+Write a detailed description (4-6 paragraphs) that includes:
+1. Detailed explanation of each component
+2. How the components work together
+3. Step-by-step implementation details
+4. Technical specifications and parameters
+5. Alternative embodiments or variations
+6. Working examples or use cases
+
+{PLAIN_TEXT}""", INVENTION_FIELDS + (('Background', 'background'), ('Summary', 'summary'))),
+        PromptTemplate('claims', CLAIMS_INSTRUCTIONS, INVENTION_FIELDS + (
+            ('Background', 'background'),
+            ('Summary', 'summary'),
+            ('Detailed Description', 'detailed_description'),
+        )),
+        PromptTemplate('abstract', ABSTRACT_INSTRUCTIONS, INVENTION_FIELDS + (
+            ('Background', 'background'),
+            ('Summary', 'summary'),
+            ('Detailed Description', 'detailed_description'),
+            ('Claims', 'claims'),
+        )),
+        PromptTemplate('claims_outline', """List the features of the invention described below that should be claimed.
+
+List:
+1. The essential elements of the broadest independent claim
+2. 4-7 narrower features suitable for dependent claims
+3. Whether a method claim is appropriate and its main steps
+
+Use short bullet points without markdown formatting.""", INVENTION_FIELDS),
+        PromptTemplate('claims_from_outline', CLAIMS_INSTRUCTIONS, (
+            ('Title', 'title'),
+            ('Field of Invention', 'field_of_invention'),
+            ('Key Components', 'key_components'),
+            ('Summary', 'summary'),
+            ('Claims Outline', 'claims_outline'),
+        ), budget='claims'),
+        PromptTemplate('abstract_from_outline', ABSTRACT_INSTRUCTIONS, (
+            ('Title', 'title'),
+            ('Field of Invention', 'field_of_invention'),
+            ('Problem Solved', 'problem_solved'),
+            ('Summary', 'summary'),
+            ('Claims Outline', 'claims_outline'),
+        ), budget='abstract'),
+        PromptTemplate('claim_regenerate', f"""Rewrite the patent claim given below.
+
+Keep the claim's category and the claims it depends on, use proper claim language and
+keep terms consistent with its parent claims.
+
+{SINGLE_CLAIM_FORMAT}""", CLAIM_FIELDS + (('Claim', 'claim'),)),
+        PromptTemplate('claim_add', f"""Write one new patent claim covering the feature described below.
+
+Make it depend on the parent claims given, or write an independent claim if there are none,
+and keep terms consistent with the parent claims.
+
+{SINGLE_CLAIM_FORMAT}""", CLAIM_FIELDS + (('New Claim Number', 'claim_number'), ('Feature', 'feature'))),
+        PromptTemplate('claim_rephrase', f"""Rephrase the patent claim given below, following the instruction given with it.
+
+Keep its scope, its category and the claims it depends on unchanged.
+
+{SINGLE_CLAIM_FORMAT}""", (
+            ('Instruction', 'instruction'),
+            ('Parent Claims', 'parent_claims'),
+            ('Claim', 'claim'),
+        ), heading='Claim to rephrase'),
+        PromptTemplate('rephrase', f"""Rephrase the patent section given below, following the instruction given with it.
+
+Provide the improved version while maintaining:
+1. All technical accuracy
+2. Patent-appropriate language
+3. Complete information
+4. Professional tone
+
+{PLAIN_TEXT}""", heading='Section to rephrase'),
+        PromptTemplate('rephrase_span', f"""Rephrase the passage given below, following the instruction given with it.
+
+The text before and after the passage is given only so the rewrite reads on from it; do not
+repeat or change it. Keep all technical content of the passage and use patent-appropriate language.
+Respond with the rewritten passage only.
+
+{PLAIN_TEXT}""", (
+            ('Section', 'section'),
+            ('Instruction', 'instruction'),
+            ('Text Before', 'before'),
+            ('Passage', 'passage'),
+            ('Text After', 'after'),
+        ), heading='Passage to rephrase'),
+        PromptTemplate('digest', f"""Condense the patent section given below into a digest no longer than the word limit given with it.
+Keep every technical element, component name and relationship; drop repetition.
+
+{PLAIN_TEXT}""", heading='Section to condense'),
+    ]
+    for part, instructions in DETAILED_DESCRIPTION_PARTS.items():
+        templates.append(PromptTemplate(
+            f'detailed_description_{part}',
+            DETAILED_DESCRIPTION_PART_INSTRUCTIONS.format(part=instructions),
+            (
+                ('Title', 'title'),
+                ('Field of Invention', 'field_of_invention'),
+                ('Key Components', 'key_components'),
+                ('Problem Solved', 'problem_solved'),
+                ('Summary', 'summary'),
+            )
+        ))
+    return {template.name: template for template in templates}
+
+PROMPT_TEMPLATES = _templates()
+
+def get_template(name: str) -> PromptTemplate:
+    if name not in PROMPT_TEMPLATES:
+        raise ValueError(f"Unknown prompt template: {name}")
+    return PROMPT_TEMPLATES[name]
@@ -0,0 +1,203 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Optional
+
+from config import Config
+
+try:
+    import fcntl
+except ImportError:  # Windows development machines only coordinate threads within one process
+    fcntl = None
+
+class RateLimitTimeout(Exception):
+    """Raised when a request could not get provider capacity before its deadline"""
+    
+    def __init__(self, message: str, retry_after: float = 1.0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+class _FileLock:
+    """Exclusive lock shared by every process on the host (and every thread in this one)"""
+    
+    def __init__(self, path: str):
+        self.path = path
+        self._thread_lock = threading.Lock()
+    
+    @contextmanager
+    def hold(self):
+        with self._thread_lock:
+            if fcntl is None:
+                yield
+                return
+            with open(self.path, 'a+') as handle:
+                fcntl.flock(handle, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(handle, fcntl.LOCK_UN)
+
+class TokenBucketLimiter:
+    """Requests-per-minute and tokens-per-minute buckets shared through a state file
+    
+    Every gunicorn worker on the host reads and updates the same JSON state under a file
+    lock, so together they stay under the provider's limits instead of each assuming it
+    has the whole quota.
+    """
+    
+    def __init__(self, requests_per_minute: int, tokens_per_minute: int, burst_seconds: float = 10,
+                 state_dir: str = None):
+        state_dir = state_dir or Config.RATE_LIMIT_STATE_DIR
+        os.makedirs(state_dir, exist_ok=True)
+        self.state_path = os.path.join(state_dir, 'openai_buckets.json')
+        self._lock = _FileLock(os.path.join(state_dir, 'openai_buckets.lock'))
+        
+        self.rates = {
+            'requests': requests_per_minute / 60.0,
+            'tokens': tokens_per_minute / 60.0,
+        }
+        # Allow short bursts of up to burst_seconds worth of quota
+        self.capacity = {
+            'requests': max(requests_per_minute / 60.0 * burst_seconds, 1),
+            'tokens': max(tokens_per_minute / 60.0 * burst_seconds, 1),
+        }
+    
+    def acquire(self, tokens: int, deadline: float) -> int:
+        """Block until one request and the estimated tokens are available, or the deadline passes
+        
+        Returns the number of tokens taken from the bucket.
+        """
+        # A request larger than the burst capacity is admitted once the bucket is full
+        tokens = min(tokens, self.capacity['tokens'])
+        while True:
+            with self._lock.hold():
+                state = self._refilled_state()
+                wait = max(
+                    (1 - state['requests']) / self.rates['requests'],
+                    (tokens - state['tokens']) / self.rates['tokens'],
+                    0
+                )
+                if wait == 0:
+                    state['requests'] -= 1
+                    state['tokens'] -= tokens
+                    self._write_state(state)
+                    return tokens
+            
+            remaining = deadline - time.time()
+            if remaining <= 0 or wait > remaining:
+                raise RateLimitTimeout("Timed out waiting for OpenAI rate limit capacity", retry_after=wait)
+            time.sleep(min(wait, remaining))
+    
+    def refund(self, tokens: int):
+        """Return over-reserved tokens, or charge more when usage exceeded the estimate"""
+        if not tokens:
+            return
+        with self._lock.hold():
+            state = self._refilled_state()
+            state['tokens'] = min(state['tokens'] + tokens, self.capacity['tokens'])
+            self._write_state(state)
+    
+    def _refilled_state(self):
+        now = time.time()
+        try:
+            with open(self.state_path) as handle:
+                state = json.load(handle)
+        except (OSError, ValueError):
+            state = {'requests': self.capacity['requests'], 'tokens': self.capacity['tokens'], 'updated': now}
+        
+        elapsed = max(now - state['updated'], 0)
+        for bucket in ('requests', 'tokens'):
+            state[bucket] = min(state[bucket] + elapsed * self.rates[bucket], self.capacity[bucket])
+        state['updated'] = now
+        return state
+    
+    def _write_state(self, state):
+        # Write then rename so a crashed writer never leaves a half-written file behind
+        temp_path = f"{self.state_path}.{os.getpid()}.{threading.get_ident()}"
+        with open(temp_path, 'w') as handle:
+            json.dump(state, handle)
+        os.replace(temp_path, self.state_path)
+
+class InFlightLimiter:
+    """Host-wide bound on concurrent provider requests, implemented as lockable slot files
+    
+    A slot is held by locking its file, so slots held by a crashed worker are released by
+    the operating system automatically.
+    """
+    
+    POLL_INTERVAL = 0.05
+    
+    def __init__(self, max_in_flight: int, state_dir: str = None):
+        state_dir = state_dir or Config.RATE_LIMIT_STATE_DIR
+        os.makedirs(state_dir, exist_ok=True)
+        self.slot_paths = [os.path.join(state_dir, f'openai_slot_{index}.lock') for index in range(max_in_flight)]
+        self._semaphore = threading.BoundedSemaphore(max_in_flight)
+    
+    @contextmanager
+    def slot(self, deadline: float):
+        """Hold one in-flight slot for the duration of the block"""
+        if not self._semaphore.acquire(timeout=max(deadline - time.time(), 0)):
+            raise RateLimitTimeout("Timed out waiting for a free OpenAI request slot")
+        try:
+            handle = self._lock_slot(deadline) if fcntl is not None else None
+            try:
+                yield
+            finally:
+                if handle:
+                    fcntl.flock(handle, fcntl.LOCK_UN)
+                    handle.close()
+        finally:
+            self._semaphore.release()
+    
+    def _lock_slot(self, deadline: float):
+        while True:
+            for path in self.slot_paths:
+                handle = open(path, 'a+')
+                try:
+                    fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    return handle
+                except OSError:
+                    handle.close()
+            if time.time() >= deadline:
+                raise RateLimitTimeout("Timed out waiting for a free OpenAI request slot")
+            time.sleep(self.POLL_INTERVAL)
+
+class Reservation:
+    """Tokens reserved for one request, settled once the real usage is known"""
+    
+    def __init__(self, limiter: TokenBucketLimiter, tokens: int):
+        self.limiter = limiter
+        self.tokens = tokens
+        self.settled = False
+    
+    def settle(self, actual_tokens: Optional[int]):
+        if self.settled or actual_tokens is None:
+            return
+        self.settled = True
+        self.limiter.refund(self.tokens - actual_tokens)
+
+class ProviderGovernor:
+    """Admission control for provider calls: shared rate limits plus a bounded in-flight count
+    
+    Requests over the limit wait in line until capacity frees up or their deadline passes.
+    """
+    
+    def __init__(self, requests_per_minute: int = None, tokens_per_minute: int = None,
+                 max_in_flight: int = None, queue_timeout: float = None):
+        self.limiter = TokenBucketLimiter(
+            requests_per_minute or Config.OPENAI_RPM_LIMIT,
+            tokens_per_minute or Config.OPENAI_TPM_LIMIT,
+            burst_seconds=Config.RATE_LIMIT_BURST_SECONDS
+        )
+        self.in_flight = InFlightLimiter(max_in_flight or Config.OPENAI_MAX_IN_FLIGHT)
+        self.queue_timeout = queue_timeout or Config.OPENAI_QUEUE_TIMEOUT_SECONDS
+    
+    @contextmanager
+    def admit(self, estimated_tokens: int):
+        """Wait for rate limit capacity and an in-flight slot, then run the block"""
+        deadline = time.time() + self.queue_timeout
+        with self.in_flight.slot(deadline):
+            reserved = self.limiter.acquire(estimated_tokens, deadline)
+            yield Reservation(self.limiter, reserved)
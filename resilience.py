@@ -0,0 +1,130 @@
+import random
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+from config import Config
+
+class ProviderUnavailableError(Exception):
+    """Raised when the AI provider is unhealthy and the service is running degraded"""
+    
+    status = 'degraded'
+    
+    def __init__(self, message: str, retry_after: float = None):
+        super().__init__(message)
+        self.retry_after = retry_after or Config.CIRCUIT_BREAKER_RESET_SECONDS
+
+class CircuitBreaker:
+    """Fail fast once the provider has failed repeatedly, then probe it again after a cooldown
+    
+    closed: calls go through; consecutive failures are counted.
+    open: calls fail immediately until reset_seconds have passed.
+    half_open: a single probe call is let through; success closes the circuit, failure reopens it.
+    """
+    
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+    
+    def __init__(self, failure_threshold: int = None, reset_seconds: float = None):
+        self.failure_threshold = failure_threshold or Config.CIRCUIT_BREAKER_FAILURE_THRESHOLD
+        self.reset_seconds = reset_seconds or Config.CIRCUIT_BREAKER_RESET_SECONDS
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+    
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == self.OPEN and time.time() - self._opened_at >= self.reset_seconds:
+                return self.HALF_OPEN
+            return self._state
+    
+    def before_call(self):
+        """Raise ProviderUnavailableError instead of letting a call through to a dead provider"""
+        with self._lock:
+            if self._state == self.CLOSED:
+                return
+            
+            remaining = self.reset_seconds - (time.time() - self._opened_at)
+            if self._state == self.OPEN and remaining > 0:
+                raise ProviderUnavailableError("AI provider is unavailable; failing fast while it recovers",
+                                               retry_after=remaining)
+            if self._probe_in_flight:
+                raise ProviderUnavailableError("AI provider is recovering; a probe request is in progress")
+            
+            self._state = self.HALF_OPEN
+            self._probe_in_flight = True
+    
+    def record_success(self):
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+            self._probe_in_flight = False
+    
+    def release(self):
+        """Finish a call that says nothing about provider health, such as a rejected request"""
+        with self._lock:
+            self._probe_in_flight = False
+    
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                self._state = self.OPEN
+                self._opened_at = time.time()
+            self._probe_in_flight = False
+    
+    def snapshot(self) -> Dict:
+        state = self.state
+        with self._lock:
+            return {
+                'state': state,
+                'consecutive_failures': self._failures,
+                'opened_at': self._opened_at if state != self.CLOSED else None
+            }
+
+def backoff_delay(attempt: int, base: float = None, cap: float = None) -> float:
+    """Full-jitter exponential backoff: a random delay up to base * 2^attempt, capped"""
+    base = Config.OPENAI_RETRY_BASE_SECONDS if base is None else base
+    cap = Config.OPENAI_RETRY_MAX_SECONDS if cap is None else cap
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+def call_with_retries(func: Callable, is_retryable: Callable[[Exception], bool], breaker: CircuitBreaker,
+                      max_retries: int = None, total_timeout: float = None,
+                      on_retry: Optional[Callable[[int, Exception], None]] = None):
+    """Call func, retrying retryable errors with jittered backoff inside an overall time budget
+    
+    Retryable failures count against the circuit breaker; once retries are exhausted the last
+    error is re-raised as ProviderUnavailableError. Other errors propagate unchanged.
+    """
+    max_retries = Config.OPENAI_MAX_RETRIES if max_retries is None else max_retries
+    total_timeout = total_timeout or Config.OPENAI_TOTAL_TIMEOUT_SECONDS
+    deadline = time.time() + total_timeout
+    attempt = 0
+    
+    while True:
+        breaker.before_call()
+        try:
+            result = func()
+        except Exception as e:
+            if not is_retryable(e):
+                breaker.release()
+                raise
+            breaker.record_failure()
+            
+            delay = backoff_delay(attempt)
+            # Do not start an attempt that cannot finish inside the overall budget
+            if attempt >= max_retries or time.time() + delay + Config.OPENAI_REQUEST_TIMEOUT_SECONDS > deadline:
+                raise ProviderUnavailableError(f"AI provider request failed after {attempt + 1} attempt(s): {str(e)}") from e
+            
+            attempt += 1
+            if on_retry:
+                on_retry(attempt, e)
+            time.sleep(delay)
+            continue
+        
+        breaker.record_success()
+        return result
@@ -0,0 +1,198 @@
+import difflib
+import hashlib
+import json
+import re
+import zlib
+from typing import Dict, List, Optional, Union
+from config import Config
+
+REVISION_SECTIONS = ('background', 'summary', 'detailed_description', 'claims', 'abstract')
+# Words with their trailing whitespace; together they cover the whole text
+WORD = re.compile(r'\S+\s*|\s+')
+# Changed blocks larger than this are stored whole instead of being diffed word by word
+MAX_REFINE_WORDS = 4000
+# A delta is only kept while it is clearly smaller than a fresh snapshot
+MAX_DELTA_RATIO = 0.5
+
+Delta = List[Union[List[int], str]]
+
+class RevisionNotFoundError(LookupError):
+    """Raised when a section has no revision with the requested number"""
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256((text or '').encode('utf-8')).hexdigest()
+
+def _offsets(parts: List[str], start: int = 0) -> List[int]:
+    offsets = [start]
+    for part in parts:
+        offsets.append(offsets[-1] + len(part))
+    return offsets
+
+def make_delta(base: str, target: str) -> Delta:
+    """Ops that rebuild target from base: [start, end] copies base[start:end], a string is inserted
+    
+    Lines are matched first; lines that changed are then matched word by word, so editing
+    one sentence of a long paragraph stores about that sentence.
+    """
+    ops: Delta = []
+    
+    def copy(start, end):
+        if start >= end:
+            return
+        if ops and isinstance(ops[-1], list) and ops[-1][1] == start:
+            ops[-1][1] = end
+        else:
+            ops.append([start, end])
+    
+    def insert(text):
+        if not text:
+            return
+        if ops and isinstance(ops[-1], str):
+            ops[-1] += text
+        else:
+            ops.append(text)
+    
+    base_lines = base.splitlines(keepends=True)
+    target_lines = target.splitlines(keepends=True)
+    line_offsets = _offsets(base_lines)
+    matcher = difflib.SequenceMatcher(None, base_lines, target_lines, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == 'equal':
+            copy(line_offsets[i1], line_offsets[i2])
+            continue
+        replacement = ''.join(target_lines[j1:j2])
+        if tag != 'replace':
+            insert(replacement)
+            continue
+        base_words = WORD.findall(base[line_offsets[i1]:line_offsets[i2]])
+        target_words = WORD.findall(replacement)
+        if max(len(base_words), len(target_words)) > MAX_REFINE_WORDS:
+            insert(replacement)
+            continue
+        word_offsets = _offsets(base_words, line_offsets[i1])
+        words = difflib.SequenceMatcher(None, base_words, target_words, autojunk=False)
+        for word_tag, w1, w2, v1, v2 in words.get_opcodes():
+            if word_tag == 'equal':
+                copy(word_offsets[w1], word_offsets[w2])
+            else:
+                insert(''.join(target_words[v1:v2]))
+    return ops
+
+def apply_delta(base: str, delta: Delta) -> str:
+    return ''.join(base[op[0]:op[1]] if isinstance(op, list) else op for op in delta)
+
+def pack(value) -> bytes:
+    return zlib.compress(json.dumps(value, separators=(',', ':')).encode('utf-8'), 6)
+
+def unpack(data: bytes):
+    return json.loads(zlib.decompress(data).decode('utf-8'))
+
+def record_revision(draft_id: str, section: str, content: Optional[str], source: str,
+                    previous: Optional[str] = None):
+    """Store a section's new content as its next revision; failures only log, like indexing
+    
+    previous, when the caller knows the content being replaced, saves rebuilding it.
+    """
+    if not Config.SECTION_REVISIONS_ENABLED or section not in REVISION_SECTIONS:
+        return None
+    try:
+        return _store_revision(str(draft_id), section, content or '', source, previous)
+    except Exception as e:
+        print(f"⚠️ Could not store a revision of {section} for draft {draft_id}: {str(e)}")
+        return None
+
+def _store_revision(draft_id: str, section: str, content: str, source: str, previous: Optional[str],
+                    attempts: int = 3):
+    from models import SectionRevision
+    from mongoengine.errors import NotUniqueError
+    
+    digest = content_hash(content)
+    latest = (SectionRevision.objects(draft_id=draft_id, section=section)
+              .order_by('-number').only('number', 'snapshot_number', 'content_hash').first())
+    if latest is None and not content:
+        return None
+    if latest is not None and latest.content_hash == digest:
+        return None
+    
+    number = latest.number + 1 if latest else 1
+    snapshot = pack(content)
+    kind, data, snapshot_number = 'snapshot', snapshot, number
+    # Chains are capped so that rebuilding any revision applies a bounded number of deltas
+    if latest and number - latest.snapshot_number < Config.SECTION_REVISION_SNAPSHOT_INTERVAL:
+        if previous is None or content_hash(previous) != latest.content_hash:
+            previous = reconstruct(draft_id, section, latest.number)
+        delta = pack(make_delta(previous, content))
+        if len(delta) < len(snapshot) * MAX_DELTA_RATIO:
+            kind, data, snapshot_number = 'delta', delta, latest.snapshot_number
+    
+    revision = SectionRevision(
+        draft_id=draft_id, section=section, number=number, kind=kind, snapshot_number=snapshot_number,
+        data=data, content_hash=digest, length=len(content), stored_bytes=len(data), source=source
+    )
+    try:
+        return revision.save(force_insert=True)
+    except NotUniqueError:
+        # Another write took this number first; diff against it instead
+        if attempts <= 1:
+            raise
+        return _store_revision(draft_id, section, content, source, None, attempts - 1)
+
+def reconstruct(draft_id: str, section: str, number: int) -> str:
+    """Text of a section at a revision: its snapshot plus the deltas after it, read in one range query"""
+    from models import SectionRevision
+    
+    target = SectionRevision.objects(draft_id=str(draft_id), section=section, number=number).only('snapshot_number').first()
+    if target is None:
+        raise RevisionNotFoundError(f"Revision {number} of {section} not found")
+    chain = SectionRevision.objects(
+        draft_id=str(draft_id), section=section, number__gte=target.snapshot_number, number__lte=number
+    ).order_by('number').only('number', 'kind', 'data', 'content_hash')
+    
+    text = None
+    revision = None
+    for revision in chain:
+        text = unpack(revision.data) if revision.kind == 'snapshot' else apply_delta(text, unpack(revision.data))
+    if revision is None or content_hash(text) != revision.content_hash:
+        raise RuntimeError(f"Revision {number} of {section} could not be rebuilt")
+    return text
+
+def latest_revision_number(draft_id: str, section: str) -> Optional[int]:
+    from models import SectionRevision
+    
+    latest = SectionRevision.objects(draft_id=str(draft_id), section=section).order_by('-number').only('number').first()
+    return latest.number if latest else None
+
+def list_revisions(draft_id: str, section: str, limit: int, before: Optional[int] = None) -> Dict:
+    """Revision metadata, newest first; pass the last number seen as before for the next page"""
+    from models import SectionRevision
+    
+    revisions = SectionRevision.objects(draft_id=str(draft_id), section=section)
+    if before is not None:
+        revisions = revisions.filter(number__lt=before)
+    page = list(revisions.order_by('-number').exclude('data').limit(limit + 1))
+    has_more = len(page) > limit
+    page = page[:limit]
+    return {
+        'section': section,
+        'revisions': [revision.to_dict() for revision in page],
+        'next_before': page[-1].number if has_more else None
+    }
+
+def diff_revisions(draft_id: str, section: str, from_number: int, to_number: int, context: int = 3) -> Dict:
+    """Unified line diff between two revisions, with counts of inserted and removed characters"""
+    before = reconstruct(draft_id, section, from_number)
+    after = reconstruct(draft_id, section, to_number)
+    delta = make_delta(before, after)
+    copied = sum(op[1] - op[0] for op in delta if isinstance(op, list))
+    unified = difflib.unified_diff(
+        before.splitlines(keepends=True), after.splitlines(keepends=True),
+        fromfile=f'{section}@{from_number}', tofile=f'{section}@{to_number}', n=context
+    )
+    return {
+        'section': section,
+        'from': from_number,
+        'to': to_number,
+        'inserted_chars': sum(len(op) for op in delta if isinstance(op, str)),
+        'removed_chars': len(before) - copied,
+        'diff': ''.join(unified)
+    }
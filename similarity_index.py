@@ -0,0 +1,346 @@
+#!/usr/bin/env python3
+"""
+Local "similar drafts" index
+
+Each draft section is turned into a hashed word n-gram TF vector, computed locally with no
+network calls, and stored as one row of a memory-mapped float32 matrix per section. Queries
+weight both sides by IDF and rank rows by cosine similarity with a single matrix-vector
+product. The index is updated as drafts are saved; rows freed by emptied sections are reused
+by the next drafts added. Rebuild it from MongoDB, which also compacts it, with
+
+    python similarity_index.py --rebuild
+"""
+
+import argparse
+import json
+import math
+import os
+import re
+import threading
+import zlib
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+from config import Config
+from rate_limiter import _FileLock
+
+# Step 1 inputs are indexed together as the 'invention' pseudo-section
+INVENTION_FIELDS = ('title', 'field_of_invention', 'brief_summary', 'key_components', 'problem_solved')
+INDEXED_SECTIONS = ('invention', 'background', 'summary', 'detailed_description', 'claims', 'abstract')
+
+TOKEN = re.compile(r"[a-z0-9]+(?:-[a-z0-9]+)*")
+# Words too common in patent text to say anything about the invention
+STOP_WORDS = frozenset(
+    'a an the of to and or in on for with by at from as is are be been being it its this that these those '
+    'which wherein whereby said such each one more first second further plurality invention present '
+    'claim claims embodiment embodiments may can configured comprising comprises including includes'.split()
+)
+
+def sections_for_fields(fields: Iterable[str]) -> List[str]:
+    """Indexed sections affected by a change to the given draft fields"""
+    fields = set(fields)
+    sections = ['invention'] if fields & set(INVENTION_FIELDS) else []
+    return sections + [section for section in INDEXED_SECTIONS[1:] if section in fields]
+
+def draft_section_text(draft_data: Dict, section: str) -> str:
+    """Text indexed for a section; 'invention' combines the step 1 inputs"""
+    if section == 'invention':
+        return '\n'.join(draft_data.get(field) or '' for field in INVENTION_FIELDS).strip()
+    return (draft_data.get(section) or '').strip()
+
+class HashedTfidfVectorizer:
+    """Map text to a fixed-size vector of hashed unigram and bigram counts
+    
+    Terms are hashed with crc32, which unlike hash() is stable across processes, and given a
+    hash-derived sign so that colliding terms tend to cancel rather than add up. Counts are
+    damped to 1 + log(count); IDF is applied at query time from the index's document counts.
+    """
+    
+    def __init__(self, dimensions: int = None):
+        self.dimensions = dimensions or Config.SIMILARITY_DIMENSIONS
+    
+    def terms(self, text: str) -> List[str]:
+        words = [word for word in TOKEN.findall((text or '').lower()) if word not in STOP_WORDS]
+        return words + [f"{first} {second}" for first, second in zip(words, words[1:])]
+    
+    def transform(self, text: str) -> np.ndarray:
+        counts = {}
+        for term in self.terms(text):
+            digest = zlib.crc32(term.encode('utf-8'))
+            bucket = digest % self.dimensions
+            sign = 1.0 if digest & 0x80000000 else -1.0
+            counts[bucket] = counts.get(bucket, 0.0) + sign
+        
+        vector = np.zeros(self.dimensions, dtype=np.float32)
+        for bucket, count in counts.items():
+            if count:
+                vector[bucket] = math.copysign(1.0 + math.log(abs(count)), count)
+        return vector
+
+class SectionIndex:
+    """Vectors for one section of every draft, in a memory-mapped file shared by all workers
+    
+    vectors.f32 holds one row per draft; meta.json holds the row -> draft id mapping, the free
+    rows left by removed drafts and the per-bucket document counts. Writers take a file lock; readers reload when meta.json
+    changes, so each gunicorn worker sees updates made by the others.
+    """
+    
+    INITIAL_CAPACITY = 1024
+    
+    def __init__(self, directory: str, section: str, vectorizer: HashedTfidfVectorizer):
+        self.section = section
+        self.vectorizer = vectorizer
+        self.dimensions = vectorizer.dimensions
+        self.directory = os.path.join(directory, section)
+        os.makedirs(self.directory, exist_ok=True)
+        self.vectors_path = os.path.join(self.directory, 'vectors.f32')
+        self.meta_path = os.path.join(self.directory, 'meta.json')
+        self.file_lock = _FileLock(os.path.join(self.directory, 'lock'))
+        self._lock = threading.Lock()
+        self._loaded_mtime = None
+        self._norms = None
+        self._reset()
+    
+    def _reset(self):
+        self.ids = []
+        self.rows = {}
+        self.free = []
+        self.document_frequency = np.zeros(self.dimensions, dtype=np.float64)
+        self.documents = 0
+        self.vectors = None
+    
+    def _meta_mtime(self) -> Optional[float]:
+        try:
+            return os.stat(self.meta_path).st_mtime_ns
+        except OSError:
+            return None
+    
+    def _refresh(self):
+        """Reload the row mapping and remap the vectors if another process changed them"""
+        mtime = self._meta_mtime()
+        if mtime == self._loaded_mtime:
+            return
+        self._reset()
+        if mtime is not None:
+            with open(self.meta_path) as handle:
+                meta = json.load(handle)
+            if meta['dimensions'] != self.dimensions:
+                raise ValueError(
+                    f"Similarity index for {self.section} has {meta['dimensions']} dimensions, "
+                    f"SIMILARITY_DIMENSIONS is {self.dimensions}; rebuild the index"
+                )
+            self.ids = meta['ids']
+            self.rows = {draft_id: row for row, draft_id in enumerate(self.ids) if draft_id}
+            self.free = meta.get('free', [row for row, draft_id in enumerate(self.ids) if not draft_id])
+            self.document_frequency = np.asarray(meta['document_frequency'], dtype=np.float64)
+            self.documents = meta['documents']
+            capacity = os.path.getsize(self.vectors_path) // (4 * self.dimensions)
+            self.vectors = np.memmap(self.vectors_path, dtype=np.float32, mode='r+',
+                                     shape=(capacity, self.dimensions))
+        self._loaded_mtime = mtime
+        self._norms = None
+    
+    def _ensure_capacity(self, rows: int):
+        capacity = 0 if self.vectors is None else self.vectors.shape[0]
+        if rows <= capacity:
+            return
+        new_capacity = max(self.INITIAL_CAPACITY, capacity * 2, rows)
+        if self.vectors is not None:
+            self.vectors.flush()
+        with open(self.vectors_path, 'ab') as handle:
+            handle.truncate(new_capacity * self.dimensions * 4)
+        self.vectors = np.memmap(self.vectors_path, dtype=np.float32, mode='r+',
+                                 shape=(new_capacity, self.dimensions))
+    
+    def _write_meta(self):
+        self.vectors.flush()
+        temp_path = f"{self.meta_path}.{os.getpid()}.{threading.get_ident()}"
+        with open(temp_path, 'w') as handle:
+            json.dump({
+                'dimensions': self.dimensions,
+                'ids': self.ids,
+                'free': self.free,
+                'documents': self.documents,
+                'document_frequency': self.document_frequency.tolist()
+            }, handle)
+        os.replace(temp_path, self.meta_path)
+        self._loaded_mtime = self._meta_mtime()
+        self._norms = None
+    
+    def update(self, changes: Dict[str, Optional[str]]):
+        """Add, replace or (for None or empty text) remove the rows of several drafts at once"""
+        if not changes:
+            return
+        vectors = {draft_id: self.vectorizer.transform(text) if text else None for draft_id, text in changes.items()}
+        with self._lock, self.file_lock.hold():
+            self._refresh()
+            for draft_id, vector in vectors.items():
+                row = self.rows.get(draft_id)
+                if row is not None:
+                    # Take the old row out of the document counts before replacing it
+                    self.document_frequency -= self.vectors[row] != 0
+                    self.documents -= 1
+                if vector is None:
+                    if row is not None:
+                        self.vectors[row] = 0
+                        self.ids[row] = None
+                        self.free.append(row)
+                        del self.rows[draft_id]
+                    continue
+                if row is None and self.free:
+                    row = self.free.pop()
+                    self.ids[row] = draft_id
+                    self.rows[draft_id] = row
+                elif row is None:
+                    row = len(self.ids)
+                    self._ensure_capacity(row + 1)
+                    self.ids.append(draft_id)
+                    self.rows[draft_id] = row
+                self.vectors[row] = vector
+                self.document_frequency += vector != 0
+                self.documents += 1
+            if self.vectors is not None:
+                self._write_meta()
+    
+    def search(self, text: str, limit: int = 5, exclude: Iterable[str] = ()) -> List[Dict]:
+        """Drafts whose section is most similar to the given text, best first"""
+        query = self.vectorizer.transform(text)
+        with self._lock:
+            self._refresh()
+            count = len(self.ids)
+            if not count or not query.any() or limit < 1:
+                return []
+            idf = np.log((1.0 + self.documents) / (1.0 + self.document_frequency)) + 1.0
+            weights = (idf * idf).astype(np.float32)
+            matrix = self.vectors[:count]
+            if self._norms is None:
+                # Recomputed only after the index changes, not on every query
+                self._norms = np.sqrt((matrix * matrix) @ weights)
+            scores = matrix @ (query * weights)
+            
+            query_norm = float(np.sqrt((query * query) @ weights))
+            with np.errstate(divide='ignore', invalid='ignore'):
+                scores = np.where(self._norms > 0, scores / (self._norms * query_norm), -1.0)
+            for draft_id in exclude:
+                if draft_id in self.rows:
+                    scores[self.rows[draft_id]] = -1.0
+            
+            limit = min(limit, count)
+            top = np.argpartition(-scores, limit - 1)[:limit]
+            top = top[np.argsort(-scores[top])]
+            return [
+                {'draft_id': self.ids[row], 'score': round(float(scores[row]), 4)}
+                for row in top if scores[row] > 0
+            ]
+    
+    def __len__(self) -> int:
+        with self._lock:
+            self._refresh()
+            return len(self.rows)
+
+class SimilarityIndex:
+    """One SectionIndex per indexed section"""
+    
+    def __init__(self, directory: str = None, dimensions: int = None):
+        self.directory = directory or Config.SIMILARITY_INDEX_DIR
+        self.vectorizer = HashedTfidfVectorizer(dimensions)
+        self.sections = {
+            section: SectionIndex(self.directory, section, self.vectorizer)
+            for section in INDEXED_SECTIONS
+        }
+    
+    def section(self, section: str) -> SectionIndex:
+        if section not in self.sections:
+            raise ValueError(f"Invalid section: {section}. Choose one of: {', '.join(INDEXED_SECTIONS)}")
+        return self.sections[section]
+    
+    def index_draft(self, draft_data: Dict, sections: Iterable[str] = INDEXED_SECTIONS):
+        """Bring the given sections of one draft up to date"""
+        for section in sections:
+            self.sections[section].update({draft_data['id']: draft_section_text(draft_data, section)})
+    
+    def similar(self, draft_data: Dict, section: str = 'invention', limit: int = 5) -> List[Dict]:
+        """Other drafts most similar to this draft's section"""
+        text = draft_section_text(draft_data, section)
+        if not text:
+            return []
+        return self.section(section).search(text, limit, exclude=[draft_data['id']])
+    
+    def rebuild(self, drafts: Iterable[Dict], batch_size: int = 500) -> int:
+        """Index every draft from scratch, batching writes to keep the meta file rewrites few"""
+        for index in self.sections.values():
+            with index._lock, index.file_lock.hold():
+                for path in (index.vectors_path, index.meta_path):
+                    if os.path.exists(path):
+                        os.remove(path)
+                index._reset()
+                index._loaded_mtime = None
+        
+        indexed = 0
+        batch = []
+        for draft_data in drafts:
+            batch.append(draft_data)
+            if len(batch) >= batch_size:
+                indexed += self._index_batch(batch)
+                batch = []
+        return indexed + self._index_batch(batch)
+    
+    def _index_batch(self, drafts: List[Dict]) -> int:
+        for section, index in self.sections.items():
+            changes = {draft['id']: draft_section_text(draft, section) for draft in drafts}
+            index.update({draft_id: text for draft_id, text in changes.items() if text})
+        return len(drafts)
+
+_index = None
+_index_lock = threading.Lock()
+
+def get_index() -> SimilarityIndex:
+    """The process-wide index, opened on first use"""
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = SimilarityIndex()
+        return _index
+
+def index_draft_sections(draft_data: Dict, sections: Iterable[str] = INDEXED_SECTIONS):
+    """Update the index after a draft is saved; failures only log, since the draft is already stored"""
+    if not Config.SIMILARITY_INDEX_ENABLED:
+        return
+    try:
+        get_index().index_draft(draft_data, [section for section in sections if section in INDEXED_SECTIONS])
+    except Exception as e:
+        print(f"⚠️ Could not update the similarity index for draft {draft_data.get('id')}: {str(e)}")
+
+def index_new_drafts(drafts: List[Dict], section: str = 'invention'):
+    """Index one section of drafts bulk inserted without Draft.save, in a single index write"""
+    if not Config.SIMILARITY_INDEX_ENABLED or not drafts:
+        return
+    try:
+        changes = {draft['id']: draft_section_text(draft, section) for draft in drafts}
+        get_index().section(section).update({draft_id: text for draft_id, text in changes.items() if text})
+    except Exception as e:
+        print(f"⚠️ Could not update the similarity index for {len(drafts)} new drafts: {str(e)}")
+
+def main():
+    parser = argparse.ArgumentParser(description='Maintain the local similar-drafts index')
+    parser.add_argument('--rebuild', action='store_true', help='re-index every draft in MongoDB')
+    args = parser.parse_args()
+    if not args.rebuild:
+        parser.print_help()
+        return
+    
+    from database import connect_database
+    from models import Draft
+    
+    connect_database()
+    fields = ('id',) + INVENTION_FIELDS + INDEXED_SECTIONS[1:]
+    drafts = (
+        dict({field: getattr(draft, field) for field in fields[1:]}, id=str(draft.id))
+        for draft in Draft.objects.only(*fields).no_cache()
+    )
+    count = SimilarityIndex().rebuild(drafts)
+    print(f"✅ Indexed {count} drafts into {Config.SIMILARITY_INDEX_DIR}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,201 @@
+import hashlib
+import json
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Optional, Tuple
+
+from pymongo.errors import DuplicateKeyError
+
+from config import Config
+
+class FlightFailed(Exception):
+    """Raised in followers when the generation they were waiting on failed"""
+
+class _LocalCall:
+    def __init__(self):
+        self.event = threading.Event()
+        self.content = None
+        self.error = None
+
+class Flight:
+    """One caller's view of a coalesced generation
+    
+    Exactly one caller per key is the leader and does the work; everyone else waits for the
+    leader's result. Leaders must call complete() or fail(); followers call wait().
+    """
+    
+    def __init__(self, group: 'SingleFlight', key: str, call: _LocalCall, is_leader: bool, shared: bool = False,
+                 token: Optional[str] = None):
+        self.group = group
+        self.key = key
+        self.call = call
+        self.is_leader = is_leader
+        # Identifies the leader's claim, so a leader whose lease was taken over cannot overwrite the new flight
+        self.token = token
+        # True when another worker process holds the leadership for this key
+        self.shared = shared
+    
+    def complete(self, content: str):
+        self.group._finish(self, content=content)
+    
+    def fail(self, error: str):
+        self.group._finish(self, error=error)
+    
+    def wait(self) -> Optional[str]:
+        """Return the leader's result, or None if the leader vanished and the caller should do the work"""
+        if self.shared:
+            return self.group._wait_shared(self)
+        
+        if not self.call.event.wait(self.group.wait_timeout):
+            return None
+        if self.call.error is not None:
+            raise FlightFailed(self.call.error)
+        return self.call.content
+
+class SingleFlight:
+    """Coalesce concurrent identical generations within and across worker processes
+    
+    Callers in the same process share a threading.Event. Across processes, a document in the
+    generation_flights collection records which worker leads a key and, once it finishes, the
+    result for the followers already polling. Only requests that overlap are coalesced: a
+    request made after the leader finished, such as an explicit regenerate, starts a new flight.
+    """
+    
+    def __init__(self, lease_seconds: float = None, poll_interval: float = 0.25):
+        self.lease_seconds = lease_seconds or Config.SINGLE_FLIGHT_LEASE_SECONDS
+        self.wait_timeout = self.lease_seconds
+        self.poll_interval = poll_interval
+        self._calls = {}
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def make_key(draft_id: str, section: str, input_hash: str, options: Dict = None) -> str:
+        material = json.dumps([draft_id, section, input_hash, options or {}], sort_keys=True)
+        return hashlib.sha256(material.encode('utf-8')).hexdigest()
+    
+    def claim(self, key: str) -> Flight:
+        """Join the flight for a key, becoming its leader if nobody is working on it yet"""
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                return Flight(self, key, call, is_leader=False)
+            call = _LocalCall()
+            self._calls[key] = call
+        
+        token = uuid.uuid4().hex
+        if self._claim_shared(key, token) == 'follower':
+            return Flight(self, key, call, is_leader=False, shared=True)
+        return Flight(self, key, call, is_leader=True, token=token)
+    
+    def do(self, key: str, func: Callable[[], str]) -> Tuple[str, bool]:
+        """Run func once per key; returns (content, shared) where shared means another caller ran it"""
+        flight = self.claim(key)
+        if not flight.is_leader:
+            content = flight.wait()
+            if content is not None:
+                return content, True
+        
+        try:
+            content = func()
+        except Exception as e:
+            if flight.is_leader:
+                flight.fail(str(e))
+            raise
+        if flight.is_leader:
+            flight.complete(content)
+        return content, False
+    
+    def _collection(self):
+        from models import GenerationFlight
+        return GenerationFlight._get_collection()
+    
+    def _claim_shared(self, key: str, token: str):
+        """Returns 'leader' or 'follower'; a leader's flight document carries its token"""
+        now = datetime.utcnow()
+        running = {
+            'status': 'running',
+            'content': None,
+            'error': None,
+            'token': token,
+            'created_at': now,
+            'expires_at': now + timedelta(seconds=self.lease_seconds)
+        }
+        try:
+            collection = self._collection()
+            try:
+                collection.insert_one(dict(running, _id=key))
+                return 'leader'
+            except DuplicateKeyError:
+                pass
+            
+            existing = collection.find_one({'_id': key})
+            if existing and existing['status'] == 'running' and existing['expires_at'] > now:
+                return 'follower'
+            
+            # The previous flight finished, failed or crashed, so take it over
+            taken = collection.find_one_and_update(
+                {'_id': key, 'created_at': existing['created_at']} if existing else {'_id': key},
+                {'$set': running},
+                upsert=existing is None
+            )
+            return 'leader' if taken or existing is None else 'follower'
+        except DuplicateKeyError:
+            return 'follower'
+        except Exception as e:
+            # Without MongoDB, duplicates are still coalesced within this process
+            print(f"⚠️ Single-flight MongoDB coordination unavailable: {str(e)}")
+            return 'leader'
+    
+    def _wait_shared(self, flight: Flight) -> Optional[str]:
+        deadline = time.time() + self.wait_timeout
+        content, error = None, None
+        try:
+            collection = self._collection()
+            while time.time() < deadline:
+                document = collection.find_one({'_id': flight.key}, {'status': 1, 'content': 1, 'error': 1, 'expires_at': 1})
+                if document is None:
+                    break
+                if document['status'] == 'done':
+                    content = document['content']
+                    break
+                if document['status'] == 'failed':
+                    error = document['error'] or 'Generation failed'
+                    break
+                if document['expires_at'] < datetime.utcnow():
+                    break
+                time.sleep(self.poll_interval)
+        except Exception as e:
+            print(f"⚠️ Single-flight MongoDB coordination unavailable: {str(e)}")
+        
+        self._resolve_local(flight.key, flight.call, content=content, error=error)
+        if error is not None:
+            raise FlightFailed(error)
+        return content
+    
+    def _finish(self, flight: Flight, content: Optional[str] = None, error: Optional[str] = None):
+        now = datetime.utcnow()
+        try:
+            # Matching the token makes a finish after the lease was taken over a no-op
+            self._collection().update_one(
+                {'_id': flight.key, 'token': flight.token},
+                {'$set': {
+                    'status': 'failed' if error is not None else 'done',
+                    'content': content,
+                    'error': error,
+                    # Kept just long enough for polling followers to read it
+                    'expires_at': now + timedelta(seconds=self.poll_interval * 4 if error is None else 0)
+                }}
+            )
+        except Exception as e:
+            print(f"⚠️ Single-flight MongoDB coordination unavailable: {str(e)}")
+        self._resolve_local(flight.key, flight.call, content=content, error=error)
+    
+    def _resolve_local(self, key: str, call: _LocalCall, content: Optional[str] = None, error: Optional[str] = None):
+        call.content = content
+        call.error = error
+        with self._lock:
+            if self._calls.get(key) is call:
+                del self._calls[key]
+        call.event.set()
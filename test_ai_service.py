@@ -14,14 +14,17 @@ def test_ai_service():
     # Load environment variables
     load_dotenv()
     
-    # Check OpenAI API key
-    api_key = os.getenv('OPENAI_API_KEY')
-    if not api_key or api_key == 'your-openai-api-key-here':
-        print("❌ OPENAI_API_KEY not set or using default value")
-        print("   Please add your OpenAI API key to the .env file")
-        return False
-    
-    print("✅ OPENAI_API_KEY is set")
+    # Check OpenAI API key (not needed with LLM_PROVIDER=local and local_llm_server.py running)
+    if os.getenv('LLM_PROVIDER', 'openai') == 'local':
+        print("✅ Using the local LLM stand-in server")
+    else:
+        api_key = os.getenv('OPENAI_API_KEY')
+        if not api_key or api_key == 'your-openai-api-key-here':
+            print("❌ OPENAI_API_KEY not set or using default value")
+            print("   Please add your OpenAI API key to the .env file")
+            return False
+        
+        print("✅ OPENAI_API_KEY is set")
     
     # Test AI service initialization
     try:
@@ -32,6 +35,19 @@ def test_ai_service():
         print(f"❌ Failed to initialize AI service: {str(e)}")
         return False
     
+    # Prompts must open with the same fixed text on every draft so providers can cache the prefix
+    try:
+        from prompt_templates import get_template
+        for section in ('background', 'summary', 'detailed_description', 'claims', 'abstract'):
+            prompt = ai_service.build_section_prompt(section, {'title': f'Draft of {section}'})
+            if not prompt.startswith(get_template(section).instructions) or ai_service.system_prompt in prompt:
+                print(f"❌ {section} prompt does not start with its fixed instructions")
+                return False
+        print("✅ Prompts share a stable prefix")
+    except Exception as e:
+        print(f"❌ Prompt template check failed: {str(e)}")
+        return False
+    
     # Test basic content generation
     try:
         test_data = {
@@ -127,7 +127,10 @@ class DraftingModuleTester:
             
             if response.status_code == 200:
                 result = response.json()
-                if result.get("success"):
+                if result.get("success") and "background" in result["data"]:
+                    self.log_test("Update Draft", False, "The whole draft was sent back")
+                    return False
+                if result.get("success") and result["data"]["title"] == data["title"]:
                     self.log_test("Update Draft", True, "Draft updated successfully")
                     return True
                 else:
@@ -141,6 +144,31 @@ class DraftingModuleTester:
             self.log_test("Update Draft", False, f"Exception: {str(e)}")
             return False
     
+    def test_update_version_conflict(self):
+        """Test that a PATCH based on an outdated version is refused with 409"""
+        if not self.draft_id:
+            self.log_test("Update Version Conflict", False, "No draft ID available")
+            return False
+            
+        try:
+            version = self.session.get(f"{DRAFTS_URL}/{self.draft_id}").json()["data"]["version"]
+            first = self.session.patch(f"{DRAFTS_URL}/{self.draft_id}", json={"current_step": 2, "version": version})
+            stale = self.session.patch(f"{DRAFTS_URL}/{self.draft_id}", json={"current_step": 3, "version": version})
+            
+            if first.status_code == 200 and stale.status_code == 409:
+                if first.json()["data"]["version"] != version + 1 or stale.json()["current_version"] != version + 1:
+                    self.log_test("Update Version Conflict", False, "Version was not incremented exactly once")
+                    return False
+                self.log_test("Update Version Conflict", True, f"Version {version} -> {version + 1}, stale update refused")
+                return True
+            else:
+                self.log_test("Update Version Conflict", False, f"HTTP {first.status_code} / {stale.status_code}")
+                return False
+                
+        except Exception as e:
+            self.log_test("Update Version Conflict", False, f"Exception: {str(e)}")
+            return False
+    
     def test_generate_background(self):
         """Test AI generation of background section"""
         if not self.draft_id:
@@ -201,6 +229,247 @@ class DraftingModuleTester:
             self.log_test("Generate Summary", False, f"Exception: {str(e)}")
             return False
     
+    def test_generation_profiles(self):
+        """Test choosing a generation profile and rejecting an unknown one"""
+        if not self.draft_id:
+            self.log_test("Generation Profiles", False, "No draft ID available")
+            return False
+            
+        try:
+            response = self.session.post(f"{DRAFTS_URL}/{self.draft_id}/generate/abstract", json={"profile": "fast"})
+            invalid = self.session.post(f"{DRAFTS_URL}/{self.draft_id}/generate/abstract", json={"profile": "turbo"})
+            
+            if response.status_code == 200 and invalid.status_code == 400:
+                content = response.json()["data"]["content"]
+                self.log_test("Generation Profiles", True, f"Fast profile generated {len(content)} characters")
+                return True
+            else:
+                self.log_test("Generation Profiles", False, f"HTTP {response.status_code} / {invalid.status_code}")
+                return False
+                
+        except Exception as e:
+            self.log_test("Generation Profiles", False, f"Exception: {str(e)}")
+            return False
+    
+    def test_regenerate_stale(self):
+        """Test that editing a section only regenerates the sections that read it"""
+        if not self.draft_id:
+            self.log_test("Regenerate Stale", False, "No draft ID available")
+            return False
+            
+        try:
+            self.session.patch(f"{DRAFTS_URL}/{self.draft_id}", json={"claims": "1. An edited claim."})
+            report = self.session.get(f"{DRAFTS_URL}/{self.draft_id}/stale")
+            if report.status_code != 200:
+                self.log_test("Regenerate Stale", False, f"HTTP {report.status_code}")
+                return False
+            
+            statuses = {entry["section"]: entry["status"] for entry in report.json()["data"]["sections"]}
+            if statuses.get("abstract") != "stale" or statuses.get("summary") == "stale":
+                self.log_test("Regenerate Stale", False, f"Unexpected statuses: {statuses}")
+                return False
+            
+            response = self.session.post(f"{DRAFTS_URL}/{self.draft_id}/regenerate-stale", json={})
+            if response.status_code == 200:
+                regenerated = list(response.json()["data"]["sections"])
+                self.log_test("Regenerate Stale", regenerated == ["abstract"], f"Regenerated {regenerated}")
+                return regenerated == ["abstract"]
+            else:
+                self.log_test("Regenerate Stale", False, f"HTTP {response.status_code}")
+                return False
+                
+        except Exception as e:
+            self.log_test("Regenerate Stale", False, f"Exception: {str(e)}")
+            return False
+    
+    def test_stream_generation(self):
+        """Test streaming AI generation over Server-Sent Events"""
+        if not self.draft_id:
+            self.log_test("Stream Generation", False, "No draft ID available")
+            return False
+            
+        try:
+            response = self.session.post(
+                f"{DRAFTS_URL}/{self.draft_id}/generate/detailed_description",
+                headers={"Accept": "text/event-stream"},
+                json={},
+                stream=True
+            )
+            
+            if response.status_code != 200:
+                self.log_test("Stream Generation", False, f"HTTP {response.status_code}: {response.text}")
+                return False
+            
+            started = time.time()
+            first_token_at = None
+            tokens = 0
+            event = None
+            done_payload = None
+            for line in response.iter_lines(decode_unicode=True):
+                if line.startswith("event: "):
+                    event = line[7:]
+                elif line.startswith("data: "):
+                    payload = json.loads(line[6:])
+                    if event == "token":
+                        tokens += 1
+                        if first_token_at is None:
+                            first_token_at = time.time() - started
+                    elif event == "done":
+                        done_payload = payload
+                    elif event == "error":
+                        self.log_test("Stream Generation", False, payload.get("error", "Unknown error"))
+                        return False
+            
+            if done_payload and len(done_payload.get("content", "")) > 100:
+                self.log_test("Stream Generation", True, f"{tokens} chunks, first after {first_token_at:.2f}s")
+                return True
+            else:
+                self.log_test("Stream Generation", False, "Stream ended without complete content")
+                return False
+                
+        except Exception as e:
+            self.log_test("Stream Generation", False, f"Exception: {str(e)}")
+            return False
+    
+    def test_generate_specification(self):
+        """Test one-shot generation of the full specification"""
+        if not self.draft_id:
+            self.log_test("Generate Specification", False, "No draft ID available")
+            return False
+            
+        try:
+            response = self.session.post(f"{DRAFTS_URL}/{self.draft_id}/generate-specification", json={})
+            
+            if response.status_code == 200:
+                result = response.json()
+                sections = result.get("data", {}).get("sections", {})
+                expected = {"background", "summary", "detailed_description", "claims", "abstract"}
+                if expected.issubset(sections):
+                    elapsed = result["data"].get("elapsed_seconds")
+                    self.log_test("Generate Specification", True, f"All sections generated in {elapsed}s")
+                    return True
+                else:
+                    self.log_test("Generate Specification", False, f"Missing sections: {expected - set(sections)}")
+                    return False
+            else:
+                self.log_test("Generate Specification", False, f"HTTP {response.status_code}: {response.text}")
+                return False
+                
+        except Exception as e:
+            self.log_test("Generate Specification", False, f"Exception: {str(e)}")
+            return False
+    
+    def test_queued_generation(self):
+        """Test queuing a generation job and polling it until a worker finishes it"""
+        if not self.draft_id:
+            self.log_test("Queued Generation", False, "No draft ID available")
+            return False
+            
+        try:
+            response = self.session.post(f"{DRAFTS_URL}/{self.draft_id}/generate/abstract", json={"async": True})
+            
+            if response.status_code != 202:
+                self.log_test("Queued Generation", False, f"HTTP {response.status_code}: {response.text}")
+                return False
+            
+            job_id = response.json()["data"]["job_id"]
+            job = {}
+            for _ in range(60):
+                job = self.session.get(f"{BASE_URL}/jobs/{job_id}").json().get("data", {})
+                if job.get("status") in ("succeeded", "failed", "cancelled"):
+                    break
+                time.sleep(1)
+            
+            if job.get("status") == "succeeded" and job.get("result", {}).get("content"):
+                self.log_test("Queued Generation", True, f"Job finished after {job['attempts']} attempt(s)")
+                return True
+            elif job.get("status") == "queued":
+                self.session.post(f"{BASE_URL}/jobs/{job_id}/cancel")
+                self.log_test("Queued Generation", False, "Job was never picked up; is job_queue.py running?")
+                return False
+            else:
+                self.log_test("Queued Generation", False, f"Job ended as {job.get('status')}: {job.get('error')}")
+                return False
+                
+        except Exception as e:
+            self.log_test("Queued Generation", False, f"Exception: {str(e)}")
+            return False
+    
+    def test_speculative_generation(self):
+        """Test that a speculatively generated background is returned by the later generate call"""
+        try:
+            response = self.session.post(f"{DRAFTS_URL}/start", json={
+                "user_id": "test_user_123",
+                "title": "Speculative Irrigation Controller",
+                "field_of_invention": "Agricultural Automation",
+                "brief_summary": "A controller that waters crops based on soil moisture forecasts",
+                "key_components": "Soil sensors, Forecast Model, Valve Controller",
+                "problem_solved": "Overwatering caused by fixed irrigation schedules",
+                "speculative": True
+            })
+            data = response.json().get("data", {})
+            job_id = data.get("speculative_job_id")
+            if response.status_code != 201 or not job_id:
+                self.log_test("Speculative Generation", False, f"HTTP {response.status_code}: {response.text}")
+                return False
+            
+            job = {}
+            for _ in range(60):
+                job = self.session.get(f"{BASE_URL}/jobs/{job_id}").json().get("data", {})
+                if job.get("status") in ("succeeded", "failed", "cancelled"):
+                    break
+                time.sleep(1)
+            if job.get("status") != "succeeded":
+                self.session.post(f"{BASE_URL}/jobs/{job_id}/cancel")
+                self.log_test("Speculative Generation", False, f"Job ended as {job.get('status')}; is job_queue.py running?")
+                return False
+            
+            started = time.time()
+            response = self.session.post(f"{DRAFTS_URL}/{data['draft_id']}/generate/background")
+            result = response.json().get("data", {})
+            if response.status_code == 200 and result.get("speculative"):
+                self.log_test("Speculative Generation", True, f"Background returned in {time.time() - started:.2f}s")
+                return True
+            else:
+                self.log_test("Speculative Generation", False, f"Suggestion was not used: HTTP {response.status_code}")
+                return False
+                
+        except Exception as e:
+            self.log_test("Speculative Generation", False, f"Exception: {str(e)}")
+            return False
+    
+    def test_batch_intake(self):
+        """Test creating several drafts from a batch of disclosures"""
+        try:
+            data = {
+                "user_id": "test_user_123",
+                "generate": False,
+                "disclosures": [
+                    {"title": "Self-Cleaning Solar Panel", "field_of_invention": "Renewable Energy",
+                     "brief_summary": "A panel coating that sheds dust"},
+                    {"title": "Smart Irrigation Valve", "field_of_invention": "Agriculture",
+                     "brief_summary": "A valve that waters based on soil moisture"},
+                    {"field_of_invention": "Missing title"}
+                ]
+            }
+            response = self.session.post(f"{DRAFTS_URL}/batch", json=data)
+            
+            if response.status_code == 201:
+                result = response.json()["data"]
+                if len(result["draft_ids"]) == 2 and len(result["rejected"]) == 1:
+                    self.log_test("Batch Intake", True, f"Batch {result['batch_id']} created 2 drafts")
+                    return True
+                else:
+                    self.log_test("Batch Intake", False, f"Unexpected result: {result}")
+                    return False
+            else:
+                self.log_test("Batch Intake", False, f"HTTP {response.status_code}: {response.text}")
+                return False
+                
+        except Exception as e:
+            self.log_test("Batch Intake", False, f"Exception: {str(e)}")
+            return False
+    
     def test_rephrase_section(self):
         """Test rephrasing a section"""
         if not self.draft_id:
@@ -230,6 +499,313 @@ class DraftingModuleTester:
             self.log_test("Rephrase Section", False, f"Exception: {str(e)}")
             return False
     
+    def test_rephrase_span(self):
+        """Test rephrasing one paragraph and rejecting a stale section hash"""
+        if not self.draft_id:
+            self.log_test("Rephrase Span", False, "No draft ID available")
+            return False
+            
+        try:
+            first = "The first paragraph stays exactly as written."
+            self.session.patch(f"{DRAFTS_URL}/{self.draft_id}", json={
+                "summary": f"{first}\n\nThe second paragraph is rather long and it could be said more briefly."
+            })
+            response = self.session.post(f"{DRAFTS_URL}/{self.draft_id}/rephrase/summary", json={
+                "instruction": "make it more concise",
+                "paragraph": 1
+            })
+            if response.status_code != 200 or not response.json()["content"].startswith(first + "\n\n"):
+                self.log_test("Rephrase Span", False, f"HTTP {response.status_code}: {response.text}")
+                return False
+            
+            stale = self.session.post(f"{DRAFTS_URL}/{self.draft_id}/rephrase/summary", json={
+                "paragraph": 0,
+                "section_hash": "0" * 64
+            })
+            if stale.status_code == 409 and stale.json()["section_hash"] == response.json()["section_hash"]:
+                self.log_test("Rephrase Span", True, f"Rephrased span {response.json()['span']}; stale hash rejected")
+                return True
+            else:
+                self.log_test("Rephrase Span", False, f"Stale hash: HTTP {stale.status_code}")
+                return False
+                
+        except Exception as e:
+            self.log_test("Rephrase Span", False, f"Exception: {str(e)}")
+            return False
+    
+    def test_usage_report(self):
+        """Test the aggregated usage report and that generations record their usage"""
+        try:
+            response = self.session.get(f"{DRAFTS_URL}/usage", params={"group_by": "section"})
+            invalid = self.session.get(f"{DRAFTS_URL}/usage", params={"group_by": "planet"})
+            
+            if response.status_code == 200 and invalid.status_code == 400:
+                data = response.json()["data"]
+                totals = data["totals"] or {}
+                sections = [group["key"] for group in data["groups"]]
+                self.log_test("Usage Report", True,
+                              f"{totals.get('generations', 0)} generations, {totals.get('total_tokens', 0)} tokens across {sections}")
+                return True
+            else:
+                self.log_test("Usage Report", False, f"HTTP {response.status_code} / {invalid.status_code}")
+                return False
+                
+        except Exception as e:
+            self.log_test("Usage Report", False, f"Exception: {str(e)}")
+            return False
+    
+    def test_generation_history(self):
+        """Test that generation records live outside the draft and page by cursor"""
+        if not self.draft_id:
+            self.log_test("Generation History", False, "No draft ID available")
+            return False
+            
+        try:
+            draft = self.session.get(f"{DRAFTS_URL}/{self.draft_id}").json()["data"]
+            if "generation_history" in draft or "generation_summary" not in draft:
+                self.log_test("Generation History", False, "Draft still embeds its generation history")
+                return False
+            
+            response = self.session.get(f"{DRAFTS_URL}/{self.draft_id}/history", params={"limit": 2})
+            if response.status_code != 200:
+                self.log_test("Generation History", False, f"HTTP {response.status_code}: {response.text}")
+                return False
+            data = response.json()["data"]
+            if data["next_cursor"]:
+                more = self.session.get(f"{DRAFTS_URL}/{self.draft_id}/history",
+                                        params={"limit": 2, "cursor": data["next_cursor"]}).json()["data"]
+                if {record["id"] for record in more["history"]} & {record["id"] for record in data["history"]}:
+                    self.log_test("Generation History", False, "A record appeared on two pages")
+                    return False
+            self.log_test("Generation History", True,
+                          f"{data['summary']['generations']} generations summarised, {len(data['history'])} on the first page")
+            return True
+                
+        except Exception as e:
+            self.log_test("Generation History", False, f"Exception: {str(e)}")
+            return False
+    
+    def test_lint_draft(self):
+        """Test linting a draft and the project-wide lint"""
+        if not self.draft_id:
+            self.log_test("Lint Draft", False, "No draft ID available")
+            return False
+            
+        try:
+            update = self.session.patch(f"{DRAFTS_URL}/{self.draft_id}", json={
+                "abstract": "We disclose an amazing device that I built."
+            })
+            lint = update.json().get("lint", {}).get("abstract", {})
+            rules = {finding["rule"] for finding in lint.get("findings", [])}
+            if not {"first_person", "marketing_language"} <= rules or lint.get("is_valid"):
+                self.log_test("Lint Draft", False, f"Unexpected lint result: {lint}")
+                return False
+            
+            response = self.session.get(f"{DRAFTS_URL}/{self.draft_id}/lint")
+            project = self.session.get(f"{DRAFTS_URL}/projects/{self.project_id}/lint")
+            if response.status_code == 200 and project.status_code == 200:
+                totals = project.json()["data"]["totals"]
+                self.log_test("Lint Draft", True, f"{totals['drafts']} drafts linted in {totals['elapsed_ms']}ms")
+                return True
+            else:
+                self.log_test("Lint Draft", False, f"HTTP {response.status_code} / {project.status_code}")
+                return False
+                
+        except Exception as e:
+            self.log_test("Lint Draft", False, f"Exception: {str(e)}")
+            return False
+    
+    def test_claim_editing(self):
+        """Test the claim tree and single-claim edits"""
+        if not self.draft_id:
+            self.log_test("Claim Editing", False, "No draft ID available")
+            return False
+            
+        try:
+            self.session.patch(f"{DRAFTS_URL}/{self.draft_id}", json={
+                "claims": "Claim 1: A system comprising a sensor.\n\nClaim 2: The system of claim 1, wherein the sensor is optical."
+            })
+            response = self.session.post(f"{DRAFTS_URL}/{self.draft_id}/claims", json={
+                "text": "The system of claim 1, further comprising a lens.",
+                "position": 2
+            })
+            if response.status_code != 201:
+                self.log_test("Claim Editing", False, f"Add claim: HTTP {response.status_code}")
+                return False
+            
+            tree = response.json()["data"]["claim_tree"]
+            if [claim["depends_on"] for claim in tree] != [[], [1], [1]] or "Claim 3: The system of claim 1, wherein" not in response.json()["data"]["claims"]:
+                self.log_test("Claim Editing", False, f"Unexpected claim tree: {tree}")
+                return False
+            
+            response = self.session.post(f"{DRAFTS_URL}/{self.draft_id}/claims/2/rephrase", json={
+                "instruction": "make it more concise"
+            })
+            if response.status_code == 200 and response.json()["data"]["counts"]["total"] == 3:
+                self.log_test("Claim Editing", True, "Claim added with renumbering and rephrased on its own")
+                return True
+            else:
+                self.log_test("Claim Editing", False, f"Rephrase claim: HTTP {response.status_code}")
+                return False
+                
+        except Exception as e:
+            self.log_test("Claim Editing", False, f"Exception: {str(e)}")
+            return False
+    
+    def test_claims_with_numbered_steps(self):
+        """Test that the numbered steps of a method claim stay part of it"""
+        if not self.draft_id:
+            self.log_test("Claims With Numbered Steps", False, "No draft ID available")
+            return False
+            
+        try:
+            claims = ("Claim 1: A system comprising a sensor.\n\n"
+                      "Claim 2: A method comprising:\n1. receiving data;\n2. processing data.\n\n"
+                      "Claim 3: The method of claim 2, wherein the data is encrypted.")
+            self.session.patch(f"{DRAFTS_URL}/{self.draft_id}", json={"claims": claims})
+            response = self.session.get(f"{DRAFTS_URL}/{self.draft_id}/claims")
+            if response.status_code != 200:
+                self.log_test("Claims With Numbered Steps", False, f"HTTP {response.status_code}")
+                return False
+            
+            data = response.json()["data"]
+            if data["counts"]["total"] != 3 or data["claims"] != claims or "2. processing data." not in data["claim_tree"][1]["text"]:
+                self.log_test("Claims With Numbered Steps", False, f"Unexpected claim tree: {data['claim_tree']}")
+                return False
+            
+            # Numbered claims on consecutive lines are still separate claims
+            self.session.patch(f"{DRAFTS_URL}/{self.draft_id}", json={"claims": (
+                "1. A system comprising a sensor.\n"
+                "2. The system of claim 1, wherein the sensor is optical.\n"
+                "3. The system of claim 2, further comprising a lens."
+            )})
+            tree = self.session.get(f"{DRAFTS_URL}/{self.draft_id}/claims").json()["data"]["claim_tree"]
+            if [claim["depends_on"] for claim in tree] == [[], [1], [2]]:
+                self.log_test("Claims With Numbered Steps", True, "Method steps kept in their claim, single-line claims split")
+                return True
+            else:
+                self.log_test("Claims With Numbered Steps", False, f"Unexpected claim tree: {tree}")
+                return False
+                
+        except Exception as e:
+            self.log_test("Claims With Numbered Steps", False, f"Exception: {str(e)}")
+            return False
+    
+    def test_similar_drafts(self):
+        """Test the similar drafts lookup"""
+        if not self.draft_id:
+            self.log_test("Similar Drafts", False, "No draft ID available")
+            return False
+            
+        try:
+            response = self.session.get(f"{DRAFTS_URL}/{self.draft_id}/similar", params={"limit": 3})
+            invalid = self.session.get(f"{DRAFTS_URL}/{self.draft_id}/similar", params={"section": "drawings"})
+            
+            if response.status_code == 200 and invalid.status_code == 400:
+                data = response.json()["data"]
+                if any(match["draft_id"] == self.draft_id for match in data["similar"]):
+                    self.log_test("Similar Drafts", False, "The draft was returned as similar to itself")
+                    return False
+                self.log_test("Similar Drafts", True, f"{len(data['similar'])} matches in {data['elapsed_ms']}ms")
+                return True
+            else:
+                self.log_test("Similar Drafts", False, f"HTTP {response.status_code} / {invalid.status_code}")
+                return False
+                
+        except Exception as e:
+            self.log_test("Similar Drafts", False, f"Exception: {str(e)}")
+            return False
+    
+    def test_batch_similar_drafts(self):
+        """Test that drafts created by a batch are found by the similar drafts lookup"""
+        try:
+            summary = "A rooftop rainwater tank that filters and stores runoff for garden irrigation"
+            response = self.session.post(f"{DRAFTS_URL}/batch", json={
+                "user_id": "test_user_123",
+                "generate": False,
+                "disclosures": [
+                    {"title": "Rainwater Harvesting Tank", "field_of_invention": "Water Management", "brief_summary": summary},
+                    {"title": "Filtered Rainwater Harvesting Tank", "field_of_invention": "Water Management", "brief_summary": summary}
+                ]
+            })
+            if response.status_code != 201:
+                self.log_test("Batch Similar Drafts", False, f"Batch: HTTP {response.status_code}")
+                return False
+            
+            first, second = response.json()["data"]["draft_ids"]
+            response = self.session.get(f"{DRAFTS_URL}/{first}/similar", params={"limit": 10})
+            if response.status_code == 200 and any(match["draft_id"] == second for match in response.json()["data"]["similar"]):
+                self.log_test("Batch Similar Drafts", True, "Batch-created drafts are indexed")
+                return True
+            else:
+                self.log_test("Batch Similar Drafts", False, f"HTTP {response.status_code}: {response.text}")
+                return False
+                
+        except Exception as e:
+            self.log_test("Batch Similar Drafts", False, f"Exception: {str(e)}")
+            return False
+    
+    def test_search_drafts(self):
+        """Test full-text search across a user's drafts"""
+        if not self.draft_id:
+            self.log_test("Search Drafts", False, "No draft ID available")
+            return False
+            
+        try:
+            response = self.session.get(f"{DRAFTS_URL}/search", params={"q": "home automation", "user_id": "test_user_123"})
+            empty = self.session.get(f"{DRAFTS_URL}/search", params={"q": " "})
+            
+            if response.status_code == 200 and empty.status_code == 400:
+                data = response.json()["data"]
+                result = next((result for result in data["results"] if result["id"] == self.draft_id), None)
+                if not result or "title" not in result["matched_fields"]:
+                    self.log_test("Search Drafts", False, "The draft was not found by its title")
+                    return False
+                snippet = result["snippets"][0]
+                start, end = snippet["highlights"][0]
+                self.log_test("Search Drafts", True, f"{data['total']} hits, highlighted '{snippet['text'][start:end]}'")
+                return True
+            else:
+                self.log_test("Search Drafts", False, f"HTTP {response.status_code} / {empty.status_code}")
+                return False
+                
+        except Exception as e:
+            self.log_test("Search Drafts", False, f"Exception: {str(e)}")
+            return False
+    
+    def test_section_revisions(self):
+        """Test revision history, diff and restore of a section"""
+        if not self.draft_id:
+            self.log_test("Section Revisions", False, "No draft ID available")
+            return False
+            
+        try:
+            url = f"{DRAFTS_URL}/{self.draft_id}/sections/abstract"
+            first = "A device for monitoring a home. The device has a sensor."
+            second = "A device for monitoring a home. The device has a wireless sensor."
+            self.session.patch(f"{DRAFTS_URL}/{self.draft_id}", json={"abstract": first})
+            self.session.patch(f"{DRAFTS_URL}/{self.draft_id}", json={"abstract": second})
+            
+            revisions = self.session.get(f"{url}/revisions", params={"limit": 2}).json()["data"]["revisions"]
+            latest, previous = revisions[0]["number"], revisions[1]["number"]
+            diff = self.session.get(f"{url}/diff").json()["data"]
+            if "+A device for monitoring a home. The device has a wireless sensor." not in diff["diff"]:
+                self.log_test("Section Revisions", False, f"Unexpected diff: {diff}")
+                return False
+            
+            restore = self.session.post(f"{url}/revisions/{previous}/restore", json={})
+            invalid = self.session.get(f"{DRAFTS_URL}/{self.draft_id}/sections/drawings/revisions")
+            if restore.status_code != 200 or restore.json()["data"]["abstract"] != first or invalid.status_code != 400:
+                self.log_test("Section Revisions", False, f"HTTP {restore.status_code} / {invalid.status_code}")
+                return False
+            self.log_test("Section Revisions", True,
+                          f"Revision {latest} stored in {revisions[0]['stored_bytes']} bytes, restored {previous}")
+            return True
+                
+        except Exception as e:
+            self.log_test("Section Revisions", False, f"Exception: {str(e)}")
+            return False
+    
     def test_get_drawings(self):
         """Test getting drawings for a draft"""
         if not self.draft_id:
@@ -304,6 +880,42 @@ class DraftingModuleTester:
             self.log_test("Get Project Drafts", False, f"Exception: {str(e)}")
             return False
     
+    def test_paginated_listings(self):
+        """Test cursor paging of projects and the draft list projections"""
+        if not self.project_id:
+            self.log_test("Paginated Listings", False, "No project ID available")
+            return False
+            
+        try:
+            seen, cursor = [], None
+            for _ in range(20):
+                params = {"limit": 1, "cursor": cursor} if cursor else {"limit": 1}
+                page = self.session.get(f"{DRAFTS_URL}/projects/test_user_123", params=params).json()
+                seen.extend(project["id"] for project in page["projects"])
+                cursor = page["next_cursor"]
+                if not cursor:
+                    break
+            if len(seen) != len(set(seen)):
+                self.log_test("Paginated Listings", False, "A project appeared on two pages")
+                return False
+            
+            summary = self.session.get(f"{DRAFTS_URL}/projects/{self.project_id}/drafts").json()["drafts"]
+            titles = self.session.get(f"{DRAFTS_URL}/projects/{self.project_id}/drafts",
+                                      params={"fields": "title"}).json()["drafts"]
+            invalid = self.session.get(f"{DRAFTS_URL}/projects/{self.project_id}/drafts", params={"cursor": "not-a-cursor"})
+            if any("background" in draft or "has_content" not in draft for draft in summary):
+                self.log_test("Paginated Listings", False, "Summary listing returned section bodies")
+                return False
+            if any(set(draft) != {"id", "title", "updated_at"} for draft in titles) or invalid.status_code != 400:
+                self.log_test("Paginated Listings", False, f"Field projection or cursor check failed (HTTP {invalid.status_code})")
+                return False
+            self.log_test("Paginated Listings", True, f"Paged through {len(seen)} projects one at a time")
+            return True
+                
+        except Exception as e:
+            self.log_test("Paginated Listings", False, f"Exception: {str(e)}")
+            return False
+    
     def test_download_draft(self):
         """Test downloading draft as DOCX"""
         if not self.draft_id:
@@ -355,12 +967,31 @@ class DraftingModuleTester:
             self.test_start_draft,
             self.test_get_draft,
             self.test_update_draft,
+            self.test_update_version_conflict,
             self.test_generate_background,
             self.test_generate_summary,
+            self.test_generation_profiles,
+            self.test_stream_generation,
+            self.test_generate_specification,
+            self.test_regenerate_stale,
+            self.test_queued_generation,
+            self.test_speculative_generation,
+            self.test_batch_intake,
             self.test_rephrase_section,
+            self.test_rephrase_span,
+            self.test_usage_report,
+            self.test_generation_history,
+            self.test_lint_draft,
+            self.test_claim_editing,
+            self.test_claims_with_numbered_steps,
+            self.test_similar_drafts,
+            self.test_batch_similar_drafts,
+            self.test_search_drafts,
+            self.test_section_revisions,
             self.test_get_drawings,
             self.test_get_user_projects,
             self.test_get_project_drafts,
+            self.test_paginated_listings,
             self.test_download_draft,
             self.test_error_handling
         ]
@@ -0,0 +1,255 @@
+import json
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from config import Config
+
+# USD per million prompt and completion tokens; MODEL_PRICES_FILE can override or add models.
+# Prompt tokens served from the provider's prefix cache are billed at CACHED_PROMPT_PRICE_RATIO.
+DEFAULT_MODEL_PRICES = {
+    'gpt-3.5-turbo': (0.50, 1.50),
+    'gpt-4o-mini': (0.15, 0.60),
+    'gpt-4o': (2.50, 10.00),
+}
+
+CACHED_PROMPT_PRICE_RATIO = 0.5
+
+_prices = None
+
+def model_prices() -> Dict:
+    global _prices
+    if _prices is None:
+        prices = dict(DEFAULT_MODEL_PRICES)
+        if Config.MODEL_PRICES_FILE:
+            with open(Config.MODEL_PRICES_FILE) as handle:
+                prices.update({model: tuple(price) for model, price in json.load(handle).items()})
+        _prices = prices
+    return _prices
+
+def estimate_cost(model: str, prompt_tokens: int, completion_tokens: int, cached_tokens: int = 0) -> float:
+    """Cost of a provider call in USD; models without a price (e.g. the local stand-in) are free"""
+    prompt_price, completion_price = model_prices().get(model, (0.0, 0.0))
+    billed_prompt = prompt_tokens - cached_tokens + cached_tokens * CACHED_PROMPT_PRICE_RATIO
+    return (billed_prompt * prompt_price + completion_tokens * completion_price) / 1_000_000
+
+class UsageMeter:
+    """Adds up the provider calls made while generating one section
+    
+    A section can take several calls (digests of long inputs, retries), so the meter records
+    totals plus the model and profile of the call that produced the section itself.
+    """
+    
+    def __init__(self):
+        self.model = None
+        self.profile = None
+        self.calls = 0
+        self.cache_hits = 0
+        self.prompt_tokens = 0
+        self.cached_tokens = 0
+        self.completion_tokens = 0
+        self.retries = 0
+        self.latency_ms = 0
+        self.queue_wait_ms = 0
+        self.cost_usd = 0.0
+    
+    def _note_route(self, route):
+        if route.operation != 'digest' or self.model is None:
+            self.model = route.model
+            self.profile = route.profile
+    
+    def record_cache_hit(self, route):
+        self._note_route(route)
+        self.calls += 1
+        self.cache_hits += 1
+    
+    def record_call(self, route, prompt_tokens: int, completion_tokens: int, latency: float,
+                    queue_wait: float = 0.0, retries: int = 0, cached_tokens: int = 0):
+        self._note_route(route)
+        self.calls += 1
+        self.prompt_tokens += prompt_tokens or 0
+        self.cached_tokens += cached_tokens or 0
+        self.completion_tokens += completion_tokens or 0
+        self.retries += retries
+        self.latency_ms += int(latency * 1000)
+        self.queue_wait_ms += int(queue_wait * 1000)
+        self.cost_usd += estimate_cost(route.model, prompt_tokens or 0, completion_tokens or 0, cached_tokens or 0)
+    
+    def record_retry(self):
+        self.retries += 1
+    
+    def merge(self, other: 'UsageMeter'):
+        """Fold in the usage of intermediate work, such as a claims outline"""
+        self.model = self.model or other.model
+        self.profile = self.profile or other.profile
+        for field in ('calls', 'cache_hits', 'prompt_tokens', 'cached_tokens', 'completion_tokens', 'retries',
+                      'latency_ms', 'queue_wait_ms', 'cost_usd'):
+            setattr(self, field, getattr(self, field) + getattr(other, field))
+    
+    def to_record(self) -> Dict:
+        """Fields for the GenerationRecord of the section"""
+        return {
+            'model': self.model,
+            'profile': self.profile,
+            'calls': self.calls,
+            'cache_hit': bool(self.calls) and self.cache_hits == self.calls,
+            'prompt_tokens': self.prompt_tokens,
+            'cached_tokens': self.cached_tokens,
+            'completion_tokens': self.completion_tokens,
+            'total_tokens': self.prompt_tokens + self.completion_tokens,
+            'retries': self.retries,
+            'latency_ms': self.latency_ms,
+            'queue_wait_ms': self.queue_wait_ms,
+            'cost_usd': round(self.cost_usd, 6)
+        }
+
+_local = threading.local()
+
+@contextmanager
+def metered():
+    """Record the provider usage of the calls made by this thread inside the block"""
+    previous = getattr(_local, 'meter', None)
+    meter = _local.meter = UsageMeter()
+    try:
+        yield meter
+    finally:
+        _local.meter = previous
+
+def current_meter() -> Optional[UsageMeter]:
+    return getattr(_local, 'meter', None)
+
+def with_queue_wait(usage: Optional[Dict], seconds: float) -> Optional[Dict]:
+    """Add time spent waiting in the job queue to a usage record"""
+    if usage is None:
+        return None
+    return dict(usage, queue_wait_ms=usage.get('queue_wait_ms', 0) + int(seconds * 1000))
+
+# Expressions that produce the key of each usage report group
+REPORT_GROUPS = {
+    'section': '$record.section',
+    'day': {'$dateToString': {'format': '%Y-%m-%d', 'date': '$record.timestamp'}},
+    'user': '$user_id',
+    'model': '$record.model',
+}
+
+PERCENTILES = (50, 90, 99)
+
+def _percentile(values: str, percentile: int) -> Dict:
+    """Nearest-rank percentile of a sorted array field"""
+    index = {'$toInt': {'$floor': {'$multiply': [percentile / 100, {'$subtract': [{'$size': values}, 1]}]}}}
+    return {'$cond': [
+        {'$gt': [{'$size': values}, 0]},
+        {'$arrayElemAt': [values, index]},
+        None
+    ]}
+
+def _summary_stages(key) -> List[Dict]:
+    """Group usage records under key and compute totals and percentiles"""
+    measured = {'$and': [{'$eq': ['$record.success', True]}, {'$ne': [{'$type': '$record.latency_ms'}, 'missing']}]}
+    summary = {
+        '_id': key,
+        'generations': {'$sum': 1},
+        'failures': {'$sum': {'$cond': ['$record.success', 0, 1]}},
+        'cache_hits': {'$sum': {'$cond': [{'$eq': ['$record.cache_hit', True]}, 1, 0]}},
+        'calls': {'$sum': {'$ifNull': ['$record.calls', 0]}},
+        'prompt_tokens': {'$sum': {'$ifNull': ['$record.prompt_tokens', 0]}},
+        'cached_tokens': {'$sum': {'$ifNull': ['$record.cached_tokens', 0]}},
+        'completion_tokens': {'$sum': {'$ifNull': ['$record.completion_tokens', 0]}},
+        'total_tokens': {'$sum': {'$ifNull': ['$record.total_tokens', 0]}},
+        'retries': {'$sum': {'$ifNull': ['$record.retries', 0]}},
+        'cost_usd': {'$sum': {'$ifNull': ['$record.cost_usd', 0]}},
+        # Records written before usage tracking have no measurements and stay out of the percentiles
+        'latency_ms': {'$push': {'$cond': [measured, '$record.latency_ms', '$$REMOVE']}},
+        'queue_wait_ms': {'$push': {'$cond': [measured, {'$ifNull': ['$record.queue_wait_ms', 0]}, '$$REMOVE']}},
+        'tokens': {'$push': {'$cond': [measured, '$record.total_tokens', '$$REMOVE']}},
+    }
+    
+    sorted_fields = {
+        field: {'$sortArray': {'input': f'${field}', 'sortBy': 1}}
+        for field in ('latency_ms', 'queue_wait_ms', 'tokens')
+    }
+    report = {
+        '_id': 0,
+        'key': '$_id',
+        'generations': 1,
+        'failures': 1,
+        'cache_hits': 1,
+        'calls': 1,
+        'prompt_tokens': 1,
+        'cached_tokens': 1,
+        'completion_tokens': 1,
+        'total_tokens': 1,
+        'retries': 1,
+        'cost_usd': {'$round': ['$cost_usd', 4]},
+        'cache_hit_rate': {'$round': [{'$divide': ['$cache_hits', '$generations']}, 3]},
+        # Share of prompt tokens the provider answered from its prompt prefix cache
+        'prefix_hit_rate': {'$cond': [
+            {'$gt': ['$prompt_tokens', 0]},
+            {'$round': [{'$divide': ['$cached_tokens', '$prompt_tokens']}, 3]},
+            None
+        ]},
+    }
+    for field, label in (('latency_ms', 'latency_ms'), ('queue_wait_ms', 'queue_wait_ms'), ('tokens', 'total_tokens')):
+        report[f'{label}_percentiles'] = {
+            f'p{percentile}': _percentile(f'${field}', percentile) for percentile in PERCENTILES
+        }
+    
+    return [{'$group': summary}, {'$set': sorted_fields}, {'$project': report}]
+
+def usage_report(group_by: str = 'section', since: Optional[datetime] = None, until: Optional[datetime] = None,
+                 user_id: Optional[str] = None) -> Dict:
+    """Totals and percentiles of generation usage, grouped by section, day, user or model
+    
+    Runs as a single aggregation over the generation history collection.
+    """
+    from models import Draft, GenerationEvent, Project
+    
+    if group_by not in REPORT_GROUPS:
+        raise ValueError(f"group_by must be one of: {', '.join(REPORT_GROUPS)}")
+    
+    match = {}
+    window = {}
+    if since:
+        window['$gte'] = since
+    if until:
+        window['$lt'] = until
+    if window:
+        match['record.timestamp'] = window
+    if user_id:
+        # Resolve the user's drafts up front so the history is filtered on its draft_id index
+        project_ids = [str(project.id) for project in Project.objects(user_id=user_id).only('id')]
+        match['draft_id'] = {'$in': [str(draft.id) for draft in Draft.objects(project_id__in=project_ids).only('id')]}
+    
+    pipeline = [{'$match': match}, {'$project': {'draft_id': 1, 'record': 1}}]
+    if group_by == 'user':
+        pipeline += [
+            {'$lookup': {
+                'from': 'drafts',
+                'let': {'draft_id': {'$convert': {'input': '$draft_id', 'to': 'objectId', 'onError': None, 'onNull': None}}},
+                'pipeline': [
+                    {'$match': {'$expr': {'$eq': ['$_id', '$$draft_id']}}},
+                    {'$project': {'project_id': {'$convert': {'input': '$project_id', 'to': 'objectId', 'onError': None, 'onNull': None}}}},
+                    {'$lookup': {'from': 'projects', 'localField': 'project_id', 'foreignField': '_id',
+                                 'pipeline': [{'$project': {'user_id': 1}}], 'as': 'project'}}
+                ],
+                'as': 'draft'
+            }},
+            {'$set': {'user_id': {'$ifNull': [
+                {'$arrayElemAt': [{'$arrayElemAt': ['$draft.project.user_id', 0]}, 0]}, 'unknown'
+            ]}}},
+        ]
+    
+    pipeline.append({'$facet': {
+        'groups': _summary_stages(REPORT_GROUPS[group_by]) + [{'$sort': {'key': 1}}],
+        'totals': _summary_stages(None),
+    }})
+    
+    result = next(GenerationEvent.objects.aggregate(pipeline), {'groups': [], 'totals': []})
+    return {
+        'group_by': group_by,
+        'since': since.isoformat() if since else None,
+        'until': until.isoformat() if until else None,
+        'groups': result['groups'],
+        'totals': result['totals'][0] if result['totals'] else None
+    }